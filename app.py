@@ -5,7 +5,12 @@ from aws_cdk import core as cdk
 from src.helpers.context import (
     ArtifactsContext,
 )
-from src.stacks.artifacts import ArtifactsStack
+from src.stacks.artifacts import (
+    ArtifactsStack,
+    RegistriesStack,
+    BuildProjectsStack,
+    AccessStack,
+)
 
 
 app = cdk.App()
@@ -14,10 +19,31 @@ environment = cdk.Environment(region="eu-west-1")
 
 artifacts_context = ArtifactsContext(cdk_app=app)
 
-artifacts_stack = ArtifactsStack(
-    scope=app,
-    env=environment,
-    context=artifacts_context,
-)
+if artifacts_context.app_split_stacks:
+    registries_stack = RegistriesStack(
+        scope=app,
+        env=environment,
+        context=artifacts_context,
+    )
+
+    build_projects_stack = BuildProjectsStack(
+        scope=app,
+        env=environment,
+        context=artifacts_context,
+        registries_stack=registries_stack,
+    )
+
+    access_stack = AccessStack(
+        scope=app,
+        env=environment,
+        context=artifacts_context,
+        build_projects_stack=build_projects_stack,
+    )
+else:
+    artifacts_stack = ArtifactsStack(
+        scope=app,
+        env=environment,
+        context=artifacts_context,
+    )
 
 app.synth()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+import argparse
+import timeit
+
+import yaml
+
+from src.helpers.buildspec import BuildSpecHelper
+
+BUILDSPECS = [
+    "src/config/build-docker-image-buildspec.yml",
+    "src/config/deploy-sls-buildspec.yml",
+    "src/config/destroy-sls-buildspec.yml",
+]
+
+
+def load_uncached(file_location: str):
+    with open(file_location, "r") as buildspec_file:
+        return yaml.load(buildspec_file.read(), Loader=yaml.FullLoader)
+
+
+def load_cached(file_location: str):
+    return BuildSpecHelper.to_object(BuildSpecHelper.get_buildspec(file_location=file_location))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buildspec loading micro-benchmark")
+    parser.add_argument("--number", type=int, default=1000, help="Loads per buildspec")
+    args = parser.parse_args()
+
+    print(f"{'buildspec':>45} {'FullLoader (us)':>16} {'cached (us)':>16} {'speedup':>8}")
+
+    for file_location in BUILDSPECS:
+        uncached = timeit.timeit(lambda: load_uncached(file_location=file_location), number=args.number)
+        cached = timeit.timeit(lambda: load_cached(file_location=file_location), number=args.number)
+
+        print(
+            f"{file_location:>45} {uncached * 1e6 / args.number:>16.1f} "
+            f"{cached * 1e6 / args.number:>16.1f} {uncached / cached:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+
+import yaml
+
+
+def service_name(index: int) -> str:
+    # Logical IDs drop digits, so service names are built only with letters
+    suffix = ""
+
+    for _ in range(3):
+        index, remainder = divmod(index, 26)
+        suffix = chr(ord("a") + remainder) + suffix
+
+    return f"service-{suffix}"
+
+
+def write_manifest(directory: str, services_count: int) -> str:
+    manifest_location = os.path.join(directory, f"services-{services_count}.yml")
+
+    services = [
+        {"name": service_name(index=index), "actions": ["deploy", "destroy"]} for index in range(services_count)
+    ]
+
+    with open(manifest_location, "w") as manifest_file:
+        manifest_file.write(yaml.safe_dump({"services": services}))
+
+    return manifest_location
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import tempfile
+import time
+
+from aws_cdk import core as cdk
+
+from src.helpers.context import ArtifactsContext
+from src.stacks.artifacts import ArtifactsStack
+from benchmarks.manifest import write_manifest
+
+
+def synth_services(directory: str, services_count: int) -> float:
+    manifest_location = write_manifest(directory=directory, services_count=services_count)
+
+    start = time.perf_counter()
+
+    app = cdk.App(
+        context={
+            "services_manifest": manifest_location,
+            # Large manifests go over the CloudFormation resources limit, only the synth time is measured here
+            "@aws-cdk/core:stackResourceLimit": 0,
+        },
+        outdir=os.path.join(directory, f"cdk-{services_count}.out"),
+    )
+    ArtifactsStack(
+        scope=app,
+        env=cdk.Environment(account="123456789012", region="eu-west-1"),
+        context=ArtifactsContext(cdk_app=app),
+    )
+    app.synth()
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synth time of the artifacts stack by number of services")
+    parser.add_argument("--services", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm up the JSII runtime so its start up time is not charged to the first run
+        synth_services(directory=directory, services_count=1)
+
+        print(f"{'services':>10} {'synth (s)':>12} {'per service (ms)':>18}")
+
+        for services_count in args.services:
+            elapsed = synth_services(directory=directory, services_count=services_count)
+            print(f"{services_count:>10} {elapsed:>12.2f} {elapsed * 1000 / services_count:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmarks", "synth-baseline.json")
+
+# Fixed dummy environment, so the synth never needs AWS credentials or context lookups
+BENCHMARK_ENVIRONMENT = {
+    "CDK_DEFAULT_ACCOUNT": "123456789012",
+    "CDK_DEFAULT_REGION": "eu-west-1",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION": "1",
+}
+
+PHASES = ["jsii_start", "construct", "synth", "total"]
+
+
+def run_worker(services_count: int, directory: str) -> dict:
+    timings = dict()
+    context = {"@aws-cdk/core:stackResourceLimit": 0}
+
+    # Generated before the clock starts, so the manifest is not counted in the JSII start
+    if services_count > 0:
+        from benchmarks.manifest import write_manifest
+
+        context["services_manifest"] = write_manifest(directory=directory, services_count=services_count)
+
+    start = time.perf_counter()
+    from aws_cdk import core as cdk
+
+    from src.helpers.context import ArtifactsContext
+    from src.stacks.artifacts import ArtifactsStack
+
+    app = cdk.App(context=context, outdir=os.path.join(directory, "cdk.out"))
+    timings["jsii_start"] = time.perf_counter() - start
+
+    phase_start = time.perf_counter()
+    ArtifactsStack(
+        scope=app,
+        env=cdk.Environment(
+            account=BENCHMARK_ENVIRONMENT["CDK_DEFAULT_ACCOUNT"], region=BENCHMARK_ENVIRONMENT["CDK_DEFAULT_REGION"]
+        ),
+        context=ArtifactsContext(cdk_app=app),
+    )
+    timings["construct"] = time.perf_counter() - phase_start
+
+    phase_start = time.perf_counter()
+    app.synth()
+    timings["synth"] = time.perf_counter() - phase_start
+
+    timings["total"] = time.perf_counter() - start
+
+    # Measured before returning, while the JSII node runtime is still running
+    timings["peak_rss_kb"] = get_peak_rss_kb()
+
+    return timings
+
+
+def get_child_pids(pid: int) -> list:
+    child_pids = list()
+
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open(f"/proc/{entry}/stat", "r") as stat_file:
+                # The parent PID follows the state, after the parenthesized command name
+                parent_pid = int(stat_file.read().rpartition(")")[2].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+        if parent_pid == pid:
+            child_pids.append(int(entry))
+
+    return child_pids
+
+
+def get_peak_rss_kb() -> int:
+    # wait4 and getrusage only report the peak of a single process, never the sum over a process tree
+    if not os.path.isdir("/proc"):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Sum of the peak RSS (VmHWM) of the worker and its descendants, the JSII node runtime included. The processes
+    # peak at different times, so the sum is an upper bound of the peak of the whole tree
+    peak_rss_kb = 0
+    pids = [os.getpid()]
+
+    while len(pids) > 0:
+        pid = pids.pop()
+
+        try:
+            with open(f"/proc/{pid}/status", "r") as status_file:
+                for line in status_file:
+                    if line.startswith("VmHWM:"):
+                        peak_rss_kb += int(line.split()[1])
+        except OSError:
+            continue
+
+        pids.extend(get_child_pids(pid=pid))
+
+    return peak_rss_kb
+
+
+def run_scenario(services_count: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.synth",
+                "--worker",
+                str(services_count),
+                "--worker-dir",
+                directory,
+            ],
+            cwd=ROOT_DIR,
+            env={**os.environ, **BENCHMARK_ENVIRONMENT},
+            stdout=subprocess.PIPE,
+        )
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Synth benchmark worker for {services_count} services failed")
+
+    return json.loads(process.stdout)
+
+
+def run_benchmarks(scenarios: list, repeat: int) -> dict:
+    results = dict()
+
+    for services_count in scenarios:
+        runs = [run_scenario(services_count=services_count) for _ in range(repeat)]
+
+        scenario_name = "default" if services_count == 0 else f"{services_count}-services"
+        results[scenario_name] = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+        results[scenario_name]["peak_rss_kb"] = max(run["peak_rss_kb"] for run in runs)
+
+    return results
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float, min_delta: float) -> list:
+    regressions = list()
+
+    for scenario_name, scenario in results.items():
+        if scenario_name not in baseline:
+            continue
+
+        for metric, value in scenario.items():
+            baseline_value = baseline[scenario_name].get(metric)
+
+            if baseline_value is None:
+                continue
+
+            # Memory is compared in MB so the absolute noise floor applies to both kinds of metrics
+            delta = (value - baseline_value) / (1024 if metric.endswith("_kb") else 1)
+
+            if value > baseline_value * (1 + threshold) and delta > min_delta:
+                regressions.append(f"{scenario_name} {metric}: {baseline_value:.2f} -> {value:.2f}")
+
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':>16} " + " ".join(f"{phase + ' (s)':>16}" for phase in PHASES) + f" {'peak RSS (MB)':>16}")
+
+    for scenario_name, scenario in results.items():
+        phases = " ".join(f"{scenario[phase]:>16.2f}" for phase in PHASES)
+        print(f"{scenario_name:>16} {phases} {scenario['peak_rss_kb'] / 1024:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synth time and memory benchmark of the CDK app")
+    parser.add_argument(
+        "--services",
+        type=int,
+        nargs="+",
+        default=[0, 10, 30],
+        help="Scenarios to run, by number of generated services (0 uses the services manifest)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario, the median is reported")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--min-delta", type=float, default=0.25, help="Ignored regressions in seconds or MB")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(services_count=args.worker, directory=args.worker_dir)))
+        return
+
+    results = run_benchmarks(scenarios=args.services, repeat=args.repeat)
+    print_results(results=results)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    # A gate without a baseline would always pass
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found in {args.baseline}, run with --update-baseline to create it", file=sys.stderr)
+        sys.exit(1)
+
+    with open(args.baseline, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = compare_with_baseline(
+        results=results,
+        baseline=baseline,
+        threshold=args.threshold,
+        min_delta=args.min_delta,
+    )
+
+    if len(regressions) > 0:
+        print(f"Synth regressions over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+    print("No synth regressions found")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,8 +18,22 @@ setuptools.setup(
         "aws-cdk.aws-codebuild==1.100.0",
         "aws-cdk.aws-logs==1.100.0",
         "aws-cdk.aws-ssm==1.100.0",
+        "aws-cdk.aws-cloudwatch==1.100.0",
+        "aws-cdk.aws-ec2==1.100.0",
+        "aws-cdk.aws-events==1.100.0",
+        "aws-cdk.aws-events-targets==1.100.0",
+        "aws-cdk.aws-lambda==1.100.0",
+        "aws-cdk.aws-sns==1.100.0",
+        "aws-cdk.aws-dynamodb==1.100.0",
+        "aws-cdk.aws-codeartifact==1.100.0",
         "pyyaml>=5.4",
     ],
+    extras_require={
+        "test": [
+            "pytest>=7.0",
+            "boto3",
+        ],
+    },
     python_requires=">=3.6",
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -3,26 +3,49 @@ from aws_cdk import (
     aws_iam as iam,
 )
 from src.helpers.name import NameHelper
+from src.helpers.policy import PolicyHelper
 
 
 class BootstrapConstruct(cdk.Construct):
-    def __init__(self, scope: cdk.Construct, construct_id: str, codebuild_roles: list) -> None:
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        codebuild_role_path: str,
+        max_session_duration: cdk.Duration = cdk.Duration.hours(1),
+    ) -> None:
         super().__init__(scope, id=construct_id)
 
         role_name = NameHelper.to_pascal_case(name="infrastructure-deploy")
 
-        codebuild_roles_principals = iam.CompositePrincipal(iam.ServicePrincipal("codebuild.amazonaws.com"))
-
-        for role in codebuild_roles:
-            codebuild_roles_principals.add_principals(iam.ArnPrincipal(arn=role))
-
         self.deploy_role = iam.Role(
             self,
             id=f"{construct_id}-deploy-role",
             role_name=role_name,
             path="/infra-automation/",
-            assumed_by=codebuild_roles_principals,
+            assumed_by=iam.ServicePrincipal("codebuild.amazonaws.com"),
             description=f"{construct_id} Deploy IAM Role",
+            max_session_duration=max_session_duration,
+        )
+
+        # Deploy project roles are trusted by their path rather than one by one, so the trust policy keeps the same
+        # size whatever the number of services
+        self.deploy_role.assume_role_policy.add_statements(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["sts:AssumeRole"],
+                principals=[iam.AccountPrincipal(account_id=cdk.Stack.of(self).account)],
+                conditions={
+                    "StringLike": {
+                        "aws:PrincipalArn": cdk.Stack.of(self).format_arn(
+                            service="iam",
+                            region="",
+                            resource="role",
+                            resource_name=f"{codebuild_role_path.strip('/')}/*",
+                        ),
+                    },
+                },
+            )
         )
 
         self.deploy_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name("AdministratorAccess"))
@@ -30,3 +53,17 @@ class BootstrapConstruct(cdk.Construct):
         self.deploy_role.node.default_child.override_logical_id(
             NameHelper.to_pascal_case(name=f"{role_name}-role"),
         )
+
+        self.__report(role_name=role_name)
+
+    def __report(self, role_name: str) -> None:
+        statements = self.deploy_role.assume_role_policy.to_json()["Statement"]
+        size = PolicyHelper.get_size(statements=statements)
+        headroom = 1 - size / PolicyHelper.TRUST_POLICY_LIMIT
+
+        message = f"Trust policy size for {role_name}: {size} characters, {headroom:.0%} headroom"
+
+        if headroom < 0.1:
+            cdk.Annotations.of(self).add_warning(message)
+        else:
+            cdk.Annotations.of(self).add_info(message)
@@ -0,0 +1,145 @@
+from aws_cdk import (
+    core as cdk,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_logs as logs,
+    aws_sns as sns,
+)
+from src.helpers.name import NameHelper
+
+
+class BuildStatusConstruct(cdk.Construct):
+    MODES = ("lambda", "topic")
+
+    @property
+    def topic_arn(self):
+        return self.topic.topic_arn if self.topic is not None else None
+
+    @property
+    def consumer_queues_arn(self):
+        # Queues created by the consumers to subscribe to the topic, one per waiting workflow
+        if self.topic is None:
+            return None
+
+        return cdk.Stack.of(self).format_arn(
+            service="sqs",
+            resource=f"{self.consumer_queues_prefix}*",
+            sep="",
+        )
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        codebuild_projects: list,
+        mode: str = "lambda",
+        github_token_parameter: str = "/codebuild/github/token",
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown build status mode '{mode}'")
+
+        self.mode = mode
+        self.topic = None
+        self.consumer_queues_prefix = f"{construct_id}-consumer-"
+
+        rule_id = f"{construct_id}-rule"
+
+        self.rule = events.Rule(
+            self,
+            id=rule_id,
+            description="CodeBuild state and phase changes of the CI/CD projects",
+            event_pattern=events.EventPattern(
+                source=["aws.codebuild"],
+                detail_type=[
+                    "CodeBuild Build State Change",
+                    "CodeBuild Build Phase Change",
+                ],
+                detail={
+                    "project-name": [
+                        codebuild_project.project.project_name for codebuild_project in codebuild_projects
+                    ],
+                },
+            ),
+        )
+        self.rule.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=rule_id))
+
+        if mode == "lambda":
+            self.__add_status_function(construct_id=construct_id, github_token_parameter=github_token_parameter)
+        else:
+            self.__add_status_topic(construct_id=construct_id)
+
+    def __add_status_function(self, construct_id: str, github_token_parameter: str) -> None:
+        function_name = f"{construct_id}-function"
+
+        self.function = lambda_.Function(
+            self,
+            id=function_name,
+            function_name=function_name,
+            description="Posts the CodeBuild builds status to their GitHub commits",
+            code=lambda_.Code.from_asset("src/functions/build_status"),
+            handler="handler.handler",
+            runtime=lambda_.Runtime.PYTHON_3_8,
+            memory_size=128,
+            timeout=cdk.Duration.seconds(30),
+            environment={
+                "GITHUB_TOKEN_PARAMETER": github_token_parameter,
+            },
+        )
+
+        self.function.add_to_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ssm:GetParameter",
+                ],
+                resources=[
+                    cdk.Stack.of(self).format_arn(
+                        service="ssm",
+                        resource="parameter",
+                        resource_name=github_token_parameter.lstrip("/"),
+                    ),
+                ],
+            ),
+        )
+
+        self.log_group = logs.LogGroup(
+            self,
+            id=f"{function_name}-log-group",
+            log_group_name=f"/aws/lambda/{function_name}",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            retention=logs.RetentionDays.TWO_WEEKS,
+        )
+
+        self.rule.add_target(targets.LambdaFunction(handler=self.function))
+
+        self.function.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=function_name))
+        self.function.role.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-role"),
+        )
+        self.function.role.node.find_child("DefaultPolicy").node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-policy"),
+        )
+        self.log_group.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-log-group"),
+        )
+        # The target permission is named after the stack, which differs between the stack layouts
+        permission = self.rule.node.find_child(f"AllowEventRule{cdk.Names.node_unique_id(self.function.node)}")
+        permission.override_logical_id(NameHelper.to_pascal_case(name=f"{function_name}-permission"))
+
+    def __add_status_topic(self, construct_id: str) -> None:
+        topic_name = f"{construct_id}-topic"
+
+        # A topic fans every event out to the queue of each waiting consumer, a shared queue would let concurrent
+        # consumers receive, and delete, the events of each other's builds
+        self.topic = sns.Topic(self, id=topic_name, topic_name=topic_name)
+
+        self.rule.add_target(targets.SnsTopic(topic=self.topic))
+
+        self.topic.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=topic_name))
+        self.topic.node.find_child("Policy").node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{topic_name}-policy"),
+        )
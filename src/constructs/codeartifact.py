@@ -0,0 +1,60 @@
+from aws_cdk import (
+    core as cdk,
+    aws_codeartifact as codeartifact,
+)
+from src.helpers.name import NameHelper
+
+
+class CodeArtifactConstruct(cdk.Construct):
+    # Package formats proxied by the domain, with the public registry of their store repository
+    EXTERNAL_CONNECTIONS = {
+        "npm": "public:npmjs",
+        "pypi": "public:pypi",
+    }
+
+    @property
+    def domain_owner(self):
+        return cdk.Stack.of(self).account
+
+    @property
+    def domain_arn(self):
+        # ARNs are built from the known names, so the build projects do not depend on the domain stack outputs
+        return cdk.Stack.of(self).format_arn(service="codeartifact", resource="domain", resource_name=self.domain_name)
+
+    @property
+    def repository_arns(self):
+        return [
+            cdk.Stack.of(self).format_arn(
+                service="codeartifact",
+                resource="repository",
+                resource_name=f"{self.domain_name}/{repository_name}",
+            )
+            for repository_name in self.repository_names.values()
+        ]
+
+    def __init__(self, scope: cdk.Construct, construct_id: str, domain_name: str) -> None:
+        super().__init__(scope, id=construct_id)
+
+        self.domain_name = domain_name
+
+        self.domain = codeartifact.CfnDomain(self, id=f"{construct_id}-domain", domain_name=domain_name)
+        self.domain.override_logical_id(NameHelper.to_pascal_case(name=f"{construct_id}-domain"))
+
+        self.repository_names = dict()
+
+        for package_format, external_connection in self.EXTERNAL_CONNECTIONS.items():
+            repository_name = f"{package_format}-store"
+
+            repository = codeartifact.CfnRepository(
+                self,
+                id=f"{construct_id}-{repository_name}",
+                domain_name=domain_name,
+                domain_owner=self.domain_owner,
+                repository_name=repository_name,
+                description=f"Proxy of the {external_connection.split(':')[1]} public registry",
+                external_connections=[external_connection],
+            )
+            repository.add_depends_on(self.domain)
+            repository.override_logical_id(NameHelper.to_pascal_case(name=f"{construct_id}-{repository_name}"))
+
+            self.repository_names[package_format] = repository_name
@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+
 from aws_cdk import (
     core as cdk,
     aws_codebuild as codebuild,
@@ -6,14 +8,71 @@ from aws_cdk import (
     aws_logs as logs,
 )
 from src.helpers.buildspec import BuildSpecHelper
+from src.helpers.context import ContextHelper
+from src.helpers.image import ImageHelper
 from src.helpers.name import NameHelper
+from src.helpers.policy import PolicyHelper
+from src.constructs.codeartifact import CodeArtifactConstruct
+from src.constructs.network import CodeBuildVpcConstruct
+from src.constructs.policy import CompactPolicyConstruct
 from src.constructs.s3 import DeployResourcesBucket
 
 
+class CodeBuildFleetConstruct(cdk.Construct):
+    COMPUTE_TYPES = {
+        "SMALL": "BUILD_GENERAL1_SMALL",
+        "MEDIUM": "BUILD_GENERAL1_MEDIUM",
+        "LARGE": "BUILD_GENERAL1_LARGE",
+        "X2_LARGE": "BUILD_GENERAL1_2XLARGE",
+    }
+
+    @property
+    def fleet_arn(self):
+        return self.fleet.get_att("Arn").to_string()
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        base_capacity: int,
+        compute_type: str = "SMALL",
+        architecture: str = "x86_64",
+        overflow_behavior: str = "QUEUE",
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        if overflow_behavior not in ("QUEUE", "ON_DEMAND"):
+            raise ValueError(f"Unknown overflow behavior '{overflow_behavior}' for fleet '{construct_id}'")
+
+        self.fleet_name = f"{construct_id}-fleet"
+        self.compute_type = self.COMPUTE_TYPES[compute_type]
+        self.architecture = architecture
+        self.environment_type = "ARM_CONTAINER" if architecture == "arm64" else "LINUX_CONTAINER"
+
+        # AWS::CodeBuild::Fleet has no L1 construct in this CDK version
+        self.fleet = cdk.CfnResource(
+            self,
+            id=self.fleet_name,
+            type="AWS::CodeBuild::Fleet",
+            properties={
+                "Name": self.fleet_name,
+                "BaseCapacity": base_capacity,
+                "ComputeType": self.compute_type,
+                "EnvironmentType": self.environment_type,
+                "OverflowBehavior": overflow_behavior,
+            },
+        )
+
+        self.fleet.override_logical_id(NameHelper.to_pascal_case(name=self.fleet_name))
+
+
 class CodeBuildConstruct(cdk.Construct):
     @property
     def project_arn(self):
-        return self.project.project_arn
+        # ARNs are built from the known names, so policies can be sized and collapsed at synth time
+        return cdk.Stack.of(self).format_arn(
+            service="codebuild", resource="project", resource_name=self.build_project_name
+        )
 
     @property
     def project_role_arn(self):
@@ -21,7 +80,12 @@ class CodeBuildConstruct(cdk.Construct):
 
     @property
     def log_group_arn(self):
-        return self.log_group.log_group_arn
+        return cdk.Stack.of(self).format_arn(
+            service="logs",
+            resource="log-group",
+            resource_name=f"{self.log_group_name}:*",
+            sep=":",
+        )
 
     @property
     def source_bucket_arn(self):
@@ -31,20 +95,43 @@ class CodeBuildConstruct(cdk.Construct):
         self,
         scope: cdk.Construct,
         construct_id: str,
-        build_spec: str,
+        build_spec: dict,
         description: str,
         build_image: codebuild.LinuxBuildImage = None,
         privileged: bool = False,
         environment_variables: dict = None,
+        cache_modes: list = None,
+        compute_profile: dict = None,
+        fleet: CodeBuildFleetConstruct = None,
+        vpc: CodeBuildVpcConstruct = None,
+        dependency_proxy: CodeArtifactConstruct = None,
     ) -> None:
         super().__init__(scope, id=construct_id)
 
         self.project_name = f"{construct_id}-project"
+        self.build_project_name = construct_id
+        self.log_group_name = f"/aws/codebuild/{self.project_name}"
+        self.batch_enabled = False
+
+        if compute_profile is None:
+            compute_profile = ContextHelper.COMPUTE_PROFILES[ContextHelper.DEFAULT_COMPUTE_PROFILE]
+
+        self.timeout_minutes = compute_profile["timeout"]
+
+        arm_architecture = compute_profile["architecture"] == "arm64"
+        custom_build_image = build_image is not None
+
+        if build_image is None:
+            build_image = (
+                codebuild.LinuxBuildImage.AMAZON_LINUX_2_ARM
+                if arm_architecture
+                else codebuild.LinuxBuildImage.STANDARD_5_0
+            )
 
         self.log_group = logs.LogGroup(
             self,
             id=f"{self.project_name}-log-group",
-            log_group_name=f"/aws/codebuild/{self.project_name}",
+            log_group_name=self.log_group_name,
             removal_policy=cdk.RemovalPolicy.DESTROY,
             retention=logs.RetentionDays.TWO_WEEKS,
         )
@@ -57,23 +144,68 @@ class CodeBuildConstruct(cdk.Construct):
         )
 
         self.build_environment = codebuild.BuildEnvironment(
-            build_image=codebuild.LinuxBuildImage.STANDARD_5_0 if build_image is None else build_image,
-            compute_type=codebuild.ComputeType.SMALL,
+            build_image=build_image,
+            compute_type=getattr(codebuild.ComputeType, compute_profile["compute_type"]),
             privileged=privileged,
         )
 
+        if dependency_proxy is not None:
+            # Read by the codeartifact-login fragment of the composed buildspecs
+            environment_variables = {
+                **(environment_variables if environment_variables is not None else dict()),
+                "CODEARTIFACT_DOMAIN": codebuild.BuildEnvironmentVariable(value=dependency_proxy.domain_name),
+                "CODEARTIFACT_DOMAIN_OWNER": codebuild.BuildEnvironmentVariable(value=dependency_proxy.domain_owner),
+                "CODEARTIFACT_NPM_REPOSITORY": codebuild.BuildEnvironmentVariable(
+                    value=dependency_proxy.repository_names["npm"],
+                ),
+                "CODEARTIFACT_PYPI_REPOSITORY": codebuild.BuildEnvironmentVariable(
+                    value=dependency_proxy.repository_names["pypi"],
+                ),
+            }
+
+        security_groups = None
+
+        if vpc is not None:
+            if fleet is not None:
+                raise ValueError(f"{self.project_name} cannot run both on a fleet and in a VPC")
+
+            security_groups = [vpc.add_project_security_group(project_name=self.project_name)]
+
+            # The global STS endpoint has no VPC endpoint, regional calls go through the STS interface endpoint
+            environment_variables = {
+                **(environment_variables if environment_variables is not None else dict()),
+                "AWS_STS_REGIONAL_ENDPOINTS": codebuild.BuildEnvironmentVariable(value="regional"),
+            }
+
         self.project = codebuild.Project(
             self,
             id=self.project_name,
-            build_spec=codebuild.BuildSpec.from_object_to_yaml(build_spec),
+            build_spec=codebuild.BuildSpec.from_object_to_yaml(BuildSpecHelper.to_object(build_spec)),
             description=description,
             environment=self.build_environment,
             environment_variables=environment_variables,
-            project_name=construct_id,
-            timeout=cdk.Duration.minutes(90),
+            project_name=self.build_project_name,
+            queued_timeout=cdk.Duration.minutes(compute_profile["queued_timeout"]),
+            timeout=cdk.Duration.minutes(self.timeout_minutes),
             logging=self.logging_options,
+            cache=codebuild.Cache.local(*cache_modes) if cache_modes else None,
+            vpc=vpc.vpc if vpc is not None else None,
+            subnet_selection=vpc.subnets if vpc is not None else None,
+            security_groups=security_groups,
         )
 
+        if vpc is not None:
+            self.project.node.find_child("PolicyDocument").node.default_child.override_logical_id(
+                NameHelper.to_pascal_case(name=f"{self.project_name}-vpc-policy"),
+            )
+
+        if arm_architecture and custom_build_image:
+            # Custom images are bound as x86 containers, the image itself must be built for arm64
+            self.project.node.default_child.add_property_override("Environment.Type", "ARM_CONTAINER")
+
+        if fleet is not None:
+            self.__run_on_fleet(fleet=fleet, compute_profile=compute_profile)
+
         self.project.node.default_child.override_logical_id(
             NameHelper.to_pascal_case(name=self.project_name),
         )
@@ -84,108 +216,314 @@ class CodeBuildConstruct(cdk.Construct):
             NameHelper.to_pascal_case(name=f"{self.project_name}-log-group"),
         )
 
-    def add_ecr_pull_permissions(self, ecr_repositories: list):
-        ecr_repo_arns = list()
+        if dependency_proxy is not None:
+            self.add_dependency_proxy_permissions(dependency_proxy=dependency_proxy)
+
+    def __run_on_fleet(self, fleet: CodeBuildFleetConstruct, compute_profile: dict) -> None:
+        if fleet.architecture != compute_profile["architecture"]:
+            raise ValueError(f"Fleet {fleet.fleet_name} architecture does not match {self.project_name} image")
+
+        # The fleet hosts replace the profile compute type, only its timeouts still apply
+        profile_compute_type = CodeBuildFleetConstruct.COMPUTE_TYPES[compute_profile["compute_type"]]
+
+        if fleet.compute_type != profile_compute_type:
+            cdk.Annotations.of(self).add_warning(
+                f"{self.project_name} runs on {fleet.compute_type} hosts of fleet {fleet.fleet_name}, "
+                f"not on the {profile_compute_type} hosts of its compute profile"
+            )
+
+        # Builds run on the fleet hosts, so the project environment must match the fleet one
+        self.project.node.default_child.add_property_override("Environment.ComputeType", fleet.compute_type)
+        self.project.node.default_child.add_property_override("Environment.Type", fleet.environment_type)
+        self.project.node.default_child.add_property_override("Environment.Fleet.FleetArn", fleet.fleet_arn)
+
+    def enable_batch_builds(self) -> None:
+        batch_config = self.project.enable_batch_builds()
+        self.batch_enabled = True
 
-        for ecr_repo in ecr_repositories:
-            ecr_repo_arns.append(ecr_repo.repository_arn)
+        batch_config.role.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-batch-role"),
+        )
+        batch_config.role.node.find_child("DefaultPolicy").node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-batch-role-policy"),
+        )
+
+    def add_s3_cache(self, bucket, prefix: str) -> None:
+        # CodeBuild supports a single cache per project, so an S3 cache replaces any local cache modes
+        self.project.node.default_child.cache = codebuild.CfnProject.ProjectCacheProperty(
+            type="S3",
+            location=f"{bucket.bucket_name}/{prefix}",
+        )
 
-        self.ecr_policy = iam.Policy(
+        self.cache_policy = iam.Policy(
             self,
-            id=f"{self.project_name}-pull-policy",
-            policy_name=NameHelper.to_pascal_case(self.project_name),
+            id=f"{self.project_name}-cache-policy",
+            policy_name=NameHelper.to_pascal_case(f"{self.project_name}-cache-policy"),
             roles=[self.project.role],
         )
 
-        self.ecr_policy.add_statements(
+        self.cache_policy.add_statements(
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
                 actions=[
-                    "ecr:BatchCheckLayerAvailability",
-                    "ecr:GetDownloadUrlForLayer",
-                    "ecr:BatchGetImage",
+                    "s3:GetObject",
+                    "s3:GetObjectVersion",
+                    "s3:PutObject",
                 ],
-                resources=ecr_repo_arns,
-            ),
-        )
-
-        self.ecr_policy.add_statements(
-            iam.PolicyStatement(
-                effect=iam.Effect.ALLOW,
-                actions=[
-                    "ecr:GetAuthorizationToken",
+                resources=[
+                    bucket.arn_for_objects(f"{prefix}/*"),
                 ],
-                resources=["*"],
             ),
         )
 
-        self.ecr_policy.node.default_child.override_logical_id(
-            NameHelper.to_pascal_case(name=f"{self.project_name}-policy"),
+        self.cache_policy.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-cache-policy"),
         )
 
-    def add_ecr_push_permissions(self, ecr_repositories: list):
-        ecr_repo_arns = list()
+    def add_ecr_pull_permissions(self, ecr_repositories: list, wildcard_min_prefix: int = None):
+        self.__add_ecr_policy(
+            policy_id=f"{self.project_name}-pull-policy",
+            actions=[
+                "ecr:BatchCheckLayerAvailability",
+                "ecr:GetDownloadUrlForLayer",
+                "ecr:BatchGetImage",
+            ],
+            ecr_repositories=ecr_repositories,
+            wildcard_min_prefix=wildcard_min_prefix,
+        )
 
-        for ecr_repo in ecr_repositories:
-            ecr_repo_arns.append(ecr_repo.repository_arn)
+    def add_ecr_push_permissions(self, ecr_repositories: list, wildcard_min_prefix: int = None):
+        self.__add_ecr_policy(
+            policy_id=f"{self.project_name}-push-policy",
+            actions=[
+                "ecr:PutImage",
+                "ecr:InitiateLayerUpload",
+                "ecr:UploadLayerPart",
+                "ecr:CompleteLayerUpload",
+                "ecr:BatchCheckLayerAvailability",
+                "ecr:GetDownloadUrlForLayer",
+                "ecr:BatchGetImage",
+                "ecr:DescribeImages",
+            ],
+            ecr_repositories=ecr_repositories,
+            wildcard_min_prefix=wildcard_min_prefix,
+        )
 
-        self.ecr_policy = iam.Policy(
+    def __add_ecr_policy(self, policy_id: str, actions: list, ecr_repositories: list, wildcard_min_prefix: int):
+        self.ecr_policy_construct = CompactPolicyConstruct(
             self,
-            id=f"{self.project_name}-push-policy",
+            construct_id=policy_id,
             policy_name=NameHelper.to_pascal_case(self.project_name),
+            logical_id=NameHelper.to_pascal_case(name=f"{self.project_name}-policy"),
+            statements=[
+                {
+                    "Effect": "Allow",
+                    "Action": actions,
+                    "Resource": [ecr_repo.repository_arn for ecr_repo in ecr_repositories],
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": ["ecr:GetAuthorizationToken"],
+                    "Resource": ["*"],
+                },
+            ],
             roles=[self.project.role],
+            # The project role default policy and its other inline policies share the rest of the role limit
+            inline_limit=PolicyHelper.ROLE_INLINE_LIMIT // 2,
+            wildcard_min_prefix=wildcard_min_prefix,
         )
+        self.ecr_policy = self.ecr_policy_construct.policy
+
+    def add_pull_through_cache_permissions(self, repository_prefixes: list) -> None:
+        current_stack = cdk.Stack.of(self)
 
-        self.ecr_policy.add_statements(
+        self.pull_through_cache_policy = iam.Policy(
+            self,
+            id=f"{self.project_name}-pull-through-cache-policy",
+            policy_name=NameHelper.to_pascal_case(f"{self.project_name}-pull-through-cache-policy"),
+            roles=[self.project.role],
+        )
+
+        self.pull_through_cache_policy.add_statements(
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
                 actions=[
-                    "ecr:PutImage",
-                    "ecr:InitiateLayerUpload",
-                    "ecr:UploadLayerPart",
-                    "ecr:CompleteLayerUpload",
+                    "ecr:CreateRepository",
+                    "ecr:BatchImportUpstreamImage",
                     "ecr:BatchCheckLayerAvailability",
                     "ecr:GetDownloadUrlForLayer",
                     "ecr:BatchGetImage",
                 ],
-                resources=ecr_repo_arns,
+                resources=[
+                    current_stack.format_arn(service="ecr", resource="repository", resource_name=f"{prefix}/*")
+                    for prefix in repository_prefixes
+                ],
             ),
         )
 
-        self.ecr_policy.add_statements(
+        self.pull_through_cache_policy.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-pull-through-cache-policy"),
+        )
+
+    def add_dependency_proxy_permissions(self, dependency_proxy: CodeArtifactConstruct) -> None:
+        self.dependency_proxy_policy = iam.Policy(
+            self,
+            id=f"{self.project_name}-dependency-proxy-policy",
+            policy_name=NameHelper.to_pascal_case(f"{self.project_name}-dependency-proxy-policy"),
+            roles=[self.project.role],
+        )
+
+        self.dependency_proxy_policy.add_statements(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "codeartifact:GetAuthorizationToken",
+                ],
+                resources=[dependency_proxy.domain_arn],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "codeartifact:ReadFromRepository",
+                    "codeartifact:GetRepositoryEndpoint",
+                ],
+                resources=dependency_proxy.repository_arns,
+            ),
+            # CodeArtifact authorization tokens are issued as STS bearer tokens
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
                 actions=[
-                    "ecr:GetAuthorizationToken",
+                    "sts:GetServiceBearerToken",
                 ],
                 resources=["*"],
+                conditions={
+                    "StringEquals": {
+                        "sts:AWSServiceName": "codeartifact.amazonaws.com",
+                    },
+                },
             ),
         )
 
-        self.ecr_policy.node.default_child.override_logical_id(
-            NameHelper.to_pascal_case(name=f"{self.project_name}-policy"),
+        self.dependency_proxy_policy.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-dependency-proxy-policy"),
         )
 
 
 class BuildImageCodeBuildProject(CodeBuildConstruct):
-    def __init__(self, scope: cdk.Construct, ecr_repositories: list, termination_protection: bool) -> None:
+    SOURCE_HASH_SCRIPT_LOCATION = "src/scripts/image_source_hash.py"
+    IMAGE_INDEX_SCRIPT_LOCATION = "src/scripts/image_index.py"
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        ecr_repositories: list,
+        termination_protection: bool,
+        cache_type: str = "local",
+        compute_profile: dict = None,
+        batch_type: str = None,
+        image_dependencies: dict = None,
+        fast_buildspec: bool = False,
+        fleet: CodeBuildFleetConstruct = None,
+        vpc: CodeBuildVpcConstruct = None,
+        incremental: bool = False,
+        source_transfer_acceleration: bool = False,
+        source_intelligent_tiering: bool = False,
+        source_abort_multipart_upload_days: int = 1,
+        source_retention_days: int = 30,
+        sources_prefix: str = None,
+        policy_wildcard_min_prefix: int = None,
+        dependency_proxy: CodeArtifactConstruct = None,
+        parameters_path: str = None,
+        image_index_path: str = None,
+    ) -> None:
         project_name = "build-images"
+        self.sources_prefix = sources_prefix
+
+        image_dependencies = self.__get_image_dependencies(batch_type=batch_type, image_dependencies=image_dependencies)
+
+        fragments = ["tool-versions", "ecr-login"]
+        parameters = {"python": "python"}
+
+        if incremental:
+            fragments.append("source-hash")
+            with open(self.SOURCE_HASH_SCRIPT_LOCATION, "r") as script_file:
+                parameters["script"] = script_file.read()
+
+        if dependency_proxy is not None:
+            fragments.append("codeartifact-login")
+
+        environment_variables = None
+
+        if parameters_path is not None:
+            # Read by the buildspec to publish the image digests, and the index shards, under the parameters path
+            environment_variables = {
+                "IMAGES_PARAMETERS_PATH": codebuild.BuildEnvironmentVariable(value=parameters_path)
+            }
+
+        if image_index_path is not None:
+            fragments.append("image-index")
+            with open(self.IMAGE_INDEX_SCRIPT_LOCATION, "r") as script_file:
+                parameters["index_script"] = script_file.read()
+            environment_variables = {
+                **(environment_variables if environment_variables is not None else dict()),
+                "IMAGE_INDEX_PATH": codebuild.BuildEnvironmentVariable(value=image_index_path),
+            }
+
+        build_spec = BuildSpecHelper.compose(
+            file_location="src/config/build-docker-image-buildspec.yml",
+            fragments=fragments,
+            parameters=parameters,
+            fast=fast_buildspec,
+        )
+
+        if batch_type is not None:
+            build_spec = BuildSpecHelper.merge(
+                buildspec=build_spec,
+                overrides={
+                    "batch": self.__get_batch_spec(
+                        batch_type=batch_type,
+                        ecr_repositories=ecr_repositories,
+                        image_dependencies=image_dependencies,
+                    ),
+                },
+            )
 
         super().__init__(
             scope,
             project_name,
             description=f"CodeBuild {project_name} for building deploy images",
-            build_spec=BuildSpecHelper.get_buildspec(file_location="src/config/build-docker-image-buildspec.yml"),
+            build_spec=build_spec,
             privileged=True,
+            environment_variables=environment_variables,
+            cache_modes=(
+                [
+                    codebuild.LocalCacheMode.DOCKER_LAYER,
+                    codebuild.LocalCacheMode.SOURCE,
+                    codebuild.LocalCacheMode.CUSTOM,
+                ]
+                if cache_type == "local"
+                else None
+            ),
+            compute_profile=compute_profile,
+            fleet=fleet,
+            vpc=vpc,
+            dependency_proxy=dependency_proxy,
         )
 
-        self.add_ecr_push_permissions(ecr_repositories=ecr_repositories)
+        self.add_ecr_push_permissions(
+            ecr_repositories=ecr_repositories,
+            wildcard_min_prefix=policy_wildcard_min_prefix,
+        )
 
         self.source_bucket_construct = DeployResourcesBucket(
             self,
             construct_id=f"{self.project_name}-bucket",
             bucket_suffix=f"{self.project_name}-source-bucket",
             termination_protection=termination_protection,
+            transfer_acceleration=source_transfer_acceleration,
+            intelligent_tiering=source_intelligent_tiering,
+            abort_incomplete_multipart_upload_days=source_abort_multipart_upload_days,
+            expiration_days=source_retention_days,
         )
         self.source_bucket = self.source_bucket_construct.bucket
 
@@ -216,17 +554,165 @@ class BuildImageCodeBuildProject(CodeBuildConstruct):
             NameHelper.to_pascal_case(name=f"{self.project_name}-s3-policy"),
         )
 
-    def add_bucket_policy(self, principals: list) -> None:
+        self.ssm_policy = iam.Policy(
+            self,
+            id=f"{self.project_name}-ssm-policy",
+            policy_name=NameHelper.to_pascal_case(f"{self.project_name}-ssm-policy"),
+            roles=[self.project.role],
+        )
+
+        self.ssm_policy.add_statements(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ssm:PutParameter",
+                ],
+                resources=[ecr_repo.image_digest_parameter_arn for ecr_repo in ecr_repositories],
+            ),
+        )
+
+        if image_index_path is not None:
+            self.__add_image_index_permissions(parameters_path=parameters_path, image_index_path=image_index_path)
+
+        self.ssm_policy.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{self.project_name}-ssm-policy"),
+        )
+
+        if cache_type == "s3":
+            cache_prefix = "cache"
+            self.source_bucket_construct.add_cache_lifecycle_rule(prefix=cache_prefix)
+            self.add_s3_cache(bucket=self.source_bucket, prefix=cache_prefix)
+
+        if batch_type is not None:
+            self.enable_batch_builds()
+
+    def __add_image_index_permissions(self, parameters_path: str, image_index_path: str) -> None:
+        current_stack = cdk.Stack.of(self)
+
+        # The index is rebuilt from every image digest under the parameters path
+        self.ssm_policy.add_statements(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ssm:GetParametersByPath",
+                ],
+                resources=[
+                    current_stack.format_arn(
+                        service="ssm", resource="parameter", resource_name=parameters_path.strip("/")
+                    ),
+                ],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ssm:PutParameter",
+                    "ssm:DeleteParameters",
+                ],
+                resources=[
+                    current_stack.format_arn(
+                        service="ssm",
+                        resource="parameter",
+                        resource_name=f"{image_index_path.strip('/')}/*",
+                    ),
+                ],
+            ),
+        )
+
+    @staticmethod
+    def __get_image_dependencies(batch_type: str, image_dependencies: dict) -> dict:
+        if image_dependencies is None:
+            return dict()
+
+        # Dependency edges only exist in build graphs, other builds would silently ignore them
+        if batch_type != "build-graph" and any(len(dependencies) > 0 for dependencies in image_dependencies.values()):
+            raise ValueError("Image dependencies are only supported by build-graph batch builds")
+
+        return image_dependencies
+
+    @staticmethod
+    def __get_batch_spec(batch_type: str, ecr_repositories: list, image_dependencies: dict) -> dict:
+        repository_names = [ecr_repo.repository_name for ecr_repo in ecr_repositories]
+
+        for repository_name, dependencies in image_dependencies.items():
+            for dependency in [repository_name, *dependencies]:
+                if dependency not in repository_names:
+                    raise ValueError(f"Image dependency '{dependency}' is not one of the built repositories")
+
+        if batch_type == "build-matrix":
+            return {
+                "fast-fail": False,
+                "build-matrix": {
+                    "dynamic": {
+                        "env": {
+                            "variables": {
+                                "IMAGE_REPO_NAME": repository_names,
+                            },
+                        },
+                    },
+                },
+            }
+
+        if batch_type not in ("build-list", "build-graph"):
+            raise ValueError(f"Unknown batch type '{batch_type}'")
+
+        builds = list()
+
+        for repository_name in repository_names:
+            build = {
+                "identifier": NameHelper.to_snake_case(name=repository_name),
+                "env": {
+                    "variables": {
+                        "IMAGE_REPO_NAME": repository_name,
+                    },
+                },
+            }
+
+            if len(image_dependencies.get(repository_name, list())) > 0:
+                build["depend-on"] = [
+                    NameHelper.to_snake_case(name=dependency) for dependency in image_dependencies[repository_name]
+                ]
+
+            builds.append(build)
+
+        return {
+            "fast-fail": False,
+            batch_type: builds,
+        }
+
+    def add_bucket_policy(self, principals: list, scope: cdk.Construct = None) -> None:
         self.source_bucket_construct.add_restricted_bucket_policy(
             principals_arns=principals,
             put_object_permission=True,
+            put_object_prefix=self.sources_prefix,
+            scope=scope,
         )
 
 
 class DeployCodeBuildProject(CodeBuildConstruct):
+    CREDENTIALS_SCRIPT_LOCATION = "src/scripts/assume_role_credentials.py"
+    CHANGED_FUNCTIONS_SCRIPT_LOCATION = "src/scripts/changed_functions.py"
+    DESTROY_SCRIPT_LOCATION = "src/scripts/destroy_stage.py"
+
+    # Serverless packaging directory, npm cache and deploy states of the change detection mode
+    SERVERLESS_CACHE_PATHS = [
+        "/opt/api/.serverless/**/*",
+        "/opt/api/.serverless-state/**/*",
+        "/root/.npm/**/*",
+    ]
+
+    # Assuming a role from the project role credentials is role chaining, which STS limits to one hour
+    MAX_SESSION_DURATION = 3600
+
+    # The InfrastructureDeploy role trusts every role under this path
+    ROLE_PATH = "/codebuild-deploy/"
+
     @property
     def image_ssm_arn(self):
-        return self.image_repo_ssm.parameter_arn
+        return cdk.Stack.of(self).format_arn(
+            service="ssm",
+            resource="parameter",
+            resource_name=self.image_ssm_parameter_name.lstrip("/"),
+        )
 
     def __init__(
         self,
@@ -234,19 +720,113 @@ class DeployCodeBuildProject(CodeBuildConstruct):
         ecr_repository: str,
         deploy_accounts: list,
         action: str,
+        compute_profile: dict = None,
+        fast_buildspec: bool = False,
+        pin_image_digest: bool = False,
+        image_manifest: str = None,
+        fleet: CodeBuildFleetConstruct = None,
+        vpc: CodeBuildVpcConstruct = None,
+        fan_out: bool = False,
+        fan_out_regions: list = None,
+        max_concurrent_builds: int = None,
+        fail_fast: bool = True,
+        session_duration: int = 3600,
+        serverless_cache: bool = False,
+        changed_functions: bool = False,
+        service_tag: str = None,
+        app_stacks: list = None,
+        dependency_proxy: CodeArtifactConstruct = None,
+        parameters_path: str = None,
     ) -> None:
         project_name = ecr_repository.repository_name
 
+        if changed_functions and not serverless_cache:
+            raise ValueError(f"{project_name} change detection needs the serverless cache to keep its deploy states")
+
+        build_spec = self.__get_build_spec(
+            action=action,
+            fast_buildspec=fast_buildspec,
+            session_duration=session_duration,
+            serverless_cache=serverless_cache,
+            changed_functions=changed_functions,
+            dependency_proxy=dependency_proxy is not None,
+        )
+
+        if fan_out:
+            fan_out_builds = self.__get_fan_out_builds(
+                deploy_accounts=deploy_accounts,
+                regions=fan_out_regions if fan_out_regions is not None else list(),
+            )
+            build_spec = BuildSpecHelper.merge(
+                buildspec=build_spec,
+                overrides={
+                    "batch": {
+                        "fast-fail": fail_fast,
+                        "build-list": fan_out_builds,
+                    },
+                },
+            )
+
         build_image = codebuild.LinuxBuildImage.from_ecr_repository(repository=ecr_repository.repository)
 
+        environment_variables = None
+
+        if action == "destroy" and service_tag is not None:
+            # The stage resources left behind by the stack are found by their service tag, the stacks of the app
+            # share the stage tag, so their resources are skipped
+            environment_variables = {
+                "SERVICE": codebuild.BuildEnvironmentVariable(value=service_tag),
+                "APP_STACKS": codebuild.BuildEnvironmentVariable(
+                    value=",".join(app_stacks if app_stacks is not None else list()),
+                ),
+            }
+
         super().__init__(
             scope,
             f"{project_name}-{action}",
             description=f"CodeBuild for {action} {project_name} repository",
-            build_spec=BuildSpecHelper.get_buildspec(file_location=f"src/config/{action}-sls-buildspec.yml"),
+            build_spec=build_spec,
             build_image=build_image,
+            environment_variables=environment_variables,
+            cache_modes=[codebuild.LocalCacheMode.CUSTOM] if serverless_cache else None,
+            compute_profile=compute_profile,
+            fleet=fleet,
+            vpc=vpc,
+            dependency_proxy=dependency_proxy,
         )
         self.add_ecr_pull_permissions(ecr_repositories=[ecr_repository])
+        self.project.role.node.default_child.add_property_override("Path", self.ROLE_PATH)
+
+        if fan_out:
+            self.enable_batch_builds()
+            self.project.node.default_child.add_property_override(
+                "BuildBatchConfig.Restrictions.MaximumBuildsAllowed",
+                len(fan_out_builds),
+            )
+
+        if max_concurrent_builds is not None:
+            # CodeBuild has no concurrency limit per batch, this one is shared by every build of the project,
+            # batch or not, so two fan-out batches started together split it
+            self.project.node.default_child.concurrent_build_limit = max_concurrent_builds
+
+        if pin_image_digest:
+            # The digest pushed by build-images is resolved when the stack is deployed
+            image_digest = ssm.StringParameter.value_for_string_parameter(
+                self,
+                parameter_name=ecr_repository.image_digest_parameter_name,
+            )
+            self.project.node.default_child.add_property_override(
+                "Environment.Image",
+                ecr_repository.repository.repository_uri_for_digest(image_digest),
+            )
+
+        self.expected_image_size = None
+
+        if image_manifest is not None:
+            self.expected_image_size = ImageHelper.get_image_size(file_location=image_manifest)
+            cdk.Annotations.of(self).add_info(
+                f"Expected image size for {self.project_name}: {self.expected_image_size / 1024 / 1024:.1f} MB"
+            )
 
         if len(deploy_accounts) > 0:
             policy_name = f"{project_name}-{action}-policy"
@@ -280,12 +860,96 @@ class DeployCodeBuildProject(CodeBuildConstruct):
 
         current_stack = cdk.Stack.of(self)
 
+        # The hierarchical layout keeps every image parameter under the parameters path
+        self.image_ssm_parameter_name = (
+            f"{parameters_path}/{project_name}/{action}/image-base"
+            if parameters_path is not None
+            else f"/codebuild/{project_name}-{action}/image-base"
+        )
         self.image_repo_ssm = ssm.StringParameter(
             scope=self,
             id=f"{project_name}-codebuild-image-base",
-            parameter_name=f"/codebuild/{project_name}-{action}/image-base",
+            parameter_name=self.image_ssm_parameter_name,
             string_value=f"{current_stack.account}.dkr.ecr.{current_stack.region}.amazonaws.com/{project_name}",
         )
         self.image_repo_ssm.node.default_child.override_logical_id(
             NameHelper.to_pascal_case(name=f"{project_name}-{action}-ssm-image-base"),
         )
+
+    @staticmethod
+    def __get_build_spec(
+        action: str,
+        fast_buildspec: bool,
+        session_duration: int,
+        serverless_cache: bool,
+        changed_functions: bool,
+        dependency_proxy: bool,
+    ) -> Mapping:
+        if session_duration > DeployCodeBuildProject.MAX_SESSION_DURATION:
+            raise ValueError("Deploy role sessions are chained, they cannot last more than one hour")
+
+        fragments = ["tool-versions", "assume-role"]
+        parameters = {"session_duration": session_duration}
+
+        with open(DeployCodeBuildProject.CREDENTIALS_SCRIPT_LOCATION, "r") as script_file:
+            parameters["credentials_script"] = script_file.read()
+
+        # Only deploys can be narrowed to some functions
+        if changed_functions and action == "deploy":
+            fragments.append("changed-functions")
+            with open(DeployCodeBuildProject.CHANGED_FUNCTIONS_SCRIPT_LOCATION, "r") as script_file:
+                parameters["changed_functions_script"] = script_file.read()
+
+        if action == "destroy":
+            fragments.append("destroy-stage")
+            with open(DeployCodeBuildProject.DESTROY_SCRIPT_LOCATION, "r") as script_file:
+                parameters["destroy_script"] = script_file.read()
+
+        if dependency_proxy:
+            fragments.append("codeartifact-login")
+
+        build_spec = BuildSpecHelper.compose(
+            file_location=f"src/config/{action}-sls-buildspec.yml",
+            fragments=fragments,
+            parameters=parameters,
+            fast=fast_buildspec,
+        )
+
+        if serverless_cache:
+            build_spec = BuildSpecHelper.merge(
+                buildspec=build_spec,
+                overrides={"cache": {"paths": DeployCodeBuildProject.SERVERLESS_CACHE_PATHS}},
+            )
+
+        return build_spec
+
+    @staticmethod
+    def __get_fan_out_builds(deploy_accounts: list, regions: list) -> list:
+        builds = list()
+
+        # Accounts listed in both the context and the manifest get a single build, identifiers must be unique
+        for deploy_account in dict.fromkeys(deploy_accounts):
+            if cdk.Token.is_unresolved(deploy_account):
+                # The stack account keeps the AWS_ACCOUNT_ID given when the batch is started
+                account_variables = dict()
+                account_identifier = "current_account"
+            else:
+                account_variables = {"AWS_ACCOUNT_ID": deploy_account}
+                account_identifier = f"account_{deploy_account}"
+
+            for region in regions if len(regions) > 0 else [None]:
+                variables = dict(account_variables)
+                identifier = account_identifier
+
+                if region is not None:
+                    variables["REGION"] = region
+                    identifier = f"{identifier}_{NameHelper.to_snake_case(name=region)}"
+
+                build = {"identifier": identifier}
+
+                if len(variables) > 0:
+                    build["env"] = {"variables": variables}
+
+                builds.append(build)
+
+        return builds
@@ -2,6 +2,7 @@ from aws_cdk import (
     core as cdk,
     aws_ecr as ecr,
 )
+from src.helpers.lifecycle import LifecyclePolicyHelper
 from src.helpers.name import NameHelper
 
 
@@ -12,17 +13,34 @@ class ECRConstruct(cdk.Construct):
 
     @property
     def repository_arn(self):
-        return self.repository.repository_arn
+        # Built from the known name, so policies can be sized and collapsed at synth time
+        return cdk.Stack.of(self).format_arn(service="ecr", resource="repository", resource_name=self.repo_name)
+
+    @property
+    def image_digest_parameter_name(self):
+        return f"{self.parameters_path}/{self.repo_name}/image-digest"
+
+    @property
+    def image_digest_parameter_arn(self):
+        return cdk.Stack.of(self).format_arn(
+            service="ssm",
+            resource="parameter",
+            resource_name=self.image_digest_parameter_name.lstrip("/"),
+        )
 
     def __init__(
         self,
         scope,
         construct_id: str,
         termination_protection: bool,
+        lifecycle_policy: dict = None,
+        protect_image_digest: bool = False,
+        parameters_path: str = None,
     ) -> None:
         super().__init__(scope, id=construct_id)
 
         self.repo_name = construct_id
+        self.parameters_path = parameters_path if parameters_path is not None else "/codebuild"
 
         repo_id = f"{construct_id}-ecr-repo"
 
@@ -33,11 +51,14 @@ class ECRConstruct(cdk.Construct):
             image_tag_mutability=ecr.TagMutability.IMMUTABLE,
             repository_name=construct_id,
         )
-        self.repository.add_lifecycle_rule(
-            description="CI lifecycle rule",
-            max_image_age=cdk.Duration.days(1),
-            tag_status=ecr.TagStatus.TAGGED,
-            tag_prefix_list=["ci_"],
+
+        # Rendered by the helper instead of the L2 lifecycle rules, which only validate the tag status ordering
+        self.lifecycle_rules = LifecyclePolicyHelper.get_rules(
+            policy=lifecycle_policy if lifecycle_policy is not None else LifecyclePolicyHelper.get_policy(),
+            protect_image_digest=protect_image_digest,
+        )
+        self.repository.node.default_child.lifecycle_policy = ecr.CfnRepository.LifecyclePolicyProperty(
+            lifecycle_policy_text=LifecyclePolicyHelper.render(rules=self.lifecycle_rules),
         )
 
         self.repository.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=repo_id))
@@ -47,3 +68,78 @@ class ECRConstruct(cdk.Construct):
     def __set_delete_retention_policy(self, termination_protection: bool) -> None:
         if not termination_protection:
             self.repository.node.find_child("Resource").cfn_options.deletion_policy = cdk.CfnDeletionPolicy.DELETE
+
+
+class ECRRegistryConstruct(cdk.Construct):
+    # Rules of a registry replication configuration
+    MAX_REPLICATION_RULES = 10
+
+    def __init__(self, scope: cdk.Construct, construct_id: str) -> None:
+        super().__init__(scope, id=construct_id)
+
+        self.pull_through_cache_prefixes = list()
+
+    def add_pull_through_cache_rules(self, upstream_registries: dict) -> None:
+        # AWS::ECR::PullThroughCacheRule has no L1 construct in this CDK version
+        for repository_prefix, upstream_registry_url in upstream_registries.items():
+            rule = cdk.CfnResource(
+                self,
+                id=f"{repository_prefix}-pull-through-cache-rule",
+                type="AWS::ECR::PullThroughCacheRule",
+                properties={
+                    "EcrRepositoryPrefix": repository_prefix,
+                    "UpstreamRegistryUrl": upstream_registry_url,
+                },
+            )
+            rule.override_logical_id(NameHelper.to_pascal_case(name=f"{repository_prefix}-pull-through-cache-rule"))
+
+            self.pull_through_cache_prefixes.append(repository_prefix)
+
+    def add_replication(self, repository_regions: dict) -> None:
+        current_stack = cdk.Stack.of(self)
+
+        # One rule per distinct set of destination regions, filtering the repositories replicated to them
+        rules = dict()
+
+        for repository_name, regions in repository_regions.items():
+            destination_regions = tuple(sorted(set(region for region in regions if region != current_stack.region)))
+
+            if len(destination_regions) > 0:
+                rules.setdefault(destination_regions, list()).append(repository_name)
+
+        if len(rules) == 0:
+            return
+
+        if len(rules) > self.MAX_REPLICATION_RULES:
+            raise ValueError(
+                f"ECR replication needs {len(rules)} rules for the services regions, "
+                f"over the limit of {self.MAX_REPLICATION_RULES}"
+            )
+
+        replication = ecr.CfnReplicationConfiguration(
+            self,
+            id="replication-configuration",
+            replication_configuration=ecr.CfnReplicationConfiguration.ReplicationConfigurationProperty(
+                rules=[
+                    ecr.CfnReplicationConfiguration.ReplicationRuleProperty(
+                        destinations=[
+                            ecr.CfnReplicationConfiguration.ReplicationDestinationProperty(
+                                region=region,
+                                registry_id=current_stack.account,
+                            )
+                            for region in regions
+                        ],
+                    )
+                    for regions in rules
+                ],
+            ),
+        )
+
+        for rule_number, repository_names in enumerate(rules.values()):
+            # Repository filters are not modelled by the L1 construct of this CDK version
+            replication.add_property_override(
+                f"ReplicationConfiguration.Rules.{rule_number}.RepositoryFilters",
+                [{"Filter": name, "FilterType": "PREFIX_MATCH"} for name in repository_names],
+            )
+
+        replication.override_logical_id(NameHelper.to_pascal_case(name="ecr-replication-configuration"))
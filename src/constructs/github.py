@@ -3,7 +3,11 @@ from aws_cdk import (
     aws_iam as iam,
     aws_ssm as ssm,
 )
+from src.constructs.policy import CompactPolicyConstruct
+from src.constructs.s3 import S3Construct
+from src.constructs.preview_stages import PreviewStagesConstruct
 from src.helpers.name import NameHelper
+from src.helpers.policy import PolicyHelper
 
 
 class GithubConstruct(cdk.Construct):
@@ -18,6 +22,14 @@ class GithubConstruct(cdk.Construct):
         codebuild_logs: list,
         codebuild_sources_arns: list,
         images_ssm_parameters_arns: list,
+        codebuild_batch_arns: list = None,
+        poll_build_status: bool = True,
+        build_status_topic_arn: str = None,
+        build_status_queues_arn: str = None,
+        codebuild_sources_prefix: str = None,
+        preview_stages_event_bus_arn: str = None,
+        wildcard_min_prefix: int = None,
+        images_parameters_path: str = None,
     ) -> None:
         construct_id = "github"
         super().__init__(scope, id=construct_id)
@@ -50,66 +62,177 @@ class GithubConstruct(cdk.Construct):
             # type=ssm.ParameterType.SECURE_STRING,  --> CloudFormation does not support secure SSM parameters
         )
 
-        self.user_permissions = iam.Policy(
-            scope=self,
-            id=f"{construct_id}-user-permissions",
-            policy_name=f"{codebuild_name}Policy",
+        statements = self.__get_build_statements(
+            codebuild_arns=codebuild_arns,
+            codebuild_logs=codebuild_logs,
+            codebuild_batch_arns=codebuild_batch_arns,
+            poll_build_status=poll_build_status,
+            build_status_topic_arn=build_status_topic_arn,
+            build_status_queues_arn=build_status_queues_arn,
         )
 
-        self.user_permissions.add_statements(
-            iam.PolicyStatement(
-                effect=iam.Effect.ALLOW,
-                actions=[
-                    "codebuild:StartBuild",
-                    "codebuild:BatchGetBuilds",
-                ],
-                resources=codebuild_arns,
-            ),
+        # Pull request workflows close their preview stage once the pull request is closed
+        if preview_stages_event_bus_arn is not None:
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": ["events:PutEvents"],
+                    "Resource": [preview_stages_event_bus_arn],
+                    "Condition": {
+                        "StringEquals": {
+                            "events:source": PreviewStagesConstruct.CLOSED_STAGE_SOURCE,
+                        },
+                    },
+                }
+            )
+
+        statements.extend(
+            self.__get_sources_statements(
+                codebuild_sources_arns=codebuild_sources_arns,
+                codebuild_sources_prefix=codebuild_sources_prefix,
+            )
         )
-        self.user_permissions.add_statements(
-            iam.PolicyStatement(
-                effect=iam.Effect.ALLOW,
-                actions=[
-                    "logs:GetLogEvents",
-                ],
-                resources=codebuild_logs,
-            ),
+
+        if images_parameters_path is not None:
+            # A single GetParametersByPath call reads every image parameter and the image index shards
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": ["ssm:GetParameter", "ssm:GetParameters", "ssm:GetParametersByPath"],
+                    "Resource": [
+                        cdk.Stack.of(self).format_arn(service="ssm", resource="parameter", resource_name=resource_name)
+                        for resource_name in [
+                            images_parameters_path.strip("/"),
+                            f"{images_parameters_path.strip('/')}/*",
+                        ]
+                    ],
+                }
+            )
+        elif len(images_ssm_parameters_arns) > 0:
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": ["ssm:GetParameter", "ssm:GetParameters"],
+                    "Resource": images_ssm_parameters_arns,
+                }
+            )
+
+        # Users have the smallest inline policy limit, every project adds its ARNs to the bot policy
+        self.user_policy = CompactPolicyConstruct(
+            self,
+            construct_id=f"{construct_id}-user-permissions",
+            policy_name=f"{codebuild_name}Policy",
+            logical_id=f"{logical_name}Policy",
+            statements=statements,
+            users=[self.codebuild_user],
+            inline_limit=PolicyHelper.USER_INLINE_LIMIT,
+            wildcard_min_prefix=wildcard_min_prefix,
         )
+        self.user_permissions = self.user_policy.policy
+
+        self.codebuild_user.node.default_child.override_logical_id(logical_name)
+        self.access_keys.override_logical_id(f"{logical_name}AccessKeys")
+        self.ssm_access_keys.node.default_child.override_logical_id(f"{logical_name}SSMAccessKeys")
+
+    @staticmethod
+    def __get_build_statements(
+        codebuild_arns: list,
+        codebuild_logs: list,
+        codebuild_batch_arns: list,
+        poll_build_status: bool,
+        build_status_topic_arn: str,
+        build_status_queues_arn: str,
+    ) -> list:
+        # Without polling the bot gets the builds status from the build status stream
+        statements = [
+            {
+                "Effect": "Allow",
+                "Action": (
+                    ["codebuild:StartBuild", "codebuild:BatchGetBuilds"]
+                    if poll_build_status
+                    else ["codebuild:StartBuild"]
+                ),
+                "Resource": codebuild_arns,
+            },
+        ]
+
+        if codebuild_batch_arns is not None and len(codebuild_batch_arns) > 0:
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": (
+                        ["codebuild:StartBuildBatch", "codebuild:BatchGetBuildBatches"]
+                        if poll_build_status
+                        else ["codebuild:StartBuildBatch"]
+                    ),
+                    "Resource": codebuild_batch_arns,
+                }
+            )
+
+        if poll_build_status:
+            statements.append({"Effect": "Allow", "Action": ["logs:GetLogEvents"], "Resource": codebuild_logs})
+
+        # Each waiting workflow subscribes its own queue to the build status topic, and deletes it once done
+        if build_status_topic_arn is not None:
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": ["sns:Subscribe", "sns:Unsubscribe"],
+                    "Resource": [build_status_topic_arn],
+                }
+            )
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "sqs:CreateQueue",
+                        "sqs:DeleteQueue",
+                        "sqs:GetQueueAttributes",
+                        "sqs:SetQueueAttributes",
+                        "sqs:ReceiveMessage",
+                        "sqs:DeleteMessage",
+                    ],
+                    "Resource": [build_status_queues_arn],
+                }
+            )
+
+        return statements
+
+    @staticmethod
+    def __get_sources_statements(codebuild_sources_arns: list, codebuild_sources_prefix: str) -> list:
         sources_arns = list()
 
         for codebuild_source_arn in codebuild_sources_arns:
             sources_arns.append(codebuild_source_arn)
             sources_arns.append(f"{codebuild_source_arn}/*")
 
-        self.user_permissions.add_statements(
-            iam.PolicyStatement(
-                effect=iam.Effect.ALLOW,
-                actions=[
-                    "s3:PutObject",
-                    "s3:GetObject",
-                    "s3:GetObjectVersion",
-                    "s3:ListBucket",
-                    "s3:ListBucketVersions",
-                ],
-                resources=sources_arns,
-            ),
-        )
+        read_actions = [
+            "s3:GetObject",
+            "s3:GetObjectVersion",
+            "s3:ListBucket",
+            "s3:ListBucketVersions",
+        ]
 
-        if len(images_ssm_parameters_arns) > 0:
-            self.user_permissions.add_statements(
-                iam.PolicyStatement(
-                    effect=iam.Effect.ALLOW,
-                    actions=[
-                        "ssm:GetParameter",
-                        "ssm:GetParameters",
-                    ],
-                    resources=images_ssm_parameters_arns,
+        # With a sources prefix the build contexts can only be uploaded under <prefix>/<owner>/<repository>/<commit>
+        statements = [
+            {
+                "Effect": "Allow",
+                "Action": (
+                    [*S3Construct.PUT_OBJECT_ACTIONS, *read_actions]
+                    if codebuild_sources_prefix is None
+                    else read_actions
                 ),
-            )
+                "Resource": sources_arns,
+            },
+        ]
 
-        self.user_permissions.attach_to_user(user=self.codebuild_user)
+        if codebuild_sources_prefix is not None:
+            statements.append(
+                {
+                    "Effect": "Allow",
+                    "Action": S3Construct.PUT_OBJECT_ACTIONS,
+                    "Resource": [f"{arn}/{codebuild_sources_prefix}/*" for arn in codebuild_sources_arns],
+                }
+            )
 
-        self.codebuild_user.node.default_child.override_logical_id(logical_name)
-        self.access_keys.override_logical_id(f"{logical_name}AccessKeys")
-        self.ssm_access_keys.node.default_child.override_logical_id(f"{logical_name}SSMAccessKeys")
-        self.user_permissions.node.default_child.override_logical_id(f"{logical_name}Policy")
+        return statements
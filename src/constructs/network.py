@@ -0,0 +1,153 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+)
+from src.helpers.name import NameHelper
+
+
+class CodeBuildVpcConstruct(cdk.Construct):
+    # Services the builds reach from the VPC private subnets without going through the NAT gateways
+    INTERFACE_ENDPOINTS = {
+        "ecr-api": ec2.InterfaceVpcEndpointAwsService.ECR,
+        "ecr-dkr": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+        "sts": ec2.InterfaceVpcEndpointAwsService.STS,
+        "ssm": ec2.InterfaceVpcEndpointAwsService.SSM,
+        "logs": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+    }
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        principal_accounts: list,
+        vpc_id: str = None,
+        availability_zones: list = None,
+        private_subnet_ids: list = None,
+        private_subnet_route_table_ids: list = None,
+        max_azs: int = 2,
+        nat_gateways: int = 1,
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        self.interface_endpoints = dict()
+
+        if vpc_id is not None:
+            # Imported from its attributes, so the synth does not need context lookups
+            self.vpc = ec2.Vpc.from_vpc_attributes(
+                self,
+                id=f"{construct_id}-vpc",
+                vpc_id=vpc_id,
+                availability_zones=availability_zones,
+                private_subnet_ids=private_subnet_ids,
+                private_subnet_route_table_ids=private_subnet_route_table_ids,
+            )
+        else:
+            self.vpc = ec2.Vpc(
+                self,
+                id=f"{construct_id}-vpc",
+                max_azs=max_azs,
+                nat_gateways=nat_gateways,
+                subnet_configuration=[
+                    ec2.SubnetConfiguration(name="public", subnet_type=ec2.SubnetType.PUBLIC),
+                    ec2.SubnetConfiguration(name="private", subnet_type=ec2.SubnetType.PRIVATE),
+                ],
+            )
+            # Subnets keep their generated logical IDs, as dropping the digits would merge the availability zones
+            self.vpc.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=f"{construct_id}-vpc"))
+
+        self.subnets = ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE)
+
+        # Deploy roles assumed in other accounts go through the endpoints too
+        self.endpoint_policy_statement = iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            principals=[iam.AnyPrincipal()],
+            actions=["*"],
+            resources=["*"],
+            conditions={
+                "StringEquals": {
+                    "aws:PrincipalAccount": principal_accounts,
+                },
+            },
+        )
+
+        endpoints_security_group_id = f"{construct_id}-endpoints-security-group"
+
+        # Shared by the interface endpoints, every project security group gets its own ingress rule
+        self.endpoints_security_group = ec2.SecurityGroup(
+            self,
+            id=endpoints_security_group_id,
+            vpc=self.vpc,
+            description="CodeBuild VPC interface endpoints",
+            allow_all_outbound=False,
+        )
+        self.endpoints_security_group.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=endpoints_security_group_id),
+        )
+
+        # Digits are dropped from the logical IDs, S3 would be named as S
+        s3_endpoint_id = f"{construct_id}-buckets-endpoint"
+
+        self.s3_endpoint = self.vpc.add_gateway_endpoint(
+            s3_endpoint_id,
+            service=ec2.GatewayVpcEndpointAwsService.S3,
+            subnets=[self.subnets],
+        )
+        self.s3_endpoint.add_to_policy(self.endpoint_policy_statement)
+
+        # ECR image layers are stored in an S3 bucket owned by ECR
+        self.s3_endpoint.add_to_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                principals=[iam.AnyPrincipal()],
+                actions=["s3:GetObject"],
+                resources=[f"arn:aws:s3:::prod-{cdk.Stack.of(self).region}-starport-layer-bucket/*"],
+            )
+        )
+        self.s3_endpoint.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=s3_endpoint_id))
+
+        for endpoint_name, endpoint_service in self.INTERFACE_ENDPOINTS.items():
+            endpoint_id = f"{construct_id}-{endpoint_name}-endpoint"
+
+            endpoint = self.vpc.add_interface_endpoint(
+                endpoint_id,
+                service=endpoint_service,
+                subnets=self.subnets,
+                private_dns_enabled=True,
+                open=False,
+                security_groups=[self.endpoints_security_group],
+            )
+            endpoint.add_to_policy(self.endpoint_policy_statement)
+
+            endpoint.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=endpoint_id))
+
+            self.interface_endpoints[endpoint_name] = endpoint
+
+    def add_project_security_group(self, project_name: str) -> ec2.SecurityGroup:
+        security_group_id = f"{project_name}-security-group"
+
+        security_group = ec2.SecurityGroup(
+            self,
+            id=security_group_id,
+            vpc=self.vpc,
+            description=f"CodeBuild {project_name} builds",
+            allow_all_outbound=True,
+        )
+        security_group.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=security_group_id))
+
+        ingress_id = f"{project_name}-endpoints-ingress"
+
+        # Interface endpoints only accept HTTPS from the projects security groups
+        ingress = ec2.CfnSecurityGroupIngress(
+            self,
+            id=ingress_id,
+            group_id=self.endpoints_security_group.security_group_id,
+            source_security_group_id=security_group.security_group_id,
+            ip_protocol="tcp",
+            from_port=443,
+            to_port=443,
+            description=f"{project_name} builds",
+        )
+        ingress.override_logical_id(NameHelper.to_pascal_case(name=ingress_id))
+
+        return security_group
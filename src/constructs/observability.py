@@ -0,0 +1,96 @@
+from aws_cdk import (
+    core as cdk,
+    aws_cloudwatch as cloudwatch,
+)
+from src.helpers.name import NameHelper
+
+
+class BuildObservabilityConstruct(cdk.Construct):
+    # CodeBuild publishes these metrics for every build, with the project name as dimension
+    PHASE_METRICS = {
+        "queued": "QueuedDuration",
+        "provisioning": "ProvisioningDuration",
+        "download-source": "DownloadSourceDuration",
+        "install": "InstallDuration",
+        "pre_build": "PreBuildDuration",
+        "build": "BuildDuration",
+        "post_build": "PostBuildDuration",
+        "upload": "UploadArtifactsDuration",
+    }
+
+    # Alarm names by percentile statistic and threshold as a ratio of the project timeout
+    DURATION_ALARMS = {
+        "median": ("p50", 0.5),
+        "tail": ("p95", 0.8),
+    }
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        codebuild_projects: list,
+        alarm_period: cdk.Duration = cdk.Duration.hours(1),
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        self.alarms = list()
+
+        dashboard_name = NameHelper.to_pascal_case(name=f"{construct_id}-dashboard")
+
+        self.dashboard = cloudwatch.Dashboard(
+            self,
+            id=f"{construct_id}-dashboard",
+            dashboard_name=dashboard_name,
+        )
+        self.dashboard.node.default_child.override_logical_id(dashboard_name)
+
+        for codebuild_project in codebuild_projects:
+            phases_widget = cloudwatch.GraphWidget(
+                title=f"{codebuild_project.project_name} phases duration (average)",
+                left=[
+                    codebuild_project.project.metric(
+                        metric_name,
+                        label=phase,
+                        statistic="Average",
+                        period=cdk.Duration.minutes(5),
+                    )
+                    for phase, metric_name in self.PHASE_METRICS.items()
+                ],
+                stacked=True,
+                width=12,
+            )
+
+            duration_metrics = list()
+
+            for alarm_name, (statistic, timeout_ratio) in self.DURATION_ALARMS.items():
+                duration_metric = codebuild_project.project.metric_duration(
+                    label=statistic,
+                    statistic=statistic,
+                    period=alarm_period,
+                )
+                duration_metrics.append(duration_metric)
+
+                alarm_id = f"{codebuild_project.project_name}-duration-{alarm_name}-alarm"
+
+                # Builds are sporadic, so periods without builds are not alarming
+                alarm = duration_metric.create_alarm(
+                    self,
+                    id=alarm_id,
+                    alarm_name=NameHelper.to_pascal_case(name=alarm_id),
+                    alarm_description=f"{codebuild_project.project_name} {statistic} duration is close to its timeout",
+                    threshold=codebuild_project.timeout_minutes * 60 * timeout_ratio,
+                    evaluation_periods=1,
+                    comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                    treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+                )
+                alarm.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=alarm_id))
+
+                self.alarms.append(alarm)
+
+            duration_widget = cloudwatch.GraphWidget(
+                title=f"{codebuild_project.project_name} duration",
+                left=duration_metrics,
+                width=12,
+            )
+
+            self.dashboard.add_widgets(phases_widget, duration_widget)
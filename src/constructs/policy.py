@@ -0,0 +1,77 @@
+from aws_cdk import (
+    core as cdk,
+    aws_iam as iam,
+)
+from src.helpers.policy import PolicyHelper
+
+
+class CompactPolicyConstruct(cdk.Construct):
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        policy_name: str,
+        logical_id: str,
+        statements: list,
+        roles: list = None,
+        users: list = None,
+        inline_limit: int = PolicyHelper.ROLE_INLINE_LIMIT,
+        wildcard_min_prefix: int = None,
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        # Statements beyond the inline policy limit spill into managed policies
+        documents = PolicyHelper.split(
+            statements=PolicyHelper.compact(statements=statements, wildcard_min_prefix=wildcard_min_prefix),
+            first_limit=inline_limit,
+            limit=PolicyHelper.MANAGED_POLICY_LIMIT,
+        )
+
+        if len(documents) - 1 > PolicyHelper.MAX_MANAGED_POLICIES:
+            raise ValueError(
+                f"{policy_name} needs {len(documents) - 1} managed policies, over the quota of "
+                f"{PolicyHelper.MAX_MANAGED_POLICIES}, resource wildcards would make it smaller"
+            )
+
+        self.policy = iam.Policy(
+            self,
+            id=f"{construct_id}-inline",
+            policy_name=policy_name,
+            roles=roles,
+            users=users,
+            statements=[iam.PolicyStatement.from_json(statement) for statement in documents[0]],
+        )
+        self.policy.node.default_child.override_logical_id(logical_id)
+
+        self.managed_policies = list()
+
+        for index, document in enumerate(documents[1:], start=1):
+            managed_policy = iam.ManagedPolicy(
+                self,
+                id=f"{construct_id}-managed-{index}",
+                description=f"{policy_name} statements over the inline policy limit, part {index}",
+                roles=roles,
+                users=users,
+                statements=[iam.PolicyStatement.from_json(statement) for statement in document],
+            )
+            # Logical IDs accept digits, only NameHelper drops them
+            managed_policy.node.default_child.override_logical_id(f"{logical_id}Managed{index}")
+
+            self.managed_policies.append(managed_policy)
+
+        self.sizes = [PolicyHelper.get_size(statements=document) for document in documents]
+        self.__report(policy_name=policy_name, inline_limit=inline_limit)
+
+    def __report(self, policy_name: str, inline_limit: int) -> None:
+        limits = [inline_limit, *[PolicyHelper.MANAGED_POLICY_LIMIT for _ in self.managed_policies]]
+        headroom = min(1 - size / limit for size, limit in zip(self.sizes, limits))
+
+        message = (
+            f"Policy size for {policy_name}: {' + '.join(str(size) for size in self.sizes)} characters, "
+            f"{len(self.managed_policies)} managed policies, {headroom:.0%} headroom"
+        )
+
+        if headroom < 0.1:
+            cdk.Annotations.of(self).add_warning(message)
+        else:
+            cdk.Annotations.of(self).add_info(message)
@@ -0,0 +1,143 @@
+from aws_cdk import (
+    core as cdk,
+    aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_logs as logs,
+)
+from src.helpers.name import NameHelper
+
+
+class PreviewStagesConstruct(cdk.Construct):
+    # Matches src/functions/preview_stages/handler.py
+    CLOSED_STAGE_SOURCE = "preview-stages"
+    CLOSED_STAGE_DETAIL_TYPE = "Preview Stage Closed"
+
+    @property
+    def event_bus_arn(self):
+        # Closed stage events are sent to the default event bus
+        return cdk.Stack.of(self).format_arn(service="events", resource="event-bus", resource_name="default")
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        construct_id: str,
+        codebuild_projects: list,
+        stage_prefix: str = "pr-",
+        ttl: cdk.Duration = cdk.Duration.days(3),
+        schedule: cdk.Duration = cdk.Duration.hours(1),
+        max_concurrent_destroys: int = 2,
+    ) -> None:
+        super().__init__(scope, id=construct_id)
+
+        table_name = f"{construct_id}-table"
+
+        self.table = dynamodb.Table(
+            self,
+            id=table_name,
+            table_name=table_name,
+            partition_key=dynamodb.Attribute(name="stage_id", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            # Stages are destroyed by the scheduler, the table TTL only drops their records long after
+            time_to_live_attribute="ttl",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+        self.table.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=table_name))
+
+        function_name = f"{construct_id}-function"
+
+        self.function = lambda_.Function(
+            self,
+            id=function_name,
+            function_name=function_name,
+            description="Tracks the preview stages and destroys them once expired or closed",
+            code=lambda_.Code.from_asset("src/functions/preview_stages"),
+            handler="handler.handler",
+            runtime=lambda_.Runtime.PYTHON_3_8,
+            memory_size=128,
+            timeout=cdk.Duration.minutes(1),
+            # Runs are serialized, so a stage is never destroyed twice
+            reserved_concurrent_executions=1,
+            # codebuild_projects are pairs of deploy and destroy projects of the same service
+            environment={
+                "STAGES_TABLE": self.table.table_name,
+                "DESTROY_PROJECTS": cdk.Stack.of(self).to_json_string(
+                    {
+                        deploy_project.project.project_name: destroy_project.project.project_name
+                        for deploy_project, destroy_project in codebuild_projects
+                    }
+                ),
+                "STAGE_PREFIX": stage_prefix,
+                "STAGE_TTL": str(int(ttl.to_seconds())),
+                "MAX_CONCURRENT_DESTROYS": str(max_concurrent_destroys),
+            },
+        )
+
+        self.table.grant_read_write_data(self.function)
+
+        self.function.add_to_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "codebuild:StartBuild",
+                    "codebuild:BatchGetBuilds",
+                ],
+                resources=[destroy_project.project_arn for _, destroy_project in codebuild_projects],
+            ),
+        )
+
+        self.log_group = logs.LogGroup(
+            self,
+            id=f"{function_name}-log-group",
+            log_group_name=f"/aws/lambda/{function_name}",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            retention=logs.RetentionDays.TWO_WEEKS,
+        )
+
+        self.function.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=function_name))
+        self.function.role.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-role"),
+        )
+        self.function.role.node.find_child("DefaultPolicy").node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-policy"),
+        )
+        self.log_group.node.default_child.override_logical_id(
+            NameHelper.to_pascal_case(name=f"{function_name}-log-group"),
+        )
+
+        self.__add_rule(
+            rule_id=f"{construct_id}-deploys-rule",
+            description="Successful deploys of the preview stages",
+            event_pattern=events.EventPattern(
+                source=["aws.codebuild"],
+                detail_type=["CodeBuild Build State Change"],
+                detail={
+                    "project-name": [deploy_project.project.project_name for deploy_project, _ in codebuild_projects],
+                    "build-status": ["SUCCEEDED"],
+                },
+            ),
+        )
+        self.__add_rule(
+            rule_id=f"{construct_id}-closed-rule",
+            description="Preview stages of closed pull requests",
+            event_pattern=events.EventPattern(
+                source=[self.CLOSED_STAGE_SOURCE],
+                detail_type=[self.CLOSED_STAGE_DETAIL_TYPE],
+            ),
+        )
+        self.__add_rule(
+            rule_id=f"{construct_id}-schedule-rule",
+            description="Destroys the expired preview stages",
+            schedule=events.Schedule.rate(schedule),
+        )
+
+    def __add_rule(self, rule_id: str, description: str, **kwargs) -> None:
+        rule = events.Rule(self, id=rule_id, description=description, **kwargs)
+        rule.add_target(targets.LambdaFunction(handler=self.function))
+
+        rule.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=rule_id))
+        # The target permission is named after the stack, which differs between the stack layouts
+        permission = rule.node.find_child(f"AllowEventRule{cdk.Names.node_unique_id(self.function.node)}")
+        permission.override_logical_id(NameHelper.to_pascal_case(name=f"{rule_id}-permission"))
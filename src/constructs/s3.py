@@ -8,6 +8,13 @@ from src.helpers.name import NameHelper
 
 
 class S3Construct(cdk.Construct):
+    # Large uploads are multipart, the uploader must be able to clean up and resume them
+    PUT_OBJECT_ACTIONS = [
+        "s3:PutObject",
+        "s3:AbortMultipartUpload",
+        "s3:ListMultipartUploadParts",
+    ]
+
     def __init__(
         self,
         scope: cdk.Construct,
@@ -19,6 +26,8 @@ class S3Construct(cdk.Construct):
         public_read_access: bool = False,
         website_index_document: str = None,
         website_error_document: str = None,
+        transfer_acceleration: bool = False,
+        intelligent_tiering: bool = False,
     ) -> None:
         super().__init__(scope, id=construct_id)
 
@@ -46,6 +55,23 @@ class S3Construct(cdk.Construct):
             versioned=versioned,
         )
 
+        if transfer_acceleration:
+            # Transfer Acceleration is not exposed by the L2 bucket of this CDK version
+            self.bucket.node.default_child.accelerate_configuration = s3.CfnBucket.AccelerateConfigurationProperty(
+                acceleration_status="Enabled",
+            )
+
+        if intelligent_tiering:
+            self.bucket.add_lifecycle_rule(
+                enabled=True,
+                transitions=[
+                    s3.Transition(
+                        storage_class=s3.StorageClass.INTELLIGENT_TIERING,
+                        transition_after=cdk.Duration.days(0),
+                    ),
+                ],
+            )
+
         if not termination_protection:
             self.bucket.node.find_child("Resource").cfn_options.deletion_policy = cdk.CfnDeletionPolicy.DELETE
 
@@ -53,7 +79,13 @@ class S3Construct(cdk.Construct):
             NameHelper.to_pascal_case(name=bucket_suffix),
         )
 
-    def add_restricted_bucket_policy(self, principals_arns: list, put_object_permission: bool = False) -> None:
+    def add_restricted_bucket_policy(
+        self,
+        principals_arns: list,
+        put_object_permission: bool = False,
+        put_object_prefix: str = None,
+        scope: cdk.Construct = None,
+    ) -> None:
         bucket_policy_principals = list()
 
         actions = [
@@ -63,14 +95,14 @@ class S3Construct(cdk.Construct):
             "s3:ListBucketVersions",
         ]
 
-        if put_object_permission:
-            actions.insert(0, "s3:PutObject")
+        if put_object_permission and put_object_prefix is None:
+            actions = [*self.PUT_OBJECT_ACTIONS, *actions]
 
         for principal in principals_arns:
             bucket_policy_principals.append(iam.ArnPrincipal(arn=principal))
 
-        self.bucket.add_to_resource_policy(
-            permission=iam.PolicyStatement(
+        statements = [
+            iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
                 principals=bucket_policy_principals,
                 actions=actions,
@@ -79,11 +111,34 @@ class S3Construct(cdk.Construct):
                     self.bucket.bucket_arn,
                 ],
             ),
-        )
+        ]
 
-        self.bucket.policy.node.default_child.override_logical_id(
-            NameHelper.to_pascal_case(name=f"{self.bucket_suffix}-policy"),
-        )
+        if put_object_permission and put_object_prefix is not None:
+            statements.append(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    principals=bucket_policy_principals,
+                    actions=self.PUT_OBJECT_ACTIONS,
+                    resources=[
+                        self.bucket.arn_for_objects(f"{put_object_prefix}/*"),
+                    ],
+                ),
+            )
+
+        policy_id = f"{self.bucket_suffix}-policy"
+
+        # A policy on principals of another stack lives in that stack, so the bucket stack does not depend on it
+        if scope is not None and cdk.Stack.of(scope).node.path != cdk.Stack.of(self).node.path:
+            bucket_policy = s3.BucketPolicy(scope, id=policy_id, bucket=self.bucket)
+            bucket_policy.document.add_statements(*statements)
+
+            bucket_policy.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=policy_id))
+            return
+
+        for statement in statements:
+            self.bucket.add_to_resource_policy(permission=statement)
+
+        self.bucket.policy.node.default_child.override_logical_id(NameHelper.to_pascal_case(name=policy_id))
 
     def add_read_bucket_policy_for_canonical_users(self, canonical_users: list) -> None:
         actions = [
@@ -118,20 +173,36 @@ class DeployResourcesBucket(S3Construct):
         construct_id: str,
         bucket_suffix: str,
         termination_protection: bool = True,
+        transfer_acceleration: bool = False,
+        intelligent_tiering: bool = False,
+        abort_incomplete_multipart_upload_days: int = 1,
+        expiration_days: int = 30,
     ):
         super().__init__(
             scope,
             construct_id,
             bucket_suffix,
             termination_protection=termination_protection,
+            transfer_acceleration=transfer_acceleration,
+            intelligent_tiering=intelligent_tiering,
         )
+        self.abort_incomplete_multipart_upload_days = abort_incomplete_multipart_upload_days
+        self.expiration_days = expiration_days
         self.__add_temp_resources_lifecycle_rule()
 
     def __add_temp_resources_lifecycle_rule(self):
         self.bucket.add_lifecycle_rule(
-            abort_incomplete_multipart_upload_after=cdk.Duration.days(1),
+            abort_incomplete_multipart_upload_after=cdk.Duration.days(self.abort_incomplete_multipart_upload_days),
+            enabled=True,
+            expiration=cdk.Duration.days(self.expiration_days),
+        )
+
+    def add_cache_lifecycle_rule(self, prefix: str, expiration_days: int = 7) -> None:
+        self.bucket.add_lifecycle_rule(
+            abort_incomplete_multipart_upload_after=cdk.Duration.days(self.abort_incomplete_multipart_upload_days),
             enabled=True,
-            expiration=cdk.Duration.days(30),
+            expiration=cdk.Duration.days(expiration_days),
+            prefix=f"{prefix}/",
         )
 
 
@@ -0,0 +1,111 @@
+import json
+import os
+import urllib.request
+
+import boto3
+
+GITHUB_API_URL = "https://api.github.com"
+STATUS_CONTEXT_PREFIX = "codebuild"
+
+BUILD_STATES = {
+    "IN_PROGRESS": "pending",
+    "SUCCEEDED": "success",
+    "FAILED": "failure",
+    "FAULT": "failure",
+    "TIMED_OUT": "failure",
+    "STOPPED": "error",
+}
+
+_github_token = None
+
+
+def get_environment_variables(detail: dict) -> dict:
+    environment = detail.get("additional-information", dict()).get("environment", dict())
+
+    return {variable["name"]: variable["value"] for variable in environment.get("environment-variables", list())}
+
+
+def get_build_url(detail: dict, region: str) -> str:
+    build_id = detail["build-id"].split("/")[-1]
+    project_name = detail["project-name"]
+
+    return (
+        f"https://{region}.console.aws.amazon.com/codesuite/codebuild/projects/{project_name}"
+        f"/build/{build_id}/?region={region}"
+    )
+
+
+def get_commit_status(event: dict) -> dict:
+    # Builds started by the GitHub workflows carry the repository and commit as environment variables
+    detail = event["detail"]
+    variables = get_environment_variables(detail=detail)
+
+    repository = variables.get("GITHUB_REPOSITORY")
+    commit = variables.get("GITHUB_SHA")
+
+    if repository is None or commit is None:
+        return None
+
+    if event["detail-type"] == "CodeBuild Build Phase Change":
+        # EventBridge does not keep the events order, so the last phases of a build can arrive after its final state
+        if detail.get("additional-information", dict()).get("build-complete", False):
+            return None
+
+        state = "pending"
+        description = f"{detail['completed-phase']} {detail['completed-phase-status'].lower()}"
+    else:
+        state = BUILD_STATES.get(detail["build-status"], "error")
+        description = f"Build {detail['build-status'].lower()}"
+
+    return {
+        "repository": repository,
+        "commit": commit,
+        "status": {
+            "state": state,
+            "target_url": get_build_url(detail=detail, region=event["region"]),
+            "description": description,
+            "context": f"{STATUS_CONTEXT_PREFIX}/{detail['project-name']}",
+        },
+    }
+
+
+def get_github_token() -> str:
+    global _github_token
+
+    if _github_token is None:
+        response = boto3.client("ssm").get_parameter(Name=os.environ["GITHUB_TOKEN_PARAMETER"], WithDecryption=True)
+        _github_token = response["Parameter"]["Value"]
+
+    return _github_token
+
+
+def post_commit_status(repository: str, commit: str, status: dict) -> None:
+    request = urllib.request.Request(
+        url=f"{GITHUB_API_URL}/repos/{repository}/statuses/{commit}",
+        data=json.dumps(status).encode("utf-8"),
+        headers={
+            "Accept": "application/vnd.github.v3+json",
+            "Authorization": f"token {get_github_token()}",
+            "Content-Type": "application/json",
+        },
+        method="POST",
+    )
+
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+def handler(event, context, post_status=post_commit_status):
+    commit_status = get_commit_status(event=event)
+
+    if commit_status is None:
+        print(f"Skipping build {event['detail'].get('build-id')} without GitHub commit or already complete")
+        return None
+
+    post_status(
+        repository=commit_status["repository"],
+        commit=commit_status["commit"],
+        status=commit_status["status"],
+    )
+
+    return commit_status
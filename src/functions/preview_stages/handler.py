@@ -0,0 +1,259 @@
+import json
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+CLOSED_STAGE_SOURCE = "preview-stages"
+CLOSED_STAGE_DETAIL_TYPE = "Preview Stage Closed"
+
+# Deploy build variables a destroy build needs to target the same stage
+STAGE_VARIABLES = ("STAGE", "REGION", "AWS_ACCOUNT_ID", "PREFIX")
+
+FINISHED_BUILD_STATUSES = ("SUCCEEDED", "FAILED", "FAULT", "TIMED_OUT", "STOPPED")
+
+# Stages still failing to be destroyed are left to be destroyed by hand
+MAX_DESTROY_ATTEMPTS = 3
+
+# Stage records are kept after their expiry while being destroyed, then dropped by the table TTL
+RECORD_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+def get_environment_variables(detail: dict) -> dict:
+    environment = detail.get("additional-information", dict()).get("environment", dict())
+
+    return {variable["name"]: variable["value"] for variable in environment.get("environment-variables", list())}
+
+
+def get_stage_id(deploy_project: str, variables: dict) -> str:
+    return "|".join(
+        [deploy_project, variables.get("AWS_ACCOUNT_ID", ""), variables.get("REGION", ""), variables["STAGE"]]
+    )
+
+
+def is_condition_failed(error: ClientError) -> bool:
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def get_items(table) -> list:
+    response = table.scan()
+    items = response["Items"]
+
+    while "LastEvaluatedKey" in response:
+        response = table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
+        items.extend(response["Items"])
+
+    return items
+
+
+def register_stage(table, detail: dict, destroy_projects: dict, stage_prefix: str, ttl: int, now: int) -> dict:
+    # Every successful deploy of a preview stage pushes its expiry back
+    deploy_project = detail["project-name"]
+    variables = get_environment_variables(detail=detail)
+    stage = variables.get("STAGE")
+
+    if deploy_project not in destroy_projects or stage is None or not stage.startswith(stage_prefix):
+        return None
+
+    item = {
+        "stage_id": get_stage_id(deploy_project=deploy_project, variables=variables),
+        "stage": stage,
+        "destroy_project": destroy_projects[deploy_project],
+        "variables": {name: variables[name] for name in STAGE_VARIABLES if name in variables},
+        "status": "active",
+        "expires_at": now + ttl,
+        "ttl": now + ttl + RECORD_RETENTION_SECONDS,
+    }
+
+    try:
+        # Putting back a stage being destroyed would reset it to active and lose its destroy build
+        table.put_item(
+            Item=item,
+            ConditionExpression="attribute_not_exists(stage_id) OR #status <> :destroying",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":destroying": "destroying"},
+        )
+    except ClientError as error:
+        if not is_condition_failed(error=error):
+            raise
+
+        # Registered again once its destroy build is done, so the deployed stage is destroyed in turn
+        table.update_item(
+            Key={"stage_id": item["stage_id"]},
+            UpdateExpression="SET redeployed_expires_at = :expires_at",
+            ConditionExpression="#status = :destroying",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":expires_at": item["expires_at"], ":destroying": "destroying"},
+        )
+        return None
+
+    return item
+
+
+def close_stage(table, stage: str, now: int) -> list:
+    # A closed pull request expires its stage in every project, account and region
+    closed_items = list()
+
+    for item in get_items(table=table):
+        if item["stage"] != stage or item["status"] != "active":
+            continue
+
+        try:
+            table.update_item(
+                Key={"stage_id": item["stage_id"]},
+                UpdateExpression="SET expires_at = :now",
+                ConditionExpression="#status = :active",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":now": now, ":active": "active"},
+            )
+        except ClientError as error:
+            # Already being destroyed
+            if not is_condition_failed(error=error):
+                raise
+            continue
+
+        item["expires_at"] = now
+        closed_items.append(item)
+
+    return closed_items
+
+
+def update_destroy_builds(table, codebuild, items: list) -> list:
+    # Returns the items whose destroy build is still running
+    destroying_items = [item for item in items if item["status"] == "destroying"]
+
+    if len(destroying_items) == 0:
+        return list()
+
+    build_ids = [item["build_id"] for item in destroying_items]
+    builds = dict()
+
+    # BatchGetBuilds accepts up to 100 builds
+    while len(build_ids) > 0:
+        batch_ids, build_ids = build_ids[:100], build_ids[100:]
+
+        for build in codebuild.batch_get_builds(ids=batch_ids)["builds"]:
+            builds[build["id"]] = build
+
+    running_items = list()
+
+    for item in destroying_items:
+        build_status = builds.get(item["build_id"], dict()).get("buildStatus", "FAILED")
+
+        if build_status not in FINISHED_BUILD_STATUSES:
+            running_items.append(item)
+        elif build_status == "SUCCEEDED":
+            remove_destroyed_stage(table=table, item=item)
+        else:
+            fail_destroy_build(table=table, item=item)
+
+    return running_items
+
+
+def remove_destroyed_stage(table, item: dict) -> None:
+    # The deleted record tells whether the stage was deployed again during its destroy
+    deleted_item = table.delete_item(Key={"stage_id": item["stage_id"]}, ReturnValues="ALL_OLD").get("Attributes")
+
+    if deleted_item is None or "redeployed_expires_at" not in deleted_item:
+        return
+
+    expires_at = deleted_item["redeployed_expires_at"]
+    fields = ("stage_id", "stage", "destroy_project", "variables")
+    table.put_item(
+        Item={
+            **{field: deleted_item[field] for field in fields},
+            "status": "active",
+            "expires_at": expires_at,
+            "ttl": expires_at + RECORD_RETENTION_SECONDS,
+        }
+    )
+
+
+def fail_destroy_build(table, item: dict) -> None:
+    # Failed destroys are retried on the next runs
+    item["attempts"] = item.get("attempts", 0) + 1
+    item["status"] = "active" if item["attempts"] < MAX_DESTROY_ATTEMPTS else "failed"
+    del item["build_id"]
+
+    # Updated in place, so a redeploy recorded during the destroy is kept
+    table.update_item(
+        Key={"stage_id": item["stage_id"]},
+        UpdateExpression="SET attempts = :attempts, #status = :status REMOVE build_id",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":attempts": item["attempts"], ":status": item["status"]},
+    )
+
+
+def start_destroy_builds(table, codebuild, items: list, slots: int) -> list:
+    started_items = list()
+
+    for item in items[:slots]:
+        response = codebuild.start_build(
+            projectName=item["destroy_project"],
+            environmentVariablesOverride=[
+                {"name": name, "value": value, "type": "PLAINTEXT"} for name, value in item["variables"].items()
+            ],
+        )
+
+        item["status"] = "destroying"
+        item["build_id"] = response["build"]["id"]
+        table.update_item(
+            Key={"stage_id": item["stage_id"]},
+            UpdateExpression="SET #status = :status, build_id = :build_id",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":status": item["status"], ":build_id": item["build_id"]},
+        )
+        started_items.append(item)
+
+    return started_items
+
+
+def destroy_expired_stages(table, codebuild, max_concurrent_destroys: int, now: int) -> dict:
+    items = get_items(table=table)
+    running_items = update_destroy_builds(table=table, codebuild=codebuild, items=items)
+
+    expired_items = sorted(
+        (item for item in items if item["status"] == "active" and item["expires_at"] <= now),
+        key=lambda item: item["expires_at"],
+    )
+
+    # Destroys over the limit wait for the next run
+    started_items = start_destroy_builds(
+        table=table,
+        codebuild=codebuild,
+        items=expired_items,
+        slots=max(max_concurrent_destroys - len(running_items), 0),
+    )
+
+    return {
+        "running": len(running_items),
+        "started": [item["stage_id"] for item in started_items],
+        "waiting": len(expired_items) - len(started_items),
+    }
+
+
+def handler(event, context, table=None, codebuild=None, now=None):
+    table = table if table is not None else boto3.resource("dynamodb").Table(os.environ["STAGES_TABLE"])
+    codebuild = codebuild if codebuild is not None else boto3.client("codebuild")
+    now = int(now if now is not None else time.time())
+
+    if event.get("detail-type") == "CodeBuild Build State Change":
+        return register_stage(
+            table=table,
+            detail=event["detail"],
+            destroy_projects=json.loads(os.environ["DESTROY_PROJECTS"]),
+            stage_prefix=os.environ["STAGE_PREFIX"],
+            ttl=int(os.environ["STAGE_TTL"]),
+            now=now,
+        )
+
+    if event.get("source") == CLOSED_STAGE_SOURCE and event.get("detail-type") == CLOSED_STAGE_DETAIL_TYPE:
+        close_stage(table=table, stage=event["detail"]["stage"], now=now)
+
+    return destroy_expired_stages(
+        table=table,
+        codebuild=codebuild,
+        max_concurrent_destroys=int(os.environ["MAX_CONCURRENT_DESTROYS"]),
+        now=now,
+    )
@@ -1,8 +1,210 @@
+import os
+import re
+from collections.abc import Mapping
+from types import MappingProxyType
+
 import yaml
 
+try:
+    from yaml import CSafeLoader as BuildSpecLoader
+except ImportError:
+    from yaml import SafeLoader as BuildSpecLoader
+
 
 class BuildSpecHelper:
+    VERSION = 0.2
+
+    TOP_LEVEL_KEYS = {"version", "run-as", "env", "proxy", "batch", "phases", "reports", "artifacts", "cache"}
+    ENV_KEYS = {
+        "shell",
+        "variables",
+        "parameter-store",
+        "exported-variables",
+        "secrets-manager",
+        "git-credential-helper",
+    }
+    PHASES = ["install", "pre_build", "build", "post_build"]
+    PHASE_KEYS = {"run-as", "on-failure", "runtime-versions", "commands", "finally"}
+
+    FRAGMENTS_LOCATION = "src/config/fragments"
+    PARAMETER_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+    VERSION_COMMAND_PATTERN = re.compile(r"^\s*\S+ --version\s*$")
+
+    __buildspecs = dict()
+    __composed_buildspecs = dict()
+
+    @staticmethod
+    def get_buildspec(file_location: str) -> Mapping:
+        return BuildSpecHelper.__load(file_location=file_location, validate=True)
+
+    @staticmethod
+    def compose(file_location: str, fragments: list = None, parameters: dict = None, fast: bool = False) -> Mapping:
+        # Shared fragments commands go before the buildspec own commands of each phase
+        fragments = fragments if fragments is not None else list()
+        parameters = parameters if parameters is not None else dict()
+
+        fragments_locations = [os.path.join(BuildSpecHelper.FRAGMENTS_LOCATION, f"{name}.yml") for name in fragments]
+
+        cache_key = (
+            tuple((location, os.stat(location).st_mtime_ns) for location in [file_location, *fragments_locations]),
+            tuple(sorted(parameters.items())),
+            fast,
+        )
+
+        if cache_key in BuildSpecHelper.__composed_buildspecs:
+            return BuildSpecHelper.__composed_buildspecs[cache_key]
+
+        buildspec = BuildSpecHelper.get_buildspec(file_location=file_location)
+
+        phases_commands = {phase: list() for phase in BuildSpecHelper.PHASES}
+
+        for fragment_location in fragments_locations:
+            fragment = BuildSpecHelper.__load(file_location=fragment_location, validate=False)
+            fragment_parameters = {**fragment.get("parameters", dict()), **parameters}
+
+            for phase_name, phase in fragment.get("phases", dict()).items():
+                if phase_name not in phases_commands:
+                    raise ValueError(f"Fragment {fragment_location} has unknown phase {phase_name}")
+
+                phases_commands[phase_name].append(
+                    BuildSpecHelper.__render(
+                        commands=phase.get("commands", list()),
+                        parameters=fragment_parameters,
+                        file_location=fragment_location,
+                    )
+                )
+
+        for phase_name, phase in buildspec.get("phases", dict()).items():
+            phases_commands[phase_name].append(
+                BuildSpecHelper.__render(
+                    commands=phase.get("commands", list()),
+                    parameters=parameters,
+                    file_location=file_location,
+                )
+            )
+
+        phases = dict()
+
+        for phase_name in BuildSpecHelper.PHASES:
+            commands = "\n".join(phases_commands[phase_name])
+
+            if fast:
+                commands = "".join(
+                    f"{line}\n"
+                    for line in commands.splitlines()
+                    if not BuildSpecHelper.VERSION_COMMAND_PATTERN.match(line)
+                )
+
+            if commands.strip() == "":
+                continue
+
+            phases[phase_name] = {**buildspec.get("phases", dict()).get(phase_name, dict()), "commands": commands}
+
+        composed_buildspec = {**BuildSpecHelper.to_object(buildspec), "phases": phases}
+
+        BuildSpecHelper.validate(buildspec=composed_buildspec, file_location=file_location)
+
+        frozen_buildspec = BuildSpecHelper.__freeze(composed_buildspec)
+        BuildSpecHelper.__composed_buildspecs[cache_key] = frozen_buildspec
+
+        return frozen_buildspec
+
+    @staticmethod
+    def merge(buildspec: Mapping, overrides: dict) -> Mapping:
+        # Only the overridden keys are copied, the rest of the structure is shared with the original buildspec
+        merged_buildspec = dict(buildspec)
+
+        for key, value in overrides.items():
+            if isinstance(value, Mapping) and isinstance(merged_buildspec.get(key), Mapping):
+                merged_buildspec[key] = BuildSpecHelper.merge(buildspec=merged_buildspec[key], overrides=value)
+            else:
+                merged_buildspec[key] = BuildSpecHelper.__freeze(value)
+
+        return MappingProxyType(merged_buildspec)
+
+    @staticmethod
+    def to_object(buildspec):
+        if isinstance(buildspec, Mapping):
+            return {key: BuildSpecHelper.to_object(value) for key, value in buildspec.items()}
+
+        if isinstance(buildspec, (list, tuple)):
+            return [BuildSpecHelper.to_object(value) for value in buildspec]
+
+        return buildspec
+
+    @staticmethod
+    def validate(buildspec: dict, file_location: str) -> None:
+        if not isinstance(buildspec, dict):
+            raise ValueError(f"Buildspec {file_location} is not a mapping")
+
+        if str(buildspec.get("version")) != str(BuildSpecHelper.VERSION):
+            raise ValueError(f"Buildspec {file_location} version must be {BuildSpecHelper.VERSION}")
+
+        unknown_keys = set(buildspec) - BuildSpecHelper.TOP_LEVEL_KEYS
+        if len(unknown_keys) > 0:
+            raise ValueError(f"Buildspec {file_location} has unknown keys: {', '.join(sorted(unknown_keys))}")
+
+        unknown_keys = set(buildspec.get("env", dict())) - BuildSpecHelper.ENV_KEYS
+        if len(unknown_keys) > 0:
+            raise ValueError(f"Buildspec {file_location} has unknown env keys: {', '.join(sorted(unknown_keys))}")
+
+        phases = buildspec.get("phases", dict())
+
+        unknown_phases = set(phases) - set(BuildSpecHelper.PHASES)
+        if len(unknown_phases) > 0:
+            raise ValueError(f"Buildspec {file_location} has unknown phases: {', '.join(sorted(unknown_phases))}")
+
+        for phase_name, phase in phases.items():
+            unknown_keys = set(phase) - BuildSpecHelper.PHASE_KEYS
+            if len(unknown_keys) > 0:
+                raise ValueError(
+                    f"Buildspec {file_location} phase {phase_name} has unknown keys: {', '.join(sorted(unknown_keys))}"
+                )
+
+            if not isinstance(phase.get("commands", list()), (list, str)):
+                raise ValueError(f"Buildspec {file_location} phase {phase_name} commands must be a list or a string")
+
     @staticmethod
-    def get_buildspec(file_location: str):
+    def __load(file_location: str, validate: bool) -> Mapping:
+        # Files are parsed and validated once per version, callers share a read-only copy
+        cache_key = os.path.abspath(file_location)
+        modification_time = os.stat(cache_key).st_mtime_ns
+
+        cached_buildspec = BuildSpecHelper.__buildspecs.get(cache_key)
+
+        if cached_buildspec is not None and cached_buildspec[0] == modification_time:
+            return cached_buildspec[1]
+
         with open(file_location, "r") as buildspec_file:
-            return yaml.load(buildspec_file.read(), Loader=yaml.FullLoader)
+            buildspec = yaml.load(buildspec_file.read(), Loader=BuildSpecLoader)
+
+        if validate:
+            BuildSpecHelper.validate(buildspec=buildspec, file_location=file_location)
+
+        frozen_buildspec = BuildSpecHelper.__freeze(buildspec)
+        BuildSpecHelper.__buildspecs[cache_key] = (modification_time, frozen_buildspec)
+
+        return frozen_buildspec
+
+    @staticmethod
+    def __render(commands, parameters: dict, file_location: str) -> str:
+        if not isinstance(commands, str):
+            commands = "\n".join(commands)
+
+        def replace_parameter(match):
+            if match.group(1) not in parameters:
+                raise ValueError(f"Missing parameter '{match.group(1)}' for {file_location}")
+
+            return str(parameters[match.group(1)])
+
+        return BuildSpecHelper.PARAMETER_PATTERN.sub(replace_parameter, commands).rstrip("\n") + "\n"
+
+    @staticmethod
+    def __freeze(value):
+        if isinstance(value, Mapping):
+            return MappingProxyType({key: BuildSpecHelper.__freeze(item) for key, item in value.items()})
+
+        if isinstance(value, (list, tuple)):
+            return tuple(BuildSpecHelper.__freeze(item) for item in value)
+
+        return value
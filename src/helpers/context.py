@@ -1,7 +1,38 @@
 from aws_cdk import core
 
+from src.helpers.manifest import ServicesManifestHelper
+
 
 class ContextHelper:
+    DEFAULT_COMPUTE_PROFILE = "small"
+
+    COMPUTE_PROFILES = {
+        "small": {
+            "compute_type": "SMALL",
+            "architecture": "x86_64",
+            "queued_timeout": 480,
+            "timeout": 90,
+        },
+        "medium": {
+            "compute_type": "MEDIUM",
+            "architecture": "x86_64",
+            "queued_timeout": 480,
+            "timeout": 90,
+        },
+        "large": {
+            "compute_type": "LARGE",
+            "architecture": "x86_64",
+            "queued_timeout": 480,
+            "timeout": 60,
+        },
+        "large-arm": {
+            "compute_type": "LARGE",
+            "architecture": "arm64",
+            "queued_timeout": 480,
+            "timeout": 60,
+        },
+    }
+
     def __init__(self, cdk_app: core.App):
         self.app = cdk_app
 
@@ -26,10 +57,131 @@ class ContextHelper:
 
         self.app_stack_prefix = f"{stack_prefix}-" if stack_prefix is not None else ""
 
+        context_compute_profiles = self.app.node.try_get_context("compute_profiles")
+        context_project_compute_profiles = self.app.node.try_get_context("project_compute_profiles")
+
+        self.app_compute_profiles = dict()
+        for profile_name, profile in self.COMPUTE_PROFILES.items():
+            self.app_compute_profiles[profile_name] = dict(profile)
+
+        if context_compute_profiles is not None:
+            for profile_name, profile in context_compute_profiles.items():
+                base_profile = self.app_compute_profiles.get(
+                    profile_name, self.COMPUTE_PROFILES[self.DEFAULT_COMPUTE_PROFILE]
+                )
+                self.app_compute_profiles[profile_name] = {**base_profile, **profile}
+
+        context_fleets = self.app.node.try_get_context("fleets")
+        context_project_fleets = self.app.node.try_get_context("project_fleets")
+        self.app_fleets = context_fleets if context_fleets is not None else dict()
+        self.app_project_fleets = context_project_fleets if context_project_fleets is not None else dict()
+
+        for project, fleet_name in self.app_project_fleets.items():
+            if fleet_name not in self.app_fleets:
+                raise ValueError(f"Unknown fleet '{fleet_name}' for project '{project}'")
+
+        self.app_project_compute_profiles = (
+            context_project_compute_profiles if context_project_compute_profiles is not None else dict()
+        )
+
+    def get_compute_profile(self, project: str, profile_name: str = None) -> dict:
+        # A profile given by the caller, such as a service one, takes precedence over the project kind profile
+        if profile_name is None:
+            profile_name = self.app_project_compute_profiles.get(project, self.DEFAULT_COMPUTE_PROFILE)
+
+        if profile_name not in self.app_compute_profiles:
+            raise ValueError(f"Unknown compute profile '{profile_name}' for project '{project}'")
+
+        return self.app_compute_profiles[profile_name]
+
 
 class ArtifactsContext(ContextHelper):
+    BUILD_CACHE_TYPES = ("local", "s3", "none")
+
     def __init__(self, cdk_app: core.App):
         super().__init__(cdk_app)
 
         deploy_accounts = self.app.node.try_get_context("deploy_accounts")
         self.app_deploy_accounts = deploy_accounts if deploy_accounts is not None else list()
+
+        build_cache = self.app.node.try_get_context("build_cache")
+        self.app_build_cache = build_cache if build_cache is not None else "local"
+
+        if self.app_build_cache not in self.BUILD_CACHE_TYPES:
+            raise ValueError(
+                f"Unknown build cache '{self.app_build_cache}', expected one of {', '.join(self.BUILD_CACHE_TYPES)}"
+            )
+
+        build_observability = self.app.node.try_get_context("build_observability")
+        self.app_build_observability = build_observability not in ("False", "false", False)
+
+        build_status_stream = self.app.node.try_get_context("build_status_stream")
+        github_token_parameter = self.app.node.try_get_context("github_token_parameter")
+        self.app_build_status_stream = build_status_stream
+        self.app_github_token_parameter = (
+            github_token_parameter if github_token_parameter is not None else "/codebuild/github/token"
+        )
+
+        self.app_build_images_batch = self.app.node.try_get_context("build_images_batch")
+
+        build_images_incremental = self.app.node.try_get_context("build_images_incremental")
+        self.app_build_images_incremental = build_images_incremental in ("True", "true", True)
+
+        source_bucket_transfer_acceleration = self.app.node.try_get_context("source_bucket_transfer_acceleration")
+        source_bucket_intelligent_tiering = self.app.node.try_get_context("source_bucket_intelligent_tiering")
+        source_bucket_abort_multipart_days = self.app.node.try_get_context("source_bucket_abort_multipart_days")
+        source_bucket_retention_days = self.app.node.try_get_context("source_bucket_retention_days")
+        self.app_source_bucket_transfer_acceleration = source_bucket_transfer_acceleration in ("True", "true", True)
+        self.app_source_bucket_intelligent_tiering = source_bucket_intelligent_tiering in ("True", "true", True)
+        self.app_source_bucket_abort_multipart_days = (
+            int(source_bucket_abort_multipart_days) if source_bucket_abort_multipart_days is not None else 1
+        )
+        self.app_source_bucket_retention_days = (
+            int(source_bucket_retention_days) if source_bucket_retention_days is not None else 30
+        )
+
+        # Intelligent-Tiering only moves objects to a cheaper tier after 30 days without access
+        if self.app_source_bucket_intelligent_tiering and self.app_source_bucket_retention_days <= 30:
+            raise ValueError(
+                "source_bucket_intelligent_tiering needs a source_bucket_retention_days over 30, "
+                f"got {self.app_source_bucket_retention_days}"
+            )
+
+        self.app_source_bucket_prefix = self.app.node.try_get_context("source_bucket_prefix")
+
+        deploy_session_duration = self.app.node.try_get_context("deploy_session_duration")
+        self.app_deploy_session_duration = int(deploy_session_duration) if deploy_session_duration is not None else 3600
+
+        self.app_codebuild_vpc = self.app.node.try_get_context("codebuild_vpc")
+
+        self.app_preview_stages = self.app.node.try_get_context("preview_stages")
+
+        self.app_dependency_proxy = self.app.node.try_get_context("dependency_proxy")
+
+        images_parameters_path = self.app.node.try_get_context("images_parameters_path")
+        image_index = self.app.node.try_get_context("image_index")
+        self.app_images_parameters_path = (
+            f"/{images_parameters_path.strip('/')}" if images_parameters_path is not None else None
+        )
+        self.app_image_index = image_index in ("True", "true", True)
+
+        split_stacks = self.app.node.try_get_context("split_stacks")
+        self.app_split_stacks = split_stacks in ("True", "true", True)
+
+        iam_wildcard_min_prefix = self.app.node.try_get_context("iam_wildcard_min_prefix")
+        self.app_iam_wildcard_min_prefix = int(iam_wildcard_min_prefix) if iam_wildcard_min_prefix is not None else None
+
+        ecr_lifecycle = self.app.node.try_get_context("ecr_lifecycle")
+        self.app_ecr_lifecycle = ecr_lifecycle if ecr_lifecycle is not None else dict()
+
+        fast_buildspecs = self.app.node.try_get_context("fast_buildspecs")
+        self.app_fast_buildspecs = fast_buildspecs in ("True", "true", True)
+
+        pull_through_cache_rules = self.app.node.try_get_context("pull_through_cache_rules")
+        replication_regions = self.app.node.try_get_context("replication_regions")
+        self.app_pull_through_cache_rules = pull_through_cache_rules if pull_through_cache_rules is not None else dict()
+        self.app_replication_regions = replication_regions if replication_regions is not None else list()
+
+        services_manifest = self.app.node.try_get_context("services_manifest")
+        self.app_services_manifest = services_manifest if services_manifest is not None else "src/config/services.yml"
+        self.app_services = ServicesManifestHelper.get_services(file_location=self.app_services_manifest)
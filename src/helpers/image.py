@@ -0,0 +1,19 @@
+import json
+
+
+class ImageHelper:
+    @staticmethod
+    def get_image_size(file_location: str) -> int:
+        # Docker v2 and OCI image manifests, as returned by "docker manifest inspect" or "aws ecr batch-get-image"
+        with open(file_location, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+
+        if "layers" not in manifest:
+            raise ValueError(f"Image manifest {file_location} has no layers")
+
+        image_size = manifest.get("config", dict()).get("size", 0)
+
+        for layer in manifest["layers"]:
+            image_size += layer["size"]
+
+        return image_size
@@ -0,0 +1,200 @@
+import json
+
+from src.scripts.image_source_hash import CI_TAG_PREFIX
+
+
+class LifecyclePolicyHelper:
+    DEFAULT_POLICY = {
+        "ci_images_days": 1,
+        "untagged_images_days": None,
+        "release_tag_prefixes": list(),
+        "release_images": None,
+        "rules": list(),
+    }
+
+    TAG_STATUSES = ("tagged", "untagged", "any")
+
+    # Priorities of the built-in tiers, custom rules go after them
+    CI_PRIORITY = 1
+    UNTAGGED_PRIORITY = 2
+    RELEASE_PRIORITY = 10
+    CUSTOM_PRIORITY = 100
+
+    @staticmethod
+    def get_policy(*policies: dict) -> dict:
+        # Later policies override the earlier ones key by key
+        policy = dict(LifecyclePolicyHelper.DEFAULT_POLICY)
+
+        for overrides in policies:
+            if overrides is None:
+                continue
+
+            unknown_keys = set(overrides) - set(LifecyclePolicyHelper.DEFAULT_POLICY)
+            if len(unknown_keys) > 0:
+                raise ValueError(f"Unknown lifecycle policy keys: {', '.join(sorted(unknown_keys))}")
+
+            policy.update(overrides)
+
+        return policy
+
+    @staticmethod
+    def get_rules(policy: dict, protect_image_digest: bool = False) -> list:
+        rules = list()
+
+        if policy["ci_images_days"] is not None:
+            rules.append(
+                LifecyclePolicyHelper.__get_rule(
+                    priority=LifecyclePolicyHelper.CI_PRIORITY,
+                    description="CI lifecycle rule",
+                    tag_status="tagged",
+                    tag_prefixes=[CI_TAG_PREFIX],
+                    max_age_days=policy["ci_images_days"],
+                )
+            )
+
+        if policy["untagged_images_days"] is not None:
+            rules.append(
+                LifecyclePolicyHelper.__get_rule(
+                    priority=LifecyclePolicyHelper.UNTAGGED_PRIORITY,
+                    description="Untagged images lifecycle rule",
+                    tag_status="untagged",
+                    max_age_days=policy["untagged_images_days"],
+                )
+            )
+
+        if len(policy["release_tag_prefixes"]) > 0:
+            if policy["release_images"] is None:
+                raise ValueError("Lifecycle policy release_tag_prefixes requires release_images")
+
+            # Several prefixes in one rule select the images having all of them, so every prefix gets its own rule
+            for index, tag_prefix in enumerate(policy["release_tag_prefixes"]):
+                rules.append(
+                    LifecyclePolicyHelper.__get_rule(
+                        priority=LifecyclePolicyHelper.RELEASE_PRIORITY + index,
+                        description=f"Release {tag_prefix} lifecycle rule",
+                        tag_status="tagged",
+                        tag_prefixes=[tag_prefix],
+                        max_images=policy["release_images"],
+                    )
+                )
+
+        for rule in policy["rules"]:
+            if rule.get("priority") is None or rule["priority"] < LifecyclePolicyHelper.CUSTOM_PRIORITY:
+                raise ValueError(
+                    f"Custom lifecycle rule priorities must be {LifecyclePolicyHelper.CUSTOM_PRIORITY} or more"
+                )
+
+            rules.append(
+                LifecyclePolicyHelper.__get_rule(
+                    priority=rule["priority"],
+                    description=rule.get("description", f"Custom lifecycle rule {rule['priority']}"),
+                    tag_status=rule.get("tag_status", "tagged"),
+                    tag_prefixes=rule.get("tag_prefixes"),
+                    max_images=rule.get("max_images"),
+                    max_age_days=rule.get("max_age_days"),
+                )
+            )
+
+        rules = sorted(rules, key=lambda item: item["rulePriority"])
+
+        LifecyclePolicyHelper.validate(rules=rules, protect_image_digest=protect_image_digest)
+
+        return rules
+
+    @staticmethod
+    def validate(rules: list, protect_image_digest: bool = False) -> None:
+        priorities = set()
+        previous_rules = list()
+
+        for rule in rules:
+            priority = rule["rulePriority"]
+            selection = rule["selection"]
+
+            if priority in priorities:
+                raise ValueError(f"Lifecycle rule priority {priority} is used more than once")
+
+            priorities.add(priority)
+
+            if selection["tagStatus"] == "any" and rule is not rules[-1]:
+                raise ValueError(f"Lifecycle rule {priority} selects any image, so it must have the highest priority")
+
+            # Images are only evaluated by the first rule selecting them, so a rule can never apply to them
+            for previous_rule in previous_rules:
+                if LifecyclePolicyHelper.__is_shadowed(rule=selection, previous_rule=previous_rule["selection"]):
+                    raise ValueError(
+                        f"Lifecycle rule {priority} selects the same images as rule {previous_rule['rulePriority']}"
+                    )
+
+            # Published image digests are the latest pushed release images, only image count rules always keep them.
+            # CI images never have their digest published, so the CI rule can expire them by age
+            age_rule = selection["countType"] == "sinceImagePushed"
+            ci_images = selection.get("tagPrefixList") == [CI_TAG_PREFIX]
+            published_images = selection["tagStatus"] != "untagged" and not ci_images
+
+            if protect_image_digest and age_rule and published_images:
+                raise ValueError(f"Lifecycle rule {priority} may expire the published image digest, use max_images")
+
+            previous_rules.append(rule)
+
+    @staticmethod
+    def render(rules: list) -> str:
+        return json.dumps({"rules": rules}, separators=(",", ":"))
+
+    @staticmethod
+    def __get_rule(
+        priority: int,
+        description: str,
+        tag_status: str,
+        tag_prefixes: list = None,
+        max_images: int = None,
+        max_age_days: int = None,
+    ) -> dict:
+        if tag_status not in LifecyclePolicyHelper.TAG_STATUSES:
+            raise ValueError(f"Lifecycle rule {priority} has unknown tag status '{tag_status}'")
+
+        if (tag_status == "tagged") != (tag_prefixes is not None and len(tag_prefixes) > 0):
+            raise ValueError(f"Lifecycle rule {priority} needs tag prefixes if and only if it selects tagged images")
+
+        if (max_images is None) == (max_age_days is None):
+            raise ValueError(f"Lifecycle rule {priority} needs either max_images or max_age_days")
+
+        selection = {"tagStatus": tag_status}
+
+        if tag_prefixes is not None:
+            selection["tagPrefixList"] = list(tag_prefixes)
+
+        if max_images is not None:
+            selection["countType"] = "imageCountMoreThan"
+            selection["countNumber"] = max_images
+        else:
+            # ECR lifecycle rules count the image age in days only
+            selection["countType"] = "sinceImagePushed"
+            selection["countNumber"] = max_age_days
+            selection["countUnit"] = "days"
+
+        if selection["countNumber"] < 1:
+            raise ValueError(f"Lifecycle rule {priority} count must be 1 or more")
+
+        return {
+            "rulePriority": priority,
+            "description": description,
+            "selection": selection,
+            "action": {"type": "expire"},
+        }
+
+    @staticmethod
+    def __is_shadowed(rule: dict, previous_rule: dict) -> bool:
+        if previous_rule["tagStatus"] == "any":
+            return True
+
+        if previous_rule["tagStatus"] != rule["tagStatus"]:
+            return False
+
+        if rule["tagStatus"] == "untagged":
+            return True
+
+        # An image has every tag prefix of the rule, so it is also selected by any previous rule with shorter prefixes
+        return all(
+            any(tag_prefix.startswith(previous_prefix) for tag_prefix in rule["tagPrefixList"])
+            for previous_prefix in previous_rule["tagPrefixList"]
+        )
@@ -0,0 +1,59 @@
+import yaml
+
+from src.helpers.name import NameHelper
+
+
+class ServicesManifestHelper:
+    DEFAULT_ACTIONS = ["deploy", "destroy"]
+
+    @staticmethod
+    def get_services(file_location: str) -> list:
+        with open(file_location, "r") as manifest_file:
+            manifest = yaml.safe_load(manifest_file.read())
+
+        services = list()
+        services_names = set()
+        logical_names = set()
+
+        for service in manifest.get("services", list()):
+            name = service.get("name")
+
+            if name is None:
+                raise ValueError(f"Service without name in {file_location}")
+
+            if name in services_names:
+                raise ValueError(f"Duplicated service '{name}' in {file_location}")
+
+            logical_name = NameHelper.to_pascal_case(name=name)
+
+            if logical_name in logical_names:
+                raise ValueError(f"Service '{name}' logical name {logical_name} clashes with another service")
+
+            services_names.add(name)
+            logical_names.add(logical_name)
+
+            services.append(
+                {
+                    "name": name,
+                    "actions": service.get("actions", ServicesManifestHelper.DEFAULT_ACTIONS),
+                    "deploy_accounts": [str(account) for account in service.get("deploy_accounts", list())],
+                    "depends_on": service.get("depends_on", list()),
+                    "pin_image_digest": service.get("pin_image_digest", False),
+                    "image_manifest": service.get("image_manifest"),
+                    "fan_out": service.get("fan_out", False),
+                    "deploy_regions": service.get("deploy_regions", list()),
+                    "max_concurrent_builds": service.get("max_concurrent_builds"),
+                    "fail_fast": service.get("fail_fast", True),
+                    "lifecycle": service.get("lifecycle", dict()),
+                    "serverless_cache": service.get("serverless_cache", False),
+                    "changed_functions": service.get("changed_functions", False),
+                    "compute_profile": service.get("compute_profile"),
+                }
+            )
+
+        for service in services:
+            for dependency in service["depends_on"]:
+                if dependency not in services_names:
+                    raise ValueError(f"Service '{service['name']}' depends on unknown service '{dependency}'")
+
+        return services
@@ -2,3 +2,7 @@ class NameHelper:
     @staticmethod
     def to_pascal_case(name: str) -> str:
         return "".join(char for char in name.title() if char.isalpha())
+
+    @staticmethod
+    def to_snake_case(name: str) -> str:
+        return "".join(char if char.isalnum() else "_" for char in name.lower())
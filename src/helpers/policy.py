@@ -0,0 +1,191 @@
+import json
+import re
+
+
+class PolicyHelper:
+    # IAM policy size limits, counted without whitespaces
+    ROLE_INLINE_LIMIT = 10240
+    USER_INLINE_LIMIT = 2048
+    MANAGED_POLICY_LIMIT = 6144
+    # Default role trust policy quota, which can be raised up to 4096
+    TRUST_POLICY_LIMIT = 2048
+
+    # Default quota of managed policies attached to a role or a user
+    MAX_MANAGED_POLICIES = 10
+
+    # Only ARNs of these services are collapsed, as their resource names are free of separators
+    WILDCARD_SERVICES = ("ecr", "codebuild", "logs", "ssm")
+
+    # Unresolved tokens are sized with the longest value they can take
+    TOKEN_PATTERN = re.compile(r"\$\{Token\[([^\]]*)\]\}")
+    TOKEN_SIZES = {
+        "AWS.Partition": len("aws-us-gov"),
+        "AWS.AccountId": len("123456789012"),
+        "AWS.Region": len("ap-southeast-3"),
+        "AWS.URLSuffix": len("amazonaws.com.cn"),
+    }
+    UNKNOWN_TOKEN_SIZE = 128
+
+    @staticmethod
+    def merge(statements: list) -> list:
+        # Statements with the same actions share their resources, then statements with the same resources their actions
+        statements = PolicyHelper.__merge_by(statements=statements, merged="Resource")
+
+        return PolicyHelper.__merge_by(statements=statements, merged="Action")
+
+    @staticmethod
+    def collapse_resources(resources: list, min_prefix_length: int) -> list:
+        # Resources of the same type collapse together when they share their first min_prefix_length name characters,
+        # counted after the path all the resources of the type share
+        resource_types = dict()
+
+        for resource in dict.fromkeys(resources):
+            resource_type = PolicyHelper.__get_resource_type(resource=resource)
+            resource_types.setdefault(resource_type, list()).append(resource)
+
+        # Resources of other services are kept as they are
+        groups = {(None, resource): [resource] for resource in resource_types.pop(None, list())}
+
+        for resource_type, type_resources in resource_types.items():
+            common_path = "".join(PolicyHelper.__get_common_prefix(values=type_resources).rpartition("/")[:2])
+            common_path = common_path if len(common_path) >= len(resource_type) else resource_type
+
+            for resource in type_resources:
+                name = resource.split(common_path, 1)[1]
+                groups.setdefault((common_path, name[:min_prefix_length]), list()).append(resource)
+
+        collapsed_resources = list()
+
+        for group in groups.values():
+            if len(group) < 2:
+                collapsed_resources.extend(group)
+                continue
+
+            common_prefix = PolicyHelper.__get_common_prefix(values=group)
+            common_suffix = PolicyHelper.__get_common_suffix(
+                values=group,
+                max_length=min(len(resource) for resource in group) - len(common_prefix),
+            )
+            collapsed_resources.append(f"{common_prefix}*{common_suffix}")
+
+        return collapsed_resources
+
+    @staticmethod
+    def compact(statements: list, wildcard_min_prefix: int = None) -> list:
+        statements = PolicyHelper.merge(statements=statements)
+
+        if wildcard_min_prefix is None:
+            return statements
+
+        return PolicyHelper.merge(
+            statements=[
+                {
+                    **statement,
+                    "Resource": PolicyHelper.collapse_resources(
+                        resources=statement["Resource"],
+                        min_prefix_length=wildcard_min_prefix,
+                    ),
+                }
+                for statement in statements
+            ]
+        )
+
+    @staticmethod
+    def get_size(statements: list) -> int:
+        document = json.dumps({"Version": "2012-10-17", "Statement": statements}, separators=(",", ":"))
+
+        return len(
+            PolicyHelper.TOKEN_PATTERN.sub(
+                lambda match: "x" * PolicyHelper.__get_token_size(token=match.group(1)),
+                document,
+            )
+        )
+
+    @staticmethod
+    def split(statements: list, first_limit: int, limit: int) -> list:
+        # The first documents are filled first, statements too large for a document are split by resources
+        documents = [list()]
+
+        for statement in statements:
+            for part in PolicyHelper.__split_statement(statement=statement, limit=min(first_limit, limit)):
+                document_limit = first_limit if len(documents) == 1 else limit
+
+                if len(documents[-1]) > 0 and PolicyHelper.get_size([*documents[-1], part]) > document_limit:
+                    documents.append(list())
+
+                documents[-1].append(part)
+
+        return documents
+
+    @staticmethod
+    def __merge_by(statements: list, merged: str) -> list:
+        merged_statements = dict()
+
+        for statement in statements:
+            statement_key = json.dumps(
+                {name: value for name, value in statement.items() if name != merged},
+                sort_keys=True,
+            )
+
+            if statement_key not in merged_statements:
+                merged_statements[statement_key] = {**statement, merged: list()}
+
+            for value in statement[merged]:
+                if value not in merged_statements[statement_key][merged]:
+                    merged_statements[statement_key][merged].append(value)
+
+        return list(merged_statements.values())
+
+    @staticmethod
+    def __split_statement(statement: dict, limit: int) -> list:
+        if PolicyHelper.get_size([statement]) <= limit:
+            return [statement]
+
+        parts = [{**statement, "Resource": list()}]
+
+        for resource in statement["Resource"]:
+            part = {**parts[-1], "Resource": [*parts[-1]["Resource"], resource]}
+
+            if len(parts[-1]["Resource"]) > 0 and PolicyHelper.get_size([part]) > limit:
+                parts.append({**statement, "Resource": [resource]})
+            else:
+                parts[-1] = part
+
+        return parts
+
+    @staticmethod
+    def __get_resource_type(resource: str) -> str:
+        # arn:partition:service:region:account:type/name, up to and including the type separator
+        sections = resource.split(":", 5)
+
+        if len(sections) < 6 or sections[2] not in PolicyHelper.WILDCARD_SERVICES or "*" in sections[5].rstrip(":*"):
+            return None
+
+        match = re.match(r"[^/:]+[/:]", sections[5])
+
+        return ":".join(sections[:5]) + ":" + match.group(0) if match is not None else None
+
+    @staticmethod
+    def __get_common_prefix(values: list) -> str:
+        common_prefix = values[0]
+
+        for value in values[1:]:
+            while not value.startswith(common_prefix):
+                common_prefix = common_prefix[:-1]
+
+        return common_prefix
+
+    @staticmethod
+    def __get_common_suffix(values: list, max_length: int) -> str:
+        # Kept from a separator on, so the wildcard never ends in the middle of a word
+        common_suffix = PolicyHelper.__get_common_prefix(values=[value[::-1] for value in values])[:max_length][::-1]
+
+        return re.match(r"[A-Za-z0-9]*(.*)", common_suffix).group(1)
+
+    @staticmethod
+    def __get_token_size(token: str) -> int:
+        for name, size in PolicyHelper.TOKEN_SIZES.items():
+            if token.startswith(name):
+                return size
+
+        return PolicyHelper.UNKNOWN_TOKEN_SIZE
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# credential_process of the deploy profile, runs inside the deploy images with the standard library and the AWS CLI
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+
+CACHE_DIRECTORY = os.path.expanduser("~/.aws/credential-process-cache")
+
+# Credentials are refreshed before the SDKs consider them expired
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+def get_cache_location(role_arn: str, session_name: str, duration: int) -> str:
+    cache_key = hashlib.sha256(f"{role_arn}|{session_name}|{duration}".encode("utf-8")).hexdigest()
+
+    return os.path.join(CACHE_DIRECTORY, f"{cache_key}.json")
+
+
+def is_valid(credentials: dict, now: datetime.datetime) -> bool:
+    expiration = datetime.datetime.strptime(credentials["Expiration"], "%Y-%m-%dT%H:%M:%SZ")
+
+    return expiration - REFRESH_MARGIN > now
+
+
+def to_process_credentials(sts_credentials: dict) -> dict:
+    # The CLI prints the expiration with an offset, credential_process expects an ISO 8601 UTC timestamp
+    expiration = datetime.datetime.fromisoformat(sts_credentials["Expiration"].replace("Z", "+00:00"))
+
+    return {
+        "Version": 1,
+        "AccessKeyId": sts_credentials["AccessKeyId"],
+        "SecretAccessKey": sts_credentials["SecretAccessKey"],
+        "SessionToken": sts_credentials["SessionToken"],
+        "Expiration": expiration.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def read_cache(cache_location: str) -> dict:
+    try:
+        with open(cache_location, "r") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(cache_location: str, credentials: dict) -> None:
+    os.makedirs(os.path.dirname(cache_location), mode=0o700, exist_ok=True)
+
+    file_descriptor = os.open(cache_location, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(file_descriptor, "w") as cache_file:
+        json.dump(credentials, cache_file)
+
+
+def assume_role(role_arn: str, session_name: str, duration: int) -> dict:
+    # The profile using this process must not be used to assume the role itself
+    environment = {name: value for name, value in os.environ.items() if name != "AWS_PROFILE"}
+
+    result = subprocess.run(
+        [
+            "aws",
+            "sts",
+            "assume-role",
+            "--role-arn",
+            role_arn,
+            "--role-session-name",
+            session_name,
+            "--duration-seconds",
+            str(duration),
+            "--output",
+            "json",
+        ],
+        capture_output=True,
+        text=True,
+        env=environment,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    return to_process_credentials(sts_credentials=json.loads(result.stdout)["Credentials"])
+
+
+def get_credentials(role_arn: str, session_name: str, duration: int, now: datetime.datetime = None) -> dict:
+    now = now if now is not None else datetime.datetime.utcnow()
+    cache_location = get_cache_location(role_arn=role_arn, session_name=session_name, duration=duration)
+
+    credentials = read_cache(cache_location=cache_location)
+
+    if credentials is None or not is_valid(credentials=credentials, now=now):
+        credentials = assume_role(role_arn=role_arn, session_name=session_name, duration=duration)
+        write_cache(cache_location=cache_location, credentials=credentials)
+
+    return credentials
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assumes a role once and prints its cached credentials")
+    parser.add_argument("--role-arn", required=True, help="Role to assume")
+    parser.add_argument("--session-name", required=True, help="Role session name")
+    parser.add_argument("--duration", type=int, default=3600, help="Session duration in seconds")
+    args = parser.parse_args()
+
+    print(json.dumps(get_credentials(role_arn=args.role_arn, session_name=args.session_name, duration=args.duration)))
+
+
+if __name__ == "__main__":
+    main()
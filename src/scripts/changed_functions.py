@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# Runs inside the deploy images with the standard library and the AWS CLI. AWS calls go through run_aws,
+# which the callers can replace to select the functions against a fake AWS.
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+
+# Any change outside the functions handlers may change the infrastructure or several functions at once
+IGNORED_DIRECTORIES = {".git", ".serverless", ".serverless-state"}
+
+
+class AwsError(Exception):
+    pass
+
+
+def run_aws(arguments: list) -> dict:
+    result = subprocess.run(["aws", *arguments, "--output", "json"], capture_output=True, text=True)
+
+    if result.returncode != 0:
+        raise AwsError(result.stderr)
+
+    return json.loads(result.stdout) if result.stdout.strip() != "" else dict()
+
+
+def get_files_hashes(directory: str) -> dict:
+    files_hashes = dict()
+
+    for root, directories, files in os.walk(directory):
+        directories[:] = sorted(name for name in directories if name not in IGNORED_DIRECTORIES)
+
+        for file_name in sorted(files):
+            file_location = os.path.join(root, file_name)
+            relative_location = os.path.relpath(file_location, directory).replace(os.sep, "/")
+
+            file_hash = hashlib.sha256()
+            with open(file_location, "rb") as source_file:
+                for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+                    file_hash.update(chunk)
+
+            files_hashes[relative_location] = file_hash.hexdigest()
+
+    return files_hashes
+
+
+def get_config_hash(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_changed_files(previous_files: dict, files: dict) -> list:
+    return sorted(
+        location for location in set(previous_files) | set(files) if previous_files.get(location) != files.get(location)
+    )
+
+
+def get_handler_modules(config: dict) -> dict:
+    # A handler like src/orders/create.handler lives in a src/orders/create.* file
+    handler_modules = dict()
+
+    for function_name, function in config.get("functions", dict()).items():
+        handler = function.get("handler")
+
+        if handler is None:
+            continue
+
+        handler_modules[handler.rsplit(".", 1)[0]] = function_name
+
+    return handler_modules
+
+
+def get_service_name(config: dict) -> str:
+    service = config["service"]
+
+    return service["name"] if isinstance(service, dict) else service
+
+
+def get_deployed_fingerprint(run, config: dict, stage: str, region: str) -> dict:
+    # Last update of the stage stack and code of its functions, as deployed by any build, on any CodeBuild host
+    service_name = get_service_name(config=config)
+    stack_name = config.get("provider", dict()).get("stackName") or f"{service_name}-{stage}"
+
+    try:
+        stack = run(["cloudformation", "describe-stacks", "--stack-name", stack_name, "--region", region])["Stacks"][0]
+    except AwsError:
+        return None
+
+    functions = dict()
+
+    for function_key, function in sorted(config.get("functions", dict()).items()):
+        function_name = function.get("name") or f"{service_name}-{stage}-{function_key}"
+
+        try:
+            function_config = run(
+                ["lambda", "get-function-configuration", "--function-name", function_name, "--region", region]
+            )
+        except AwsError:
+            return None
+
+        functions[function_key] = function_config["CodeSha256"]
+
+    return {"stack_updated": stack.get("LastUpdatedTime", stack["CreationTime"]), "functions": functions}
+
+
+def select_functions(config: dict, files: dict, state: dict, deployed: dict) -> dict:
+    if state is None:
+        return {"mode": "full", "functions": list(), "reason": "no previous deploy"}
+
+    if deployed is None:
+        return {"mode": "full", "functions": list(), "reason": "stage stack or functions not found"}
+
+    # The state comes from the local cache of this host, a build on another host may have deployed the stage since
+    if state.get("deployed") != deployed:
+        return {"mode": "full", "functions": list(), "reason": "stage deployed since the cached state"}
+
+    if state["config_hash"] != get_config_hash(config=config):
+        return {"mode": "full", "functions": list(), "reason": "serverless configuration changed"}
+
+    changed_files = get_changed_files(previous_files=state["files"], files=files)
+
+    if len(changed_files) == 0:
+        return {"mode": "none", "functions": list(), "reason": "no changes"}
+
+    handler_modules = get_handler_modules(config=config)
+    functions = set()
+
+    for changed_file in changed_files:
+        function_name = handler_modules.get(os.path.splitext(changed_file)[0])
+
+        if function_name is None:
+            return {"mode": "full", "functions": list(), "reason": f"{changed_file} is not a function handler"}
+
+        functions.add(function_name)
+
+    return {"mode": "functions", "functions": sorted(functions), "reason": f"changed handlers: {len(changed_files)}"}
+
+
+def read_json(file_location: str) -> dict:
+    if not os.path.exists(file_location):
+        return None
+
+    with open(file_location, "r") as json_file:
+        return json.load(json_file)
+
+
+def save_state(config: dict, files: dict, deployed: dict, state_location: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(state_location)), exist_ok=True)
+
+    state = {"config_hash": get_config_hash(config=config), "files": files, "deployed": deployed}
+
+    with open(state_location, "w") as state_file:
+        json.dump(state, state_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selects the Serverless functions changed since the last deploy")
+    parser.add_argument("command", choices=["select", "save"], help="Select the functions or save the deploy state")
+    parser.add_argument("--config", required=True, help="Resolved configuration JSON, from sls print")
+    parser.add_argument("--state", required=True, help="Deploy state JSON of the stage")
+    parser.add_argument("--directory", default=".", help="Serverless service directory")
+    parser.add_argument("--stage", required=True, help="Serverless stage")
+    parser.add_argument("--region", required=True, help="Serverless region")
+    args = parser.parse_args()
+
+    config = read_json(file_location=args.config)
+    files = get_files_hashes(directory=args.directory)
+    deployed = get_deployed_fingerprint(run=run_aws, config=config, stage=args.stage, region=args.region)
+
+    if args.command == "save":
+        save_state(config=config, files=files, deployed=deployed, state_location=args.state)
+        return
+
+    selection = select_functions(
+        config=config,
+        files=files,
+        state=read_json(file_location=args.state),
+        deployed=deployed,
+    )
+
+    # Printed as shell assignments for the buildspec to eval
+    print(f"DEPLOY_MODE={selection['mode']}")
+    print(f"DEPLOY_FUNCTIONS={shlex.quote(' '.join(selection['functions']))}")
+    print(f"DEPLOY_REASON={shlex.quote(selection['reason'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# Runs inside the deploy images with the standard library and the AWS CLI. AWS calls go through run_aws,
+# which the callers can replace to run the pipeline against a fake AWS.
+import argparse
+import functools
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Resources of a level are deleted concurrently, once every resource of the previous levels is gone
+DELETE_LEVELS = [
+    ["cloudformation"],
+    ["lambda", "sqs", "sns", "dynamodb", "s3"],
+    ["logs"],
+]
+
+STACK_NAME_TAG = "aws:cloudformation:stack-name"
+
+
+class AwsError(Exception):
+    pass
+
+
+def run_aws(arguments: list, region: str) -> dict:
+    # The stage region, not the region the build runs in
+    result = subprocess.run(
+        ["aws", *arguments, "--region", region, "--output", "json"],
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        raise AwsError(result.stderr)
+
+    return json.loads(result.stdout) if result.stdout.strip() != "" else dict()
+
+
+def get_stack_name(resource: dict) -> str:
+    if get_service(resource_arn=resource["ResourceARN"]) == "cloudformation":
+        return get_resource_name(resource_arn=resource["ResourceARN"])
+
+    tags = {tag["Key"]: tag["Value"] for tag in resource.get("Tags", list())}
+
+    return tags.get(STACK_NAME_TAG)
+
+
+def get_stage_resources(run, service: str, stage: str, app_stacks: list = ()) -> list:
+    resources = list()
+    arguments = [
+        "resourcegroupstaggingapi",
+        "get-resources",
+        "--tag-filters",
+        f"Key=service,Values={service}",
+        f"Key=stage,Values={stage}",
+    ]
+
+    response = run(arguments)
+    resources.extend(response.get("ResourceTagMappingList", list()))
+
+    while response.get("PaginationToken"):
+        response = run([*arguments, "--pagination-token", response["PaginationToken"]])
+        resources.extend(response.get("ResourceTagMappingList", list()))
+
+    # The stacks of the app carry a stage tag too, their resources are never part of a service stage
+    return [resource["ResourceARN"] for resource in resources if get_stack_name(resource=resource) not in app_stacks]
+
+
+def get_service(resource_arn: str) -> str:
+    return resource_arn.split(":")[2]
+
+
+def get_resource_name(resource_arn: str) -> str:
+    resource = resource_arn.split(":", 5)[5]
+
+    if resource.startswith("stack/"):
+        return resource.split("/")[1]
+
+    for prefix in ("table/", "function:", "log-group:"):
+        if resource.startswith(prefix):
+            return resource.split(prefix, 1)[1]
+
+    return resource
+
+
+def is_not_found(error: AwsError) -> bool:
+    return any(
+        code in str(error)
+        for code in ("ResourceNotFoundException", "NonExistentQueue", "NotFound", "NoSuchBucket", "does not exist")
+    )
+
+
+def wait_until_deleted(run, exists, timeout: float, sleep=time.sleep) -> None:
+    # Exponential backoff, capped so the last checks are not minutes apart
+    delay = 1
+    waited = 0
+
+    while exists(run):
+        if waited >= timeout:
+            raise TimeoutError(f"Still not deleted after {waited}s")
+
+        sleep(delay)
+        waited += delay
+        delay = min(delay * 2, 30)
+
+
+def delete_stack(run, resource_arn: str, name: str):
+    run(["cloudformation", "delete-stack", "--stack-name", name])
+
+    def exists(run):
+        stacks = run(["cloudformation", "describe-stacks", "--stack-name", name])["Stacks"]
+        return len(stacks) > 0 and stacks[0]["StackStatus"] != "DELETE_COMPLETE"
+
+    return exists
+
+
+def delete_table(run, resource_arn: str, name: str):
+    run(["dynamodb", "delete-table", "--table-name", name])
+
+    def exists(run):
+        run(["dynamodb", "describe-table", "--table-name", name])
+        return True
+
+    return exists
+
+
+def delete_bucket(run, resource_arn: str, name: str):
+    run(["s3", "rb", f"s3://{name}", "--force"])
+
+
+def delete_queue(run, resource_arn: str, name: str):
+    queue_url = run(["sqs", "get-queue-url", "--queue-name", name])["QueueUrl"]
+    run(["sqs", "delete-queue", "--queue-url", queue_url])
+
+
+def delete_topic(run, resource_arn: str, name: str):
+    run(["sns", "delete-topic", "--topic-arn", resource_arn])
+
+
+def delete_function(run, resource_arn: str, name: str):
+    run(["lambda", "delete-function", "--function-name", name])
+
+
+def delete_log_group(run, resource_arn: str, name: str):
+    run(["logs", "delete-log-group", "--log-group-name", name])
+
+
+# Deleters return a check of the resource existence when its deletion is asynchronous
+DELETERS = {
+    "cloudformation": delete_stack,
+    "dynamodb": delete_table,
+    "s3": delete_bucket,
+    "sqs": delete_queue,
+    "sns": delete_topic,
+    "lambda": delete_function,
+    "logs": delete_log_group,
+}
+
+
+def delete_resource(run, resource_arn: str, timeout: float, sleep=time.sleep) -> None:
+    service = get_service(resource_arn=resource_arn)
+
+    if service not in DELETERS:
+        raise ValueError(f"Unsupported resource {resource_arn}")
+
+    exists = DELETERS[service](run=run, resource_arn=resource_arn, name=get_resource_name(resource_arn=resource_arn))
+
+    if exists is None:
+        return
+
+    def exists_or_gone(run):
+        try:
+            return exists(run)
+        except AwsError as error:
+            if is_not_found(error=error):
+                return False
+            raise
+
+    wait_until_deleted(run=run, exists=exists_or_gone, timeout=timeout, sleep=sleep)
+
+
+def delete_level(run, resources: list, max_workers: int, timeout: float, sleep=time.sleep) -> list:
+    def delete(resource_arn):
+        start = time.monotonic()
+
+        try:
+            delete_resource(run=run, resource_arn=resource_arn, timeout=timeout, sleep=sleep)
+            error = None
+        except AwsError as aws_error:
+            # Already deleted, for instance by its CloudFormation stack
+            error = None if is_not_found(error=aws_error) else str(aws_error).strip()
+        except (TimeoutError, ValueError) as delete_error:
+            error = str(delete_error)
+
+        return {"resource": resource_arn, "seconds": time.monotonic() - start, "error": error}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(delete, resources))
+
+
+def destroy_stage(
+    service: str,
+    stage: str,
+    run,
+    app_stacks: list = (),
+    max_workers: int = 8,
+    timeout: float = 1800,
+    sleep=time.sleep,
+) -> list:
+    results = list()
+    deleted = set()
+
+    for level in DELETE_LEVELS:
+        # Resources are discovered again after each level, as the stacks take their own resources with them
+        resources = [
+            resource_arn
+            for resource_arn in get_stage_resources(run=run, service=service, stage=stage, app_stacks=app_stacks)
+            if get_service(resource_arn=resource_arn) in level and resource_arn not in deleted
+        ]
+
+        level_results = delete_level(
+            run=run, resources=resources, max_workers=max_workers, timeout=timeout, sleep=sleep
+        )
+        deleted.update(result["resource"] for result in level_results)
+        results.extend(level_results)
+
+    return results
+
+
+def print_report(results: list) -> None:
+    for result in sorted(results, key=lambda item: item["seconds"], reverse=True):
+        status = "FAILED" if result["error"] is not None else "deleted"
+        print(f"{result['seconds']:>8.1f}s {status:>8} {result['resource']}")
+
+        if result["error"] is not None:
+            print(f"{'':>18}{result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deletes the resources tagged with a service and stage")
+    parser.add_argument("--service", required=True, help="Value of the service tag")
+    parser.add_argument("--stage", required=True, help="Value of the stage tag")
+    parser.add_argument("--region", required=True, help="Region of the stage")
+    parser.add_argument("--app-stacks", default="", help="Comma separated stacks whose resources are never deleted")
+    parser.add_argument("--max-workers", type=int, default=8, help="Resources deleted at the same time")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds to wait for each resource deletion")
+    args = parser.parse_args()
+
+    results = destroy_stage(
+        service=args.service,
+        stage=args.stage,
+        run=functools.partial(run_aws, region=args.region),
+        app_stacks=[stack for stack in args.app_stacks.split(",") if stack != ""],
+        max_workers=args.max_workers,
+        timeout=args.timeout,
+    )
+    print_report(results=results)
+
+    if any(result["error"] is not None for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Runs in the build-images project with the standard library and the AWS CLI. AWS calls go through run_aws,
+# which the callers can replace to build the index against a fake AWS.
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Index shards are standard tier parameters, which hold up to 4 KB
+MAX_SHARD_SIZE = 4096
+
+# DeleteParameters accepts up to 10 names
+DELETE_BATCH_SIZE = 10
+
+# Index updates read back by concurrent builds before giving up
+MAX_ATTEMPTS = 5
+
+
+class AwsError(Exception):
+    pass
+
+
+class IndexConflictError(Exception):
+    pass
+
+
+def run_aws(arguments: list) -> dict:
+    result = subprocess.run(["aws", *arguments, "--output", "json"], capture_output=True, text=True)
+
+    if result.returncode != 0:
+        raise AwsError(result.stderr)
+
+    return json.loads(result.stdout) if result.stdout.strip() != "" else dict()
+
+
+def get_parameters(run, path: str) -> dict:
+    # The CLI follows the pagination of GetParametersByPath
+    response = run(["ssm", "get-parameters-by-path", "--path", path, "--recursive"])
+
+    return {parameter["Name"]: parameter["Value"] for parameter in response.get("Parameters", list())}
+
+
+def get_index(parameters: dict, path: str, registry: str) -> dict:
+    # Image digests are published as <path>/<service>/image-digest
+    index = dict()
+
+    for name, value in parameters.items():
+        service, _, parameter = name.split(f"{path}/", 1)[1].partition("/")
+
+        if parameter == "image-digest":
+            index[service] = {"image": f"{registry}/{service}", "digest": value}
+
+    return index
+
+
+def to_shards(index: dict) -> list:
+    shards = [dict()]
+
+    for service in sorted(index):
+        shard = {**shards[-1], service: index[service]}
+
+        if len(shards[-1]) > 0 and len(json.dumps(shard, separators=(",", ":"))) > MAX_SHARD_SIZE:
+            shards.append({service: index[service]})
+        else:
+            shards[-1] = shard
+
+    return [json.dumps(shard, separators=(",", ":"), sort_keys=True) for shard in shards]
+
+
+def get_shard_parameters(parameters: dict, path: str, index_path: str, registry: str) -> tuple:
+    # Shards of the published digests by parameter name, and the shards currently stored
+    shards = to_shards(index=get_index(parameters=parameters, path=path, registry=registry))
+    expected = {f"{index_path}/{number}": shard for number, shard in enumerate(shards)}
+    stored = {name: value for name, value in parameters.items() if name.startswith(f"{index_path}/")}
+
+    return expected, stored
+
+
+def update_index(run, path: str, index_path: str, registry: str, sleep=time.sleep) -> dict:
+    updated_names = list()
+    deleted_names = list()
+
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt > 0:
+            sleep(2 ** (attempt - 1))
+
+        parameters = get_parameters(run=run, path=path)
+        shards = to_shards(index=get_index(parameters=parameters, path=path, registry=registry))
+        result = write_index(run=run, parameters=parameters, index_path=index_path, shards=shards)
+        updated_names.extend(result["updated"])
+        deleted_names.extend(result["deleted"])
+
+        # A build updating the index at the same time may have written the shards of an older index over these ones,
+        # or published a digest since, so the index is read back and written again until it matches the digests
+        expected, stored = get_shard_parameters(
+            parameters=get_parameters(run=run, path=path), path=path, index_path=index_path, registry=registry
+        )
+
+        if expected == stored:
+            return {
+                "shards": len(expected),
+                "updated": updated_names,
+                "deleted": deleted_names,
+                "attempts": attempt + 1,
+            }
+
+    raise IndexConflictError(f"Image index still changing after {MAX_ATTEMPTS} attempts")
+
+
+def write_index(run, parameters: dict, index_path: str, shards: list) -> dict:
+    updated_names = list()
+
+    for number, shard in enumerate(shards):
+        name = f"{index_path}/{number}"
+
+        # Unchanged shards are left alone, so concurrent builds only rewrite what they changed
+        if parameters.get(name) != shard:
+            run(["ssm", "put-parameter", "--name", name, "--value", shard, "--type", "String", "--overwrite"])
+            updated_names.append(name)
+
+    shard_names = {f"{index_path}/{number}" for number in range(len(shards))}
+    deleted_names = sorted(name for name in parameters if name.startswith(f"{index_path}/") and name not in shard_names)
+    remaining_names = list(deleted_names)
+
+    while len(remaining_names) > 0:
+        batch_names, remaining_names = remaining_names[:DELETE_BATCH_SIZE], remaining_names[DELETE_BATCH_SIZE:]
+        run(["ssm", "delete-parameters", "--names", *batch_names])
+
+    return {"updated": updated_names, "deleted": deleted_names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuilds the image index from the published image digests")
+    parser.add_argument("--path", required=True, help="Images parameters path")
+    parser.add_argument("--index-path", required=True, help="Path of the index shards")
+    parser.add_argument("--registry", required=True, help="ECR registry of the images")
+    args = parser.parse_args()
+
+    try:
+        result = update_index(run=run_aws, path=args.path, index_path=args.index_path, registry=args.registry)
+    except (AwsError, IndexConflictError) as error:
+        print(f"Image index not updated: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    print(
+        f"Image index: {result['shards']} shards, {len(result['updated'])} updated, {len(result['deleted'])} deleted, "
+        f"{result['attempts']} attempts"
+    )
+
+
+if __name__ == "__main__":
+    main()
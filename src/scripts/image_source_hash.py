@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Runs inside the build-images project, so it must only depend on the standard library and the AWS CLI
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+
+CI_TAG_PREFIX = "ci_"
+SOURCE_TAG_PREFIX = "src-"
+
+IGNORED_DIRECTORIES = {".git"}
+
+ECR_IMAGE_PATTERN = re.compile(
+    r"^(?P<registry>\d{12})\.dkr\.ecr\.(?P<region>[a-z0-9-]+)\.amazonaws\.com/(?P<repository>[^:@]+)(:(?P<tag>[^@]+))?$"
+)
+VARIABLE_PATTERN = re.compile(r"\$\{?(\w+)\}?")
+
+
+def run_aws(arguments: list) -> subprocess.CompletedProcess:
+    return subprocess.run(["aws", *arguments, "--output", "json"], capture_output=True, text=True)
+
+
+def get_source_hash(directory: str, base_images: list = None, build_args: list = None) -> str:
+    source_hash = hashlib.sha256()
+
+    # Rebuilt parent images and other build arguments change the image as much as the build context
+    for base_image in base_images if base_images is not None else list():
+        source_hash.update(f"FROM {base_image}".encode("utf-8") + b"\0")
+
+    for build_arg in sorted(build_args if build_args is not None else list()):
+        source_hash.update(f"ARG {build_arg}".encode("utf-8") + b"\0")
+
+    for root, directories, files in os.walk(directory):
+        directories[:] = sorted(name for name in directories if name not in IGNORED_DIRECTORIES)
+
+        for file_name in sorted(files):
+            file_location = os.path.join(root, file_name)
+            relative_location = os.path.relpath(file_location, directory).replace(os.sep, "/")
+
+            # Paths and executable bits are part of the build context as much as the contents
+            source_hash.update(relative_location.encode("utf-8") + b"\0")
+            source_hash.update(b"x" if os.access(file_location, os.X_OK) else b"-")
+
+            with open(file_location, "rb") as source_file:
+                for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+                    source_hash.update(chunk)
+
+            source_hash.update(b"\0")
+
+    return source_hash.hexdigest()
+
+
+def get_source_tag(source_hash: str) -> str:
+    return f"{SOURCE_TAG_PREFIX}{source_hash}"
+
+
+def get_base_images(dockerfile: str, build_args: list) -> list:
+    # Image references of the FROM instructions, with the ARG defaults and the build arguments expanded
+    variables = dict()
+    stages = set()
+    base_images = list()
+
+    for line in dockerfile.splitlines():
+        instruction, _, arguments = line.strip().partition(" ")
+        arguments = [argument for argument in arguments.split() if not argument.startswith("--")]
+
+        if instruction.upper() == "ARG" and len(arguments) > 0:
+            name, _, default = arguments[0].partition("=")
+            variables.setdefault(name, default)
+
+        if instruction.upper() == "FROM" and len(arguments) > 0:
+            for build_arg in build_args:
+                name, _, value = build_arg.partition("=")
+                variables[name] = value
+
+            image = VARIABLE_PATTERN.sub(lambda match: variables.get(match.group(1), ""), arguments[0])
+
+            # Later stages can start from an earlier one instead of an image
+            if image not in stages:
+                base_images.append(image)
+
+            if len(arguments) == 3 and arguments[1].upper() == "AS":
+                stages.add(arguments[2])
+
+    return base_images
+
+
+def resolve_base_image(image: str, run=run_aws) -> str:
+    # ECR images, like the parents of build-graph builds, are pinned to the digest of their tag. Other images are
+    # hashed by reference, so a moved tag of a public image is only picked up with a new build context
+    match = ECR_IMAGE_PATTERN.match(image)
+
+    if match is None:
+        return image
+
+    result = run(
+        [
+            "ecr",
+            "describe-images",
+            "--registry-id",
+            match.group("registry"),
+            "--region",
+            match.group("region"),
+            "--repository-name",
+            match.group("repository"),
+            "--image-ids",
+            f"imageTag={match.group('tag') or 'latest'}",
+        ]
+    )
+
+    if result.returncode != 0:
+        if "ImageNotFoundException" in result.stderr:
+            return image
+
+        raise RuntimeError(result.stderr)
+
+    return f"{image}@{json.loads(result.stdout)['imageDetails'][0]['imageDigest']}"
+
+
+def get_tag_class(tag: str) -> str:
+    return "ci" if tag.startswith(CI_TAG_PREFIX) else "release"
+
+
+def can_reuse_image(image_tags: list, image_tag: str) -> bool:
+    # Images with a CI tag expire with the CI lifecycle rule, taking every other tag of the image with them, so an
+    # image is only shared by tags of the same class: CI tags on CI images, release tags on release images
+    tag_class = get_tag_class(tag=image_tag)
+
+    return all(get_tag_class(tag=tag) == tag_class for tag in image_tags if not tag.startswith(SOURCE_TAG_PREFIX))
+
+
+def get_build_plan(image_tags: list, image_tag: str, source_tag: str) -> dict:
+    if image_tags is None:
+        return {"IMAGE_REUSED": "false", "SOURCE_TAG": source_tag}
+
+    if can_reuse_image(image_tags=image_tags, image_tag=image_tag):
+        return {"IMAGE_REUSED": "true", "SOURCE_TAG": ""}
+
+    # The source tag is immutable and already taken, the rebuilt image only gets the requested tag
+    return {"IMAGE_REUSED": "false", "SOURCE_TAG": ""}
+
+
+def get_image_tags(repository: str, tag: str, run=run_aws) -> list:
+    result = run(["ecr", "describe-images", "--repository-name", repository, "--image-ids", f"imageTag={tag}"])
+
+    if result.returncode != 0:
+        if "ImageNotFoundException" in result.stderr:
+            return None
+
+        raise RuntimeError(result.stderr)
+
+    return json.loads(result.stdout)["imageDetails"][0].get("imageTags", list())
+
+
+def tag_image(repository: str, source_tag: str, image_tag: str, run=run_aws) -> None:
+    result = run(["ecr", "batch-get-image", "--repository-name", repository, "--image-ids", f"imageTag={source_tag}"])
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    image = json.loads(result.stdout)["images"][0]
+
+    result = run(
+        [
+            "ecr",
+            "put-image",
+            "--repository-name",
+            repository,
+            "--image-tag",
+            image_tag,
+            "--image-manifest",
+            image["imageManifest"],
+            "--image-manifest-media-type",
+            image["imageManifestMediaType"],
+        ]
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reuses the image built from the same build context if it exists")
+    parser.add_argument("--repository", required=True, help="ECR repository name")
+    parser.add_argument("--image-tag", required=True, help="Tag of the image to build")
+    parser.add_argument("--context", default=".", help="Docker build context directory")
+    parser.add_argument("--build-arg", action="append", default=list(), help="Docker build argument, as NAME=VALUE")
+    args = parser.parse_args()
+
+    base_images = list()
+    dockerfile_location = os.path.join(args.context, "Dockerfile")
+
+    if os.path.exists(dockerfile_location):
+        with open(dockerfile_location, "r") as dockerfile:
+            base_images = get_base_images(dockerfile=dockerfile.read(), build_args=args.build_arg)
+
+    source_hash = get_source_hash(
+        directory=args.context,
+        base_images=[resolve_base_image(image=image) for image in base_images],
+        build_args=args.build_arg,
+    )
+    source_tag = get_source_tag(source_hash=source_hash)
+    image_tags = get_image_tags(repository=args.repository, tag=source_tag)
+
+    build_plan = get_build_plan(image_tags=image_tags, image_tag=args.image_tag, source_tag=source_tag)
+
+    if build_plan["IMAGE_REUSED"] == "true" and args.image_tag not in image_tags:
+        tag_image(repository=args.repository, source_tag=source_tag, image_tag=args.image_tag)
+
+    # Printed as shell assignments for the buildspec to eval
+    for name, value in build_plan.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
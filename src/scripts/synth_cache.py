@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# Runs before the CDK app is loaded, so it must only depend on the standard library
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Everything the synthesized templates are built from, buildspecs and fragments included as they live in src
+INPUT_DIRECTORIES = ["src"]
+INPUT_FILES = ["app.py", "cdk.json", "cdk.context.json", "setup.py", "requirements.txt"]
+IGNORED_DIRECTORIES = {"__pycache__"}
+IGNORED_EXTENSIONS = {".pyc", ".pyo"}
+
+# Environment variables read by the CDK CLI and the app while synthesizing
+INPUT_ENVIRONMENT_VARIABLES = ["CDK_CONTEXT_JSON", "CDK_DEFAULT_ACCOUNT", "CDK_DEFAULT_REGION"]
+
+# Installed versions, pinned by setup.py but possibly installed differently
+INPUT_PACKAGES = ["aws-cdk.core", "jsii"]
+
+CACHE_INFO_FILE = "synth-cache.json"
+
+DEFAULT_SERVICES_MANIFEST = "src/config/services.yml"
+
+# Image manifests of the services, in YAML or JSON manifests. PyYAML is not in the standard library
+IMAGE_MANIFEST_PATTERN = re.compile(r"""["']?image_manifest["']?\s*:\s*["']?([^"'\s,}]+)""")
+
+
+def get_input_files(root_dir: str, extra_files: list = None) -> list:
+    input_files = [
+        name for name in [*INPUT_FILES, *(extra_files or list())] if os.path.isfile(os.path.join(root_dir, name))
+    ]
+
+    for input_directory in INPUT_DIRECTORIES:
+        for directory, directories, files in os.walk(os.path.join(root_dir, input_directory)):
+            directories[:] = sorted(name for name in directories if name not in IGNORED_DIRECTORIES)
+
+            for file_name in files:
+                if os.path.splitext(file_name)[1] in IGNORED_EXTENSIONS:
+                    continue
+
+                input_files.append(os.path.relpath(os.path.join(directory, file_name), root_dir).replace(os.sep, "/"))
+
+    return sorted(set(input_files))
+
+
+def get_package_versions() -> dict:
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python 3.7 and older, the versions are still pinned by setup.py
+        return dict()
+
+    versions = dict()
+
+    for package in INPUT_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return versions
+
+
+def get_inputs_hash(
+    root_dir: str,
+    context: list,
+    environment: dict,
+    package_versions: dict,
+    extra_files: list = None,
+) -> str:
+    inputs_hash = hashlib.sha256()
+
+    for input_file in get_input_files(root_dir=root_dir, extra_files=extra_files):
+        inputs_hash.update(input_file.encode("utf-8") + b"\0")
+
+        with open(os.path.join(root_dir, input_file), "rb") as file:
+            inputs_hash.update(hashlib.sha256(file.read()).digest())
+
+    inputs = {
+        # Context flags override each other by key, so their order only matters for repeated keys
+        "context": context,
+        "environment": {name: environment.get(name) for name in INPUT_ENVIRONMENT_VARIABLES},
+        "packages": package_versions,
+    }
+    inputs_hash.update(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+
+    return inputs_hash.hexdigest()
+
+
+def get_context_files(root_dir: str, context: list) -> list:
+    # The services manifest can live outside src, its location comes from cdk.json or the context flags
+    context_values = dict()
+
+    cdk_json_location = os.path.join(root_dir, "cdk.json")
+    if os.path.isfile(cdk_json_location):
+        with open(cdk_json_location, "r") as cdk_json:
+            context_values.update(json.load(cdk_json).get("context", dict()))
+
+    for flag in context:
+        key, _, value = flag.partition("=")
+        context_values[key] = value
+
+    services_manifest = context_values.get("services_manifest", DEFAULT_SERVICES_MANIFEST)
+
+    return [services_manifest, *get_image_manifests(root_dir=root_dir, services_manifest=services_manifest)]
+
+
+def get_image_manifests(root_dir: str, services_manifest: str) -> list:
+    # Image manifests are read by the app from its working directory, the root directory
+    manifest_location = os.path.join(root_dir, services_manifest)
+
+    if not os.path.isfile(manifest_location):
+        return list()
+
+    image_manifests = list()
+
+    with open(manifest_location, "r") as manifest_file:
+        for line in manifest_file:
+            if line.lstrip().startswith("#"):
+                continue
+
+            image_manifests.extend(match.group(1) for match in IMAGE_MANIFEST_PATTERN.finditer(line))
+
+    return image_manifests
+
+
+def restore(cache_dir: str, inputs_hash: str, output_dir: str) -> dict:
+    entry_dir = os.path.join(cache_dir, inputs_hash)
+    info_location = os.path.join(entry_dir, CACHE_INFO_FILE)
+
+    if not os.path.isfile(info_location):
+        return None
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    shutil.copytree(os.path.join(entry_dir, "cdk.out"), output_dir)
+
+    # Recently used entries are pruned last
+    os.utime(entry_dir)
+
+    with open(info_location, "r") as info_file:
+        return json.load(info_file)
+
+
+def store(cache_dir: str, inputs_hash: str, output_dir: str, synth_seconds: float, max_entries: int) -> None:
+    entry_dir = os.path.join(cache_dir, inputs_hash)
+
+    if os.path.isdir(entry_dir):
+        shutil.rmtree(entry_dir)
+
+    shutil.copytree(output_dir, os.path.join(entry_dir, "cdk.out"))
+
+    with open(os.path.join(entry_dir, CACHE_INFO_FILE), "w") as info_file:
+        json.dump({"inputs_hash": inputs_hash, "synth_seconds": synth_seconds}, info_file)
+
+    prune(cache_dir=cache_dir, max_entries=max_entries)
+
+
+def prune(cache_dir: str, max_entries: int) -> None:
+    entries = sorted(
+        (os.path.join(cache_dir, name) for name in os.listdir(cache_dir)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+
+    for entry_dir in entries[max_entries:]:
+        shutil.rmtree(entry_dir)
+
+
+def synth(command: list, context: list, output_dir: str) -> float:
+    start = time.perf_counter()
+
+    context_arguments = [argument for flag in context for argument in ("--context", flag)]
+    subprocess.run([*command, "--output", output_dir, *context_arguments], cwd=ROOT_DIR, check=True)
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesizes the CDK app, unless its inputs did not change")
+    parser.add_argument("-c", "--context", action="append", default=list(), help="CDK context flag, as key=value")
+    parser.add_argument("--output", default="cdk.out", help="CDK output directory")
+    parser.add_argument("--cache-dir", default=".synth-cache", help="Directory of the cached outputs")
+    parser.add_argument("--max-entries", type=int, default=5, help="Cached outputs kept")
+    parser.add_argument("--command", default="cdk synth --quiet", help="Synth command, without output or context")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(ROOT_DIR, args.output)
+    cache_dir = os.path.join(ROOT_DIR, args.cache_dir)
+
+    inputs_hash = get_inputs_hash(
+        root_dir=ROOT_DIR,
+        context=args.context,
+        environment=dict(os.environ),
+        package_versions=get_package_versions(),
+        extra_files=get_context_files(root_dir=ROOT_DIR, context=args.context),
+    )
+
+    start = time.perf_counter()
+    cache_info = restore(cache_dir=cache_dir, inputs_hash=inputs_hash, output_dir=output_dir)
+
+    if cache_info is not None:
+        restore_seconds = time.perf_counter() - start
+        print(
+            f"Synth cache hit {inputs_hash[:12]}: restored in {restore_seconds:.2f}s, "
+            f"saved {cache_info['synth_seconds'] - restore_seconds:.2f}s",
+            file=sys.stderr,
+        )
+        return
+
+    synth_seconds = synth(command=args.command.split(), context=args.context, output_dir=output_dir)
+    store(
+        cache_dir=cache_dir,
+        inputs_hash=inputs_hash,
+        output_dir=output_dir,
+        synth_seconds=synth_seconds,
+        max_entries=args.max_entries,
+    )
+
+    print(f"Synth cache miss {inputs_hash[:12]}: synthesized in {synth_seconds:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,289 @@
 from aws_cdk import core as cdk
 
 from src.helpers.name import NameHelper
-from src.helpers.context import ContextHelper
-from src.constructs.ecr import ECRConstruct
+from src.helpers.context import ArtifactsContext
+from src.helpers.lifecycle import LifecyclePolicyHelper
+from src.constructs.ecr import (
+    ECRConstruct,
+    ECRRegistryConstruct,
+)
+from src.constructs.codeartifact import CodeArtifactConstruct
 from src.constructs.codebuild import (
+    CodeBuildFleetConstruct,
     BuildImageCodeBuildProject,
     DeployCodeBuildProject,
 )
 from src.constructs.github import GithubConstruct
+from src.constructs.network import CodeBuildVpcConstruct
 from src.constructs.bootstrap import BootstrapConstruct
+from src.constructs.observability import BuildObservabilityConstruct
+from src.constructs.build_status import BuildStatusConstruct
+from src.constructs.preview_stages import PreviewStagesConstruct
+
+# Stacks of the app, in the single stack and in the layered layout, whose resources share the app tags
+APP_STACKS = [
+    NameHelper.to_pascal_case(name=f"artifacts-{name}")
+    for name in ("resources", "registries", "build-projects", "access")
+]
+
+
+# Layers add their resources straight to the stack they are given, so the resources keep the same construct paths
+# and logical IDs whether the layers share the artifacts stack or each get their own stack
+class RegistriesLayer:
+    def __init__(self, scope: cdk.Stack, context: ArtifactsContext) -> None:
+        self.ecr_repositories = list()
+        self.image_dependencies = dict()
+        self.ecr_registry = None
+        self.dependency_proxy = None
+
+        # Repositories are replicated to the regions their services deploy to, besides the context regions
+        repository_regions = dict()
+
+        for service in context.app_services:
+            self.ecr_repositories.append(
+                ECRConstruct(
+                    scope=scope,
+                    construct_id=service["name"],
+                    termination_protection=context.app_termination_protection,
+                    lifecycle_policy=LifecyclePolicyHelper.get_policy(context.app_ecr_lifecycle, service["lifecycle"]),
+                    protect_image_digest=service["pin_image_digest"],
+                    parameters_path=context.app_images_parameters_path,
+                )
+            )
+            self.image_dependencies[service["name"]] = service["depends_on"]
+            repository_regions[service["name"]] = [*context.app_replication_regions, *service["deploy_regions"]]
+
+        replicated = any(len(regions) > 0 for regions in repository_regions.values())
+
+        if len(context.app_pull_through_cache_rules) > 0 or replicated:
+            self.ecr_registry = ECRRegistryConstruct(scope, construct_id="ecr-registry")
+
+            if len(context.app_pull_through_cache_rules) > 0:
+                self.ecr_registry.add_pull_through_cache_rules(upstream_registries=context.app_pull_through_cache_rules)
+
+            if replicated:
+                self.ecr_registry.add_replication(repository_regions=repository_regions)
+
+        if context.app_dependency_proxy is not None:
+            self.dependency_proxy = CodeArtifactConstruct(
+                scope,
+                construct_id="dependency-proxy",
+                domain_name=context.app_dependency_proxy.get(
+                    "domain_name", f"{context.app_project.lower()}-dependencies"
+                ),
+            )
+
+
+class BuildProjectsLayer:
+    def __init__(self, scope: cdk.Stack, context: ArtifactsContext, registries: RegistriesLayer) -> None:
+        fleets = dict()
+
+        for fleet_name, fleet in context.app_fleets.items():
+            fleets[fleet_name] = CodeBuildFleetConstruct(
+                scope,
+                construct_id=fleet_name,
+                base_capacity=fleet["base_capacity"],
+                compute_type=fleet.get("compute_type", "SMALL"),
+                architecture=fleet.get("architecture", "x86_64"),
+                overflow_behavior=fleet.get("overflow_behavior", "QUEUE"),
+            )
+
+        codebuild_vpc = self.__get_codebuild_vpc(scope=scope, context=context)
+
+        self.build_image_codebuild = BuildImageCodeBuildProject(
+            scope=scope,
+            ecr_repositories=registries.ecr_repositories,
+            termination_protection=context.app_termination_protection,
+            cache_type=context.app_build_cache,
+            compute_profile=context.get_compute_profile(project="build-images"),
+            batch_type=context.app_build_images_batch,
+            image_dependencies=registries.image_dependencies,
+            fast_buildspec=context.app_fast_buildspecs,
+            fleet=fleets.get(context.app_project_fleets.get("build-images")),
+            vpc=codebuild_vpc,
+            incremental=context.app_build_images_incremental,
+            source_transfer_acceleration=context.app_source_bucket_transfer_acceleration,
+            source_intelligent_tiering=context.app_source_bucket_intelligent_tiering,
+            source_abort_multipart_upload_days=context.app_source_bucket_abort_multipart_days,
+            source_retention_days=context.app_source_bucket_retention_days,
+            sources_prefix=context.app_source_bucket_prefix,
+            policy_wildcard_min_prefix=context.app_iam_wildcard_min_prefix,
+            dependency_proxy=registries.dependency_proxy,
+            parameters_path=context.app_images_parameters_path,
+            image_index_path=self.__get_image_index_path(context=context),
+        )
+
+        if registries.ecr_registry is not None and len(registries.ecr_registry.pull_through_cache_prefixes) > 0:
+            self.build_image_codebuild.add_pull_through_cache_permissions(
+                repository_prefixes=registries.ecr_registry.pull_through_cache_prefixes,
+            )
+
+        self.codebuild_projects = [self.build_image_codebuild]
+        self.deploy_codebuild_projects = list()
+        services_codebuild_projects = list()
+
+        for service, ecr_repository in zip(context.app_services, registries.ecr_repositories):
+            service_codebuild_projects = dict()
+
+            for action in service["actions"]:
+                service_codebuild_projects[action] = DeployCodeBuildProject(
+                    scope=scope,
+                    ecr_repository=ecr_repository,
+                    deploy_accounts=[
+                        scope.account,
+                        *context.app_deploy_accounts,
+                        *service["deploy_accounts"],
+                    ],
+                    action=action,
+                    compute_profile=context.get_compute_profile(
+                        project=action,
+                        profile_name=service["compute_profile"],
+                    ),
+                    fast_buildspec=context.app_fast_buildspecs,
+                    pin_image_digest=service["pin_image_digest"],
+                    image_manifest=service["image_manifest"],
+                    fleet=fleets.get(context.app_project_fleets.get(action)),
+                    vpc=codebuild_vpc,
+                    fan_out=service["fan_out"],
+                    fan_out_regions=service["deploy_regions"],
+                    max_concurrent_builds=service["max_concurrent_builds"],
+                    fail_fast=service["fail_fast"],
+                    session_duration=context.app_deploy_session_duration,
+                    serverless_cache=service["serverless_cache"],
+                    changed_functions=service["changed_functions"],
+                    service_tag=service["name"],
+                    app_stacks=APP_STACKS,
+                    dependency_proxy=registries.dependency_proxy,
+                    parameters_path=context.app_images_parameters_path,
+                )
+
+            self.deploy_codebuild_projects.extend(service_codebuild_projects.values())
+            services_codebuild_projects.append(service_codebuild_projects)
+
+        self.codebuild_projects.extend(self.deploy_codebuild_projects)
+
+        self.preview_stages = self.__get_preview_stages(
+            scope=scope,
+            context=context,
+            services_codebuild_projects=services_codebuild_projects,
+        )
+
+        self.build_status = None
+
+        if context.app_build_status_stream is not None:
+            self.build_status = BuildStatusConstruct(
+                scope,
+                construct_id="codebuild-build-status",
+                codebuild_projects=self.codebuild_projects,
+                mode=context.app_build_status_stream,
+                github_token_parameter=context.app_github_token_parameter,
+            )
+
+        if context.app_build_observability:
+            BuildObservabilityConstruct(
+                scope,
+                construct_id="codebuild-observability",
+                codebuild_projects=self.codebuild_projects,
+            )
+
+    @staticmethod
+    def __get_preview_stages(
+        scope: cdk.Stack,
+        context: ArtifactsContext,
+        services_codebuild_projects: list,
+    ) -> PreviewStagesConstruct:
+        if context.app_preview_stages is None:
+            return None
+
+        # Only services with both actions can have their stages destroyed
+        codebuild_projects = [
+            (service_codebuild_projects["deploy"], service_codebuild_projects["destroy"])
+            for service_codebuild_projects in services_codebuild_projects
+            if "deploy" in service_codebuild_projects and "destroy" in service_codebuild_projects
+        ]
+
+        return PreviewStagesConstruct(
+            scope,
+            construct_id="preview-stages",
+            codebuild_projects=codebuild_projects,
+            stage_prefix=context.app_preview_stages.get("stage_prefix", "pr-"),
+            ttl=cdk.Duration.hours(context.app_preview_stages.get("ttl_hours", 72)),
+            schedule=cdk.Duration.minutes(context.app_preview_stages.get("schedule_minutes", 60)),
+            max_concurrent_destroys=context.app_preview_stages.get("max_concurrent_destroys", 2),
+        )
+
+    @staticmethod
+    def __get_image_index_path(context: ArtifactsContext) -> str:
+        if not context.app_image_index:
+            return None
+
+        if context.app_images_parameters_path is None:
+            raise ValueError("The image index is built from the image digests under images_parameters_path")
+
+        # The index shards live under the parameters path, next to the services parameters
+        if any(service["name"] == "index" for service in context.app_services):
+            raise ValueError("A service named 'index' would share its parameters path with the image index")
+
+        return f"{context.app_images_parameters_path}/index"
+
+    @staticmethod
+    def __get_codebuild_vpc(scope: cdk.Stack, context: ArtifactsContext) -> CodeBuildVpcConstruct:
+        if context.app_codebuild_vpc is None:
+            return None
+
+        return CodeBuildVpcConstruct(
+            scope,
+            construct_id="codebuild",
+            principal_accounts=[
+                scope.account,
+                *context.app_deploy_accounts,
+                *[account for service in context.app_services for account in service["deploy_accounts"]],
+            ],
+            vpc_id=context.app_codebuild_vpc.get("vpc_id"),
+            availability_zones=context.app_codebuild_vpc.get("availability_zones"),
+            private_subnet_ids=context.app_codebuild_vpc.get("private_subnet_ids"),
+            private_subnet_route_table_ids=context.app_codebuild_vpc.get("private_subnet_route_table_ids"),
+            max_azs=context.app_codebuild_vpc.get("max_azs", 2),
+            nat_gateways=context.app_codebuild_vpc.get("nat_gateways", 1),
+        )
+
+
+class AccessLayer:
+    def __init__(self, scope: cdk.Stack, context: ArtifactsContext, build_projects: BuildProjectsLayer) -> None:
+        codebuild_projects = build_projects.codebuild_projects
+        build_image_codebuild = build_projects.build_image_codebuild
+        build_status = build_projects.build_status
+        preview_stages = build_projects.preview_stages
+
+        self.github_resources = GithubConstruct(
+            scope=scope,
+            codebuild_arns=[project.project_arn for project in codebuild_projects],
+            codebuild_logs=[project.log_group_arn for project in codebuild_projects],
+            codebuild_sources_arns=[build_image_codebuild.source_bucket_arn],
+            codebuild_sources_prefix=context.app_source_bucket_prefix,
+            images_ssm_parameters_arns=[project.image_ssm_arn for project in build_projects.deploy_codebuild_projects],
+            codebuild_batch_arns=[project.project_arn for project in codebuild_projects if project.batch_enabled],
+            poll_build_status=build_status is None,
+            build_status_topic_arn=build_status.topic_arn if build_status is not None else None,
+            build_status_queues_arn=build_status.consumer_queues_arn if build_status is not None else None,
+            preview_stages_event_bus_arn=preview_stages.event_bus_arn if preview_stages is not None else None,
+            wildcard_min_prefix=context.app_iam_wildcard_min_prefix,
+            images_parameters_path=context.app_images_parameters_path,
+        )
+
+        # Kept in this layer, so the build projects do not depend on the GitHub bot user
+        build_image_codebuild.add_bucket_policy(principals=[self.github_resources.codebuild_user_arn], scope=scope)
+
+        BootstrapConstruct(
+            scope,
+            construct_id="bootstrap",
+            codebuild_role_path=DeployCodeBuildProject.ROLE_PATH,
+            max_session_duration=cdk.Duration.seconds(DeployCodeBuildProject.MAX_SESSION_DURATION),
+        )
 
 
 class ArtifactsStack(cdk.Stack):
-    def __init__(self, scope: cdk.Construct, context: ContextHelper, **kwargs) -> None:
+    def __init__(self, scope: cdk.Construct, context: ArtifactsContext, **kwargs) -> None:
         stack_name = NameHelper.to_pascal_case(name="artifacts-resources")
         super().__init__(
             scope=scope,
@@ -23,62 +294,75 @@ class ArtifactsStack(cdk.Stack):
             **kwargs,
         )
 
-        orders_backend_repo = ECRConstruct(
-            scope=self,
-            construct_id="orders-backend",
-            termination_protection=context.app_termination_protection,
-        )
+        registries = RegistriesLayer(scope=self, context=context)
+        build_projects = BuildProjectsLayer(scope=self, context=context, registries=registries)
+        AccessLayer(scope=self, context=context, build_projects=build_projects)
 
-        build_image_codebuild = BuildImageCodeBuildProject(
-            scope=self,
-            ecr_repositories=[
-                orders_backend_repo,
-            ],
+
+class ArtifactsLayerStack(cdk.Stack):
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        context: ArtifactsContext,
+        layer_name: str,
+        dependencies: list = None,
+        **kwargs,
+    ) -> None:
+        stack_name = NameHelper.to_pascal_case(name=f"artifacts-{layer_name}")
+        super().__init__(
+            scope=scope,
+            id=stack_name,
+            stack_name=stack_name,
+            tags=context.app_tags,
             termination_protection=context.app_termination_protection,
+            **kwargs,
         )
 
-        current_stack = cdk.Stack.of(self)
+        # Cross-stack references already order the stacks, the dependencies make the graph explicit
+        for dependency in dependencies if dependencies is not None else list():
+            self.add_dependency(dependency)
 
-        deploy_backend_codebuild = DeployCodeBuildProject(
-            scope=self,
-            ecr_repository=orders_backend_repo,
-            deploy_accounts=[current_stack.account],
-            action="deploy",
-        )
 
-        destroy_backend_codebuild = DeployCodeBuildProject(
-            scope=self,
-            ecr_repository=orders_backend_repo,
-            deploy_accounts=[current_stack.account],
-            action="destroy",
-        )
+class RegistriesStack(ArtifactsLayerStack):
+    def __init__(self, scope: cdk.Construct, context: ArtifactsContext, **kwargs) -> None:
+        super().__init__(scope=scope, context=context, layer_name="registries", **kwargs)
 
-        github_resources = GithubConstruct(
-            scope=self,
-            codebuild_arns=[
-                build_image_codebuild.project_arn,
-                deploy_backend_codebuild.project_arn,
-                destroy_backend_codebuild.project_arn,
-            ],
-            codebuild_logs=[
-                build_image_codebuild.log_group_arn,
-                deploy_backend_codebuild.log_group_arn,
-                destroy_backend_codebuild.log_group_arn,
-            ],
-            codebuild_sources_arns=[build_image_codebuild.source_bucket_arn],
-            images_ssm_parameters_arns=[
-                deploy_backend_codebuild.image_ssm_arn,
-                destroy_backend_codebuild.image_ssm_arn,
-            ],
+        self.registries = RegistriesLayer(scope=self, context=context)
+
+
+class BuildProjectsStack(ArtifactsLayerStack):
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        context: ArtifactsContext,
+        registries_stack: RegistriesStack,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            scope=scope,
+            context=context,
+            layer_name="build-projects",
+            dependencies=[registries_stack],
+            **kwargs,
         )
 
-        build_image_codebuild.add_bucket_policy(principals=[github_resources.codebuild_user_arn])
+        self.build_projects = BuildProjectsLayer(scope=self, context=context, registries=registries_stack.registries)
 
-        BootstrapConstruct(
-            self,
-            construct_id="bootstrap",
-            codebuild_roles=[
-                deploy_backend_codebuild.project_role_arn,
-                destroy_backend_codebuild.project_role_arn,
-            ],
+
+class AccessStack(ArtifactsLayerStack):
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        context: ArtifactsContext,
+        build_projects_stack: BuildProjectsStack,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            scope=scope,
+            context=context,
+            layer_name="access",
+            dependencies=[build_projects_stack],
+            **kwargs,
         )
+
+        self.access = AccessLayer(scope=self, context=context, build_projects=build_projects_stack.build_projects)
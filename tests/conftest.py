@@ -0,0 +1,9 @@
+import pytest
+
+from tests.helpers import ROOT_DIR
+
+
+@pytest.fixture(autouse=True)
+def root_dir(monkeypatch):
+    # The constructs read the buildspecs, scripts and manifests with paths relative to the repository root
+    monkeypatch.chdir(ROOT_DIR)
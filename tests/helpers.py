@@ -0,0 +1,86 @@
+import functools
+import json
+import os
+
+from aws_cdk import core as cdk
+
+from src.helpers.context import ArtifactsContext
+from src.stacks.artifacts import (
+    ArtifactsStack,
+    RegistriesStack,
+    BuildProjectsStack,
+    AccessStack,
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixed environment, so the templates never need AWS credentials or context lookups
+ENVIRONMENT = cdk.Environment(account="123456789012", region="eu-west-1")
+
+
+def synth(context: dict = None) -> dict:
+    # Templates by stack name, built the same way as app.py. Synths are cached by context, as each takes seconds
+    stacks = json.loads(__synth(json.dumps(context if context is not None else dict(), sort_keys=True)))
+
+    return {stack_name: stack["template"] for stack_name, stack in stacks.items()}
+
+
+def get_messages(context: dict = None, level: str = "WARNING") -> list:
+    # Annotations of the given level, of all the stacks
+    stacks = json.loads(__synth(json.dumps(context if context is not None else dict(), sort_keys=True)))
+
+    return [message["data"] for stack in stacks.values() for message in stack["messages"] if message["level"] == level]
+
+
+@functools.lru_cache(maxsize=None)
+def __synth(context_json: str) -> str:
+    with open(os.path.join(ROOT_DIR, "cdk.json"), "r") as cdk_file:
+        cdk_context = json.load(cdk_file)["context"]
+
+    app = cdk.App(context={**cdk_context, **json.loads(context_json)})
+    artifacts_context = ArtifactsContext(cdk_app=app)
+
+    if artifacts_context.app_split_stacks:
+        registries_stack = RegistriesStack(scope=app, env=ENVIRONMENT, context=artifacts_context)
+        build_projects_stack = BuildProjectsStack(
+            scope=app, env=ENVIRONMENT, context=artifacts_context, registries_stack=registries_stack
+        )
+        AccessStack(scope=app, env=ENVIRONMENT, context=artifacts_context, build_projects_stack=build_projects_stack)
+    else:
+        ArtifactsStack(scope=app, env=ENVIRONMENT, context=artifacts_context)
+
+    assembly = app.synth()
+
+    return json.dumps(
+        {
+            stack.stack_name: {
+                "template": stack.template,
+                "messages": [{"level": message.level.value, "data": message.entry.data} for message in stack.messages],
+            }
+            for stack in assembly.stacks
+        }
+    )
+
+
+def get_resources(template: dict, resource_type: str) -> dict:
+    return {
+        logical_id: resource
+        for logical_id, resource in template["Resources"].items()
+        if resource["Type"] == resource_type
+    }
+
+
+def write_manifest(directory, services: list) -> str:
+    # Manifests are JSON, which the YAML loader of the services manifest reads as well
+    file_location = os.path.join(str(directory), "services.yml")
+
+    with open(file_location, "w") as manifest_file:
+        json.dump({"services": services}, manifest_file)
+
+    return file_location
+
+
+def load_event(name: str) -> dict:
+    # Recorded events, in tests/events
+    with open(os.path.join(ROOT_DIR, "tests", "events", f"{name}.json"), "r") as event_file:
+        return json.load(event_file)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.synth import compare_with_baseline, get_peak_rss_kb
+
+
+def test_compare_with_baseline():
+    baseline = {"default": {"total": 10.0, "peak_rss_kb": 200 * 1024}, "10-services": {"total": 1.0}}
+    results = {
+        "default": {"total": 12.5, "peak_rss_kb": 260 * 1024},
+        "10-services": {"total": 1.2},
+        "30-services": {"total": 100.0},
+    }
+
+    regressions = compare_with_baseline(results=results, baseline=baseline, threshold=0.2, min_delta=0.25)
+
+    # 10-services is over the threshold but under the noise floor, 30-services has no baseline
+    assert regressions == [
+        "default total: 10.00 -> 12.50",
+        f"default peak_rss_kb: {200 * 1024:.2f} -> {260 * 1024:.2f}",
+    ]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="Child processes are only measured through /proc")
+def test_peak_rss_includes_children():
+    before_kb = get_peak_rss_kb()
+
+    # A child process holding 64 MB until its input is closed
+    child = subprocess.Popen(
+        [sys.executable, "-c", "import sys; memory = bytearray(64 * 1024 * 1024); print(); sys.stdin.read()"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    child.stdout.readline()
+
+    try:
+        assert get_peak_rss_kb() - before_kb > 60 * 1024
+    finally:
+        child.communicate()
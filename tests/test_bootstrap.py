@@ -0,0 +1,48 @@
+import re
+
+from benchmarks.manifest import write_manifest
+from src.helpers.policy import PolicyHelper
+from tests.helpers import synth, get_messages, get_resources
+
+ROLE_PATH_ARN = {"Fn::Join": ["", ["arn:", {"Ref": "AWS::Partition"}, ":iam::123456789012:role/codebuild-deploy/*"]]}
+
+
+def get_trust_policy(context: dict = None) -> dict:
+    roles = get_resources(template=synth(context=context)["ArtifactsResources"], resource_type="AWS::IAM::Role")
+
+    return roles["InfrastructuredeployRole"]["Properties"]["AssumeRolePolicyDocument"]
+
+
+def get_trust_policy_size(context: dict = None) -> int:
+    messages = [message for message in get_messages(context=context, level="INFO") if message.startswith("Trust")]
+
+    return int(re.search(r": ([0-9]+) characters", messages[0]).group(1))
+
+
+def test_trust_policy():
+    statements = get_trust_policy()["Statement"]
+
+    assert statements[1]["Principal"] == {
+        "AWS": {"Fn::Join": ["", ["arn:", {"Ref": "AWS::Partition"}, ":iam::123456789012:root"]]}
+    }
+    assert statements[1]["Condition"] == {"StringLike": {"aws:PrincipalArn": ROLE_PATH_ARN}}
+
+
+def test_deploy_project_roles_path():
+    roles = get_resources(template=synth()["ArtifactsResources"], resource_type="AWS::IAM::Role")
+
+    assert roles["OrdersBackendDeployProjectRole"]["Properties"]["Path"] == "/codebuild-deploy/"
+    assert roles["OrdersBackendDestroyProjectRole"]["Properties"]["Path"] == "/codebuild-deploy/"
+    # The build images project never deploys
+    assert "Path" not in roles["BuildImagesProjectRole"]["Properties"]
+
+
+def test_trust_policy_scales(tmp_path):
+    # Listing every project role went over the trust policy quota from about 25 services on
+    context = {
+        "services_manifest": write_manifest(directory=str(tmp_path), services_count=30),
+        "@aws-cdk/core:stackResourceLimit": 0,
+    }
+
+    assert get_trust_policy(context=context) == get_trust_policy()
+    assert get_trust_policy_size(context=context) <= PolicyHelper.TRUST_POLICY_LIMIT
@@ -0,0 +1,127 @@
+import pytest
+
+from src.functions.build_status import handler as build_status
+from tests.helpers import synth, get_resources, load_event
+
+
+class PostedStatuses(list):
+    def __call__(self, repository: str, commit: str, status: dict) -> None:
+        self.append({"repository": repository, "commit": commit, "status": status})
+
+
+def test_build_state_change():
+    posted_statuses = PostedStatuses()
+
+    build_status.handler(load_event("build_state_succeeded"), None, post_status=posted_statuses)
+
+    assert posted_statuses == [
+        {
+            "repository": "serverless-guru/orders-backend",
+            "commit": "4f2c1b7e9d3a8c6b5e0f1a2d3c4b5a6978e8d7c6",
+            "status": {
+                "state": "success",
+                "target_url": (
+                    "https://eu-west-1.console.aws.amazon.com/codesuite/codebuild/projects/orders-backend-deploy"
+                    "/build/orders-backend-deploy:6f7a8c1e-3c6d-4a9f-9a51-0d1a3e0d6b7e/?region=eu-west-1"
+                ),
+                "description": "Build succeeded",
+                "context": "codebuild/orders-backend-deploy",
+            },
+        }
+    ]
+
+
+def test_build_phase_change():
+    posted_statuses = PostedStatuses()
+
+    build_status.handler(load_event("build_phase_failed"), None, post_status=posted_statuses)
+
+    # A failed phase keeps the commit pending until the build state change
+    assert posted_statuses[0]["commit"] == "9a8b7c6d5e4f3a2b1c0d9e8f7a6b5c4d3e2f1a0b"
+    assert posted_statuses[0]["status"]["state"] == "pending"
+    assert posted_statuses[0]["status"]["description"] == "PRE_BUILD failed"
+
+
+def test_build_phase_after_build_state():
+    posted_statuses = PostedStatuses()
+    state_event = load_event("build_state_succeeded")
+    phase_event = load_event("build_phase_failed")
+    phase_event["detail"]["build-id"] = state_event["detail"]["build-id"]
+    phase_event["detail"]["additional-information"] = state_event["detail"]["additional-information"]
+    phase_event["detail"]["completed-phase"] = "FINALIZING"
+    phase_event["detail"]["completed-phase-status"] = "SUCCEEDED"
+    phase_event["detail"]["additional-information"]["build-complete"] = True
+
+    build_status.handler(state_event, None, post_status=posted_statuses)
+
+    # The last phase of the build, delivered after its final state, does not set the commit back to pending
+    assert build_status.handler(phase_event, None, post_status=posted_statuses) is None
+    assert [status["status"]["state"] for status in posted_statuses] == ["success"]
+
+
+@pytest.mark.parametrize(
+    "build_state, commit_state",
+    [("IN_PROGRESS", "pending"), ("FAILED", "failure"), ("STOPPED", "error"), ("UNKNOWN", "error")],
+)
+def test_build_states(build_state, commit_state):
+    event = load_event("build_state_succeeded")
+    event["detail"]["build-status"] = build_state
+
+    assert build_status.get_commit_status(event=event)["status"]["state"] == commit_state
+
+
+def test_build_without_commit():
+    posted_statuses = PostedStatuses()
+
+    assert build_status.handler(load_event("build_state_manual"), None, post_status=posted_statuses) is None
+    assert posted_statuses == list()
+
+
+def get_build_status_resources(mode: str) -> dict:
+    return synth(context={"build_status_stream": mode})["ArtifactsResources"]
+
+
+def test_topic_mode():
+    template = get_build_status_resources(mode="topic")
+
+    topics = get_resources(template=template, resource_type="AWS::SNS::Topic")
+    rule = get_resources(template=template, resource_type="AWS::Events::Rule")["CodebuildBuildStatusRule"]
+    policy = get_resources(template=template, resource_type="AWS::IAM::Policy")["GithubCodeBuildBotPolicy"]
+    statements = policy["Properties"]["PolicyDocument"]["Statement"]
+
+    assert topics == {
+        "CodebuildBuildStatusTopic": {
+            "Type": "AWS::SNS::Topic",
+            "Properties": {"TopicName": "codebuild-build-status-topic"},
+        }
+    }
+    assert rule["Properties"]["Targets"][0]["Arn"] == {"Ref": "CodebuildBuildStatusTopic"}
+    assert get_resources(template=template, resource_type="AWS::SQS::Queue") == dict()
+
+    subscribe = [statement for statement in statements if "sns:Subscribe" in statement["Action"]]
+    consumers = [statement for statement in statements if "sqs:CreateQueue" in statement["Action"]]
+
+    assert subscribe[0]["Resource"] == {"Ref": "CodebuildBuildStatusTopic"}
+    assert consumers[0]["Resource"] == {
+        "Fn::Join": [
+            "",
+            ["arn:", {"Ref": "AWS::Partition"}, ":sqs:eu-west-1:123456789012:codebuild-build-status-consumer-*"],
+        ]
+    }
+    # The bot follows the builds through the topic only
+    assert not any("codebuild:BatchGetBuilds" in statement["Action"] for statement in statements)
+
+
+def test_lambda_mode():
+    template = get_build_status_resources(mode="lambda")
+
+    function = get_resources(template=template, resource_type="AWS::Lambda::Function")["CodebuildBuildStatusFunction"]
+
+    assert function["Properties"]["Handler"] == "handler.handler"
+    assert function["Properties"]["Environment"]["Variables"] == {"GITHUB_TOKEN_PARAMETER": "/codebuild/github/token"}
+    assert get_resources(template=template, resource_type="AWS::SNS::Topic") == dict()
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown build status mode 'queue'"):
+        get_build_status_resources(mode="queue")
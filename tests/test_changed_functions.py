@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from src.scripts import changed_functions
+
+CONFIG = {
+    "service": "orders",
+    "functions": {
+        "create": {"handler": "src/orders/create.handler"},
+        "list": {"handler": "src/orders/list.handler", "name": "orders-list"},
+    },
+}
+
+FILES = {"serverless.yml": "a", "src/orders/create.py": "b", "src/orders/list.py": "c"}
+
+
+class FakeAws:
+    def __init__(self, stacks: dict, functions: dict) -> None:
+        # Deployed stacks by name and function code hashes by function name
+        self.stacks = stacks
+        self.functions = functions
+        self.calls = list()
+
+    def __call__(self, arguments: list) -> dict:
+        self.calls.append(arguments)
+
+        if arguments[:2] == ["cloudformation", "describe-stacks"]:
+            stack_name = arguments[arguments.index("--stack-name") + 1]
+
+            if stack_name not in self.stacks:
+                raise changed_functions.AwsError(f"Stack with id {stack_name} does not exist")
+
+            return {"Stacks": [self.stacks[stack_name]]}
+
+        function_name = arguments[arguments.index("--function-name") + 1]
+
+        if function_name not in self.functions:
+            raise changed_functions.AwsError(f"Function not found: {function_name}")
+
+        return {"CodeSha256": self.functions[function_name]}
+
+
+def get_fake_aws(stack_updated: str = "2026-10-01T10:00:00Z") -> FakeAws:
+    return FakeAws(
+        stacks={"orders-dev": {"CreationTime": "2026-09-01T10:00:00Z", "LastUpdatedTime": stack_updated}},
+        functions={"orders-dev-create": "create-sha", "orders-list": "list-sha"},
+    )
+
+
+def get_state(files: dict, deployed: dict) -> dict:
+    return {"config_hash": changed_functions.get_config_hash(config=CONFIG), "files": files, "deployed": deployed}
+
+
+def test_deployed_fingerprint():
+    run = get_fake_aws()
+
+    deployed = changed_functions.get_deployed_fingerprint(run=run, config=CONFIG, stage="dev", region="eu-west-1")
+
+    assert deployed == {
+        "stack_updated": "2026-10-01T10:00:00Z",
+        "functions": {"create": "create-sha", "list": "list-sha"},
+    }
+    assert all(call[-2:] == ["--region", "eu-west-1"] for call in run.calls)
+
+
+def test_deployed_fingerprint_missing_stack():
+    run = get_fake_aws()
+
+    assert changed_functions.get_deployed_fingerprint(run=run, config=CONFIG, stage="prod", region="eu-west-1") is None
+
+
+@pytest.mark.parametrize(
+    "files, mode, functions",
+    [
+        (FILES, "none", []),
+        ({**FILES, "src/orders/list.py": "changed"}, "functions", ["list"]),
+        ({**FILES, "src/orders/helpers.py": "new"}, "full", []),
+    ],
+)
+def test_select_functions(files, mode, functions):
+    deployed = changed_functions.get_deployed_fingerprint(
+        run=get_fake_aws(), config=CONFIG, stage="dev", region="eu-west-1"
+    )
+
+    selection = changed_functions.select_functions(
+        config=CONFIG, files=files, state=get_state(files=FILES, deployed=deployed), deployed=deployed
+    )
+
+    assert (selection["mode"], selection["functions"]) == (mode, functions)
+
+
+def test_select_functions_stale_state():
+    # Another CodeBuild host deployed the stage after this host saved its state
+    cached = changed_functions.get_deployed_fingerprint(
+        run=get_fake_aws(), config=CONFIG, stage="dev", region="eu-west-1"
+    )
+    deployed = changed_functions.get_deployed_fingerprint(
+        run=get_fake_aws(stack_updated="2026-10-02T10:00:00Z"), config=CONFIG, stage="dev", region="eu-west-1"
+    )
+
+    selection = changed_functions.select_functions(
+        config=CONFIG, files=FILES, state=get_state(files=FILES, deployed=cached), deployed=deployed
+    )
+
+    assert selection["mode"] == "full"
+
+
+@pytest.mark.parametrize("state", [None, {"config_hash": "old", "files": FILES}])
+def test_select_functions_without_deployed_state(state):
+    selection = changed_functions.select_functions(config=CONFIG, files=FILES, state=state, deployed=None)
+
+    assert selection["mode"] == "full"
+
+
+def test_save_state(tmp_path):
+    state_location = tmp_path / "state" / "123456789012-eu-west-1-dev.json"
+    deployed = {"stack_updated": "2026-10-01T10:00:00Z", "functions": {"create": "create-sha"}}
+
+    changed_functions.save_state(config=CONFIG, files=FILES, deployed=deployed, state_location=str(state_location))
+
+    assert json.loads(state_location.read_text()) == get_state(files=FILES, deployed=deployed)
@@ -0,0 +1,90 @@
+import pytest
+import yaml
+
+from tests.helpers import synth, get_resources
+
+ARN_PREFIX = ["arn:", {"Ref": "AWS::Partition"}]
+
+
+def get_template(context: dict = None) -> dict:
+    return synth(context={"dependency_proxy": dict(), **(context if context is not None else dict())})[
+        "ArtifactsResources"
+    ]
+
+
+def get_arn(resource: str) -> dict:
+    return {"Fn::Join": ["", [*ARN_PREFIX, f":codeartifact:eu-west-1:123456789012:{resource}"]]}
+
+
+def test_domain_and_repositories():
+    template = get_template()
+
+    assert get_resources(template=template, resource_type="AWS::CodeArtifact::Domain") == {
+        "DependencyProxyDomain": {
+            "Type": "AWS::CodeArtifact::Domain",
+            "Properties": {"DomainName": "sgcc-dependencies"},
+        }
+    }
+
+    repositories = get_resources(template=template, resource_type="AWS::CodeArtifact::Repository")
+    assert sorted(repositories) == ["DependencyProxyNpmStore", "DependencyProxyPypiStore"]
+    assert repositories["DependencyProxyNpmStore"]["Properties"]["ExternalConnections"] == ["public:npmjs"]
+    assert repositories["DependencyProxyPypiStore"]["Properties"]["ExternalConnections"] == ["public:pypi"]
+    assert all(repository["DependsOn"] == ["DependencyProxyDomain"] for repository in repositories.values())
+
+
+def test_domain_name_context():
+    template = get_template(context={"dependency_proxy": {"domain_name": "shared-packages"}})
+
+    domain = get_resources(template=template, resource_type="AWS::CodeArtifact::Domain")["DependencyProxyDomain"]
+    assert domain["Properties"]["DomainName"] == "shared-packages"
+
+
+@pytest.mark.parametrize("project", ["BuildImagesProject", "OrdersBackendDeployProject", "OrdersBackendDestroyProject"])
+def test_project_permissions(project):
+    policy = get_resources(template=get_template(), resource_type="AWS::IAM::Policy")[
+        f"{project}DependencyProxyPolicy"
+    ]["Properties"]
+
+    assert policy["Roles"] == [{"Ref": f"{project}Role"}]
+    assert policy["PolicyDocument"]["Statement"] == [
+        {
+            "Action": "codeartifact:GetAuthorizationToken",
+            "Effect": "Allow",
+            "Resource": get_arn(resource="domain/sgcc-dependencies"),
+        },
+        {
+            "Action": ["codeartifact:ReadFromRepository", "codeartifact:GetRepositoryEndpoint"],
+            "Effect": "Allow",
+            "Resource": [
+                get_arn(resource="repository/sgcc-dependencies/npm-store"),
+                get_arn(resource="repository/sgcc-dependencies/pypi-store"),
+            ],
+        },
+        {
+            "Action": "sts:GetServiceBearerToken",
+            "Condition": {"StringEquals": {"sts:AWSServiceName": "codeartifact.amazonaws.com"}},
+            "Effect": "Allow",
+            "Resource": "*",
+        },
+    ]
+
+
+def test_image_build_secrets():
+    project = get_resources(template=get_template(), resource_type="AWS::CodeBuild::Project")["BuildImagesProject"]
+    buildspec = yaml.safe_load(project["Properties"]["Source"]["BuildSpec"])
+    install = buildspec["phases"]["install"]["commands"]
+    commands = "\n".join(install if isinstance(install, list) else [install])
+
+    assert "--secret id=codeartifact_token" in commands
+    assert "export DOCKER_BUILDKIT=1" in commands
+    # The token never reaches the image as a build argument
+    assert "--build-arg CODEARTIFACT_AUTH_TOKEN" not in commands
+    assert "--build-arg PIP_INDEX_URL" not in commands
+
+
+def test_disabled_by_default():
+    template = synth(context=dict())["ArtifactsResources"]
+
+    assert get_resources(template=template, resource_type="AWS::CodeArtifact::Domain") == dict()
+    assert not any(name.endswith("DependencyProxyPolicy") for name in template["Resources"])
@@ -0,0 +1,247 @@
+import pytest
+import yaml
+
+from tests.helpers import synth, get_messages, get_resources, write_manifest
+
+
+def get_project(context: dict, logical_id: str) -> dict:
+    template = synth(context=context)["ArtifactsResources"]
+
+    return get_resources(template=template, resource_type="AWS::CodeBuild::Project")[logical_id]["Properties"]
+
+
+def test_build_cache_local_by_default():
+    cache = get_project(context=dict(), logical_id="BuildImagesProject")["Cache"]
+
+    assert cache == {
+        "Type": "LOCAL",
+        "Modes": ["LOCAL_DOCKER_LAYER_CACHE", "LOCAL_SOURCE_CACHE", "LOCAL_CUSTOM_CACHE"],
+    }
+
+
+def test_build_cache_s3():
+    cache = get_project(context={"build_cache": "s3"}, logical_id="BuildImagesProject")["Cache"]
+
+    assert cache["Type"] == "S3"
+    assert cache["Location"]["Fn::Join"][1][-1] == "/cache"
+
+
+def test_build_cache_none():
+    assert "Cache" not in get_project(context={"build_cache": "none"}, logical_id="BuildImagesProject")
+
+
+def test_build_cache_unknown():
+    with pytest.raises(ValueError, match="Unknown build cache 'S3'"):
+        synth(context={"build_cache": "S3"})
+
+
+def get_source_bucket_rules(context: dict) -> list:
+    template = synth(context=context)["ArtifactsResources"]
+    bucket = get_resources(template=template, resource_type="AWS::S3::Bucket")["BuildImagesProjectSourceBucket"]
+
+    return bucket["Properties"]["LifecycleConfiguration"]["Rules"]
+
+
+def test_source_bucket_retention():
+    rules = get_source_bucket_rules(
+        context={"source_bucket_retention_days": 90, "source_bucket_intelligent_tiering": True}
+    )
+
+    assert [rule.get("ExpirationInDays") for rule in rules] == [None, 90]
+    assert rules[0]["Transitions"] == [{"StorageClass": "INTELLIGENT_TIERING", "TransitionInDays": 0}]
+
+
+def test_source_bucket_intelligent_tiering_retention():
+    # Objects expired within 30 days never reach a cheaper Intelligent-Tiering tier
+    with pytest.raises(ValueError, match="needs a source_bucket_retention_days over 30, got 30"):
+        synth(context={"source_bucket_intelligent_tiering": True})
+
+
+def test_compute_profile_default():
+    project = get_project(context=dict(), logical_id="BuildImagesProject")
+
+    assert project["Environment"]["ComputeType"] == "BUILD_GENERAL1_SMALL"
+    assert project["Environment"]["Type"] == "LINUX_CONTAINER"
+    assert project["TimeoutInMinutes"] == 90
+    assert project["QueuedTimeoutInMinutes"] == 480
+
+
+def test_compute_profile_per_project():
+    context = {"project_compute_profiles": {"build-images": "large-arm", "deploy": "large-arm", "destroy": "medium"}}
+
+    build_images = get_project(context=context, logical_id="BuildImagesProject")
+    deploy = get_project(context=context, logical_id="OrdersBackendDeployProject")
+    destroy = get_project(context=context, logical_id="OrdersBackendDestroyProject")
+
+    assert build_images["Environment"]["ComputeType"] == "BUILD_GENERAL1_LARGE"
+    assert build_images["Environment"]["Type"] == "ARM_CONTAINER"
+    assert build_images["TimeoutInMinutes"] == 60
+    # The deploy image is a custom image, bound as an arm64 container by an override
+    assert deploy["Environment"]["Type"] == "ARM_CONTAINER"
+    assert destroy["Environment"]["ComputeType"] == "BUILD_GENERAL1_MEDIUM"
+    assert destroy["Environment"]["Type"] == "LINUX_CONTAINER"
+
+
+def test_compute_profile_override():
+    context = {
+        "compute_profiles": {"small": {"timeout": 30}, "huge": {"compute_type": "X2_LARGE", "queued_timeout": 60}},
+        "project_compute_profiles": {"build-images": "huge"},
+    }
+
+    build_images = get_project(context=context, logical_id="BuildImagesProject")
+    deploy = get_project(context=context, logical_id="OrdersBackendDeployProject")
+
+    assert build_images["Environment"]["ComputeType"] == "BUILD_GENERAL1_2XLARGE"
+    assert build_images["QueuedTimeoutInMinutes"] == 60
+    # New profiles start from the default profile
+    assert build_images["TimeoutInMinutes"] == 90
+    assert deploy["TimeoutInMinutes"] == 30
+
+
+def test_compute_profile_unknown():
+    with pytest.raises(ValueError, match="Unknown compute profile 'tiny' for project 'deploy'"):
+        synth(context={"project_compute_profiles": {"deploy": "tiny"}})
+
+
+def test_service_compute_profile(tmp_path):
+    manifest = write_manifest(tmp_path, [{"name": "orders", "compute_profile": "large"}, {"name": "payments"}])
+    context = {"services_manifest": manifest, "project_compute_profiles": {"deploy": "medium"}}
+
+    orders = get_project(context=context, logical_id="OrdersDeployProject")
+    payments = get_project(context=context, logical_id="PaymentsDeployProject")
+
+    assert orders["Environment"]["ComputeType"] == "BUILD_GENERAL1_LARGE"
+    assert get_project(context=context, logical_id="OrdersDestroyProject")["TimeoutInMinutes"] == 60
+    assert payments["Environment"]["ComputeType"] == "BUILD_GENERAL1_MEDIUM"
+
+
+def test_build_graph_dependencies(tmp_path):
+    manifest = write_manifest(tmp_path, [{"name": "base"}, {"name": "orders", "depends_on": ["base"]}])
+    project = get_project(
+        context={"services_manifest": manifest, "build_images_batch": "build-graph"}, logical_id="BuildImagesProject"
+    )
+    builds = yaml.safe_load(project["Source"]["BuildSpec"])["batch"]["build-graph"]
+
+    assert [build["identifier"] for build in builds] == ["base", "orders"]
+    assert "depend-on" not in builds[0]
+    assert builds[1]["depend-on"] == ["base"]
+
+
+@pytest.mark.parametrize("batch_type", [None, "build-list", "build-matrix"])
+def test_dependencies_require_build_graph(tmp_path, batch_type):
+    manifest = write_manifest(tmp_path, [{"name": "base"}, {"name": "orders", "depends_on": ["base"]}])
+    context = {"services_manifest": manifest}
+
+    if batch_type is not None:
+        context["build_images_batch"] = batch_type
+
+    with pytest.raises(ValueError, match="only supported by build-graph batch builds"):
+        synth(context=context)
+
+
+def test_project_fleets():
+    context = {
+        "fleets": {"deploy": {"base_capacity": 2, "compute_type": "MEDIUM"}},
+        "project_fleets": {"deploy": "deploy", "destroy": "deploy"},
+        "project_compute_profiles": {"deploy": "medium"},
+    }
+    template = synth(context=context)["ArtifactsResources"]
+
+    fleet = get_resources(template=template, resource_type="AWS::CodeBuild::Fleet")["DeployFleet"]["Properties"]
+    deploy = get_project(context=context, logical_id="OrdersBackendDeployProject")
+    destroy = get_project(context=context, logical_id="OrdersBackendDestroyProject")
+
+    assert fleet == {
+        "Name": "deploy-fleet",
+        "BaseCapacity": 2,
+        "ComputeType": "BUILD_GENERAL1_MEDIUM",
+        "EnvironmentType": "LINUX_CONTAINER",
+        "OverflowBehavior": "QUEUE",
+    }
+    assert deploy["Environment"]["Fleet"] == {"FleetArn": {"Fn::GetAtt": ["DeployFleet", "Arn"]}}
+    assert destroy["Environment"]["Fleet"] == deploy["Environment"]["Fleet"]
+    assert destroy["Environment"]["ComputeType"] == "BUILD_GENERAL1_MEDIUM"
+    assert "Fleet" not in get_project(context=context, logical_id="BuildImagesProject")["Environment"]
+
+    # Only the destroy project profile differs from the fleet compute type
+    assert get_messages(context=context) == [
+        "orders-backend-destroy-project runs on BUILD_GENERAL1_MEDIUM hosts of fleet deploy-fleet, "
+        "not on the BUILD_GENERAL1_SMALL hosts of its compute profile"
+    ]
+
+
+def test_project_fleet_architecture():
+    context = {
+        "fleets": {"arm": {"base_capacity": 1, "architecture": "arm64"}},
+        "project_fleets": {"build-images": "arm"},
+    }
+
+    with pytest.raises(ValueError, match="Fleet arm-fleet architecture does not match build-images-project image"):
+        synth(context=context)
+
+
+def test_project_fleet_unknown():
+    with pytest.raises(ValueError, match="Unknown fleet 'shared' for project 'deploy'"):
+        synth(context={"project_fleets": {"deploy": "shared"}})
+
+
+def get_batch(context: dict, logical_id: str) -> dict:
+    return yaml.safe_load(get_project(context=context, logical_id=logical_id)["Source"]["BuildSpec"])["batch"]
+
+
+def test_fan_out_builds(tmp_path):
+    manifest = write_manifest(
+        tmp_path,
+        [
+            {
+                "name": "orders",
+                "actions": ["deploy"],
+                "fan_out": True,
+                "deploy_accounts": ["111111111111", "222222222222"],
+                "deploy_regions": ["eu-west-1", "us-east-1"],
+                "max_concurrent_builds": 3,
+                "fail_fast": False,
+            }
+        ],
+    )
+    # The stack account and a service account are listed in the context too
+    context = {"services_manifest": manifest, "deploy_accounts": ["123456789012", "111111111111"]}
+
+    project = get_project(context=context, logical_id="OrdersDeployProject")
+    batch = get_batch(context=context, logical_id="OrdersDeployProject")
+
+    assert [build["identifier"] for build in batch["build-list"]] == [
+        "account_123456789012_eu_west_1",
+        "account_123456789012_us_east_1",
+        "account_111111111111_eu_west_1",
+        "account_111111111111_us_east_1",
+        "account_222222222222_eu_west_1",
+        "account_222222222222_us_east_1",
+    ]
+    assert batch["build-list"][3]["env"]["variables"] == {"AWS_ACCOUNT_ID": "111111111111", "REGION": "us-east-1"}
+    assert batch["fast-fail"] is False
+    assert project["BuildBatchConfig"]["Restrictions"] == {"MaximumBuildsAllowed": 6}
+    assert project["ConcurrentBuildLimit"] == 3
+
+
+def test_fan_out_without_regions(tmp_path):
+    manifest = write_manifest(tmp_path, [{"name": "orders", "actions": ["deploy"], "fan_out": True}])
+    batch = get_batch(context={"services_manifest": manifest}, logical_id="OrdersDeployProject")
+
+    assert batch == {
+        "fast-fail": True,
+        "build-list": [
+            {"identifier": "account_123456789012", "env": {"variables": {"AWS_ACCOUNT_ID": "123456789012"}}}
+        ],
+    }
+
+
+def test_destroy_stage_environment():
+    split_templates = synth(context={"split_stacks": "true"})
+    destroy = get_project(context=dict(), logical_id="OrdersBackendDestroyProject")
+
+    variables = {variable["Name"]: variable["Value"] for variable in destroy["Environment"]["EnvironmentVariables"]}
+
+    assert variables["SERVICE"] == "orders-backend"
+    # The stage tag of the app stacks must not get their resources destroyed, whatever the stacks layout
+    assert set(split_templates) | {"ArtifactsResources"} == set(variables["APP_STACKS"].split(","))
@@ -0,0 +1,189 @@
+import subprocess
+
+import pytest
+
+from src.scripts import destroy_stage
+
+STACK_ARN = "arn:aws:cloudformation:eu-west-1:123456789012:stack/orders-backend-pr-42/0123"
+TABLE_ARN = "arn:aws:dynamodb:eu-west-1:123456789012:table/app-pr-42-orders"
+FUNCTION_ARN = "arn:aws:lambda:eu-west-1:123456789012:function:orders-backend-pr-42-create"
+QUEUE_ARN = "arn:aws:sqs:eu-west-1:123456789012:orders-backend-pr-42-events"
+LOG_GROUP_ARN = "arn:aws:logs:eu-west-1:123456789012:log-group:/aws/lambda/orders-backend-pr-42-create"
+
+
+class FakeAws:
+    def __init__(self, resources: list, polls: int = 0, stack_resources: list = (), tags: dict = None) -> None:
+        # Tagged resources of the stage, polls before an asynchronous deletion completes, and resources of the stack
+        self.resources = list(resources)
+        self.polls = polls
+        self.stack_resources = list(stack_resources)
+        self.tags = tags if tags is not None else dict()
+        self.deleting = dict()
+        self.calls = list()
+
+    def __call__(self, arguments: list) -> dict:
+        self.calls.append(arguments)
+        command = arguments[1]
+
+        if command == "get-resources":
+            return {
+                "ResourceTagMappingList": [
+                    {"ResourceARN": arn, "Tags": self.tags.get(arn, [])} for arn in self.resources
+                ]
+            }
+
+        if command == "get-queue-url":
+            self.__get_arn(name=arguments[-1])
+            return {"QueueUrl": f"https://sqs.eu-west-1.amazonaws.com/123456789012/{arguments[-1]}"}
+
+        if command in {"describe-stacks", "describe-table"}:
+            return self.__describe(arn=self.__get_arn(name=arguments[-1]))
+
+        name = arguments[-1].rsplit("/", 1)[1] if command == "delete-queue" else arguments[-1]
+        arn = self.__get_arn(name=name.replace("s3://", ""))
+
+        if command in {"delete-stack", "delete-table"}:
+            self.deleting.setdefault(arn, self.polls)
+        else:
+            self.resources.remove(arn)
+
+        return dict()
+
+    def __get_arn(self, name: str) -> str:
+        for arn in self.resources:
+            if name in {arn, destroy_stage.get_resource_name(resource_arn=arn)}:
+                return arn
+
+        raise destroy_stage.AwsError(f"An error occurred (ResourceNotFoundException): {name} not found")
+
+    def __describe(self, arn: str) -> dict:
+        if self.deleting[arn] == 0:
+            self.resources.remove(arn)
+            removed = self.stack_resources if destroy_stage.get_service(resource_arn=arn) == "cloudformation" else []
+            self.resources = [resource for resource in self.resources if resource not in removed]
+            raise destroy_stage.AwsError("An error occurred (ResourceNotFoundException): not found")
+
+        self.deleting[arn] -= 1
+
+        return {"Stacks": [{"StackStatus": "DELETE_IN_PROGRESS"}], "Table": {"TableStatus": "DELETING"}}
+
+
+def test_destroy_stage_levels():
+    run = FakeAws(resources=[LOG_GROUP_ARN, TABLE_ARN, FUNCTION_ARN, QUEUE_ARN, STACK_ARN], polls=2)
+    sleeps = list()
+
+    results = destroy_stage.destroy_stage(service="orders-backend", stage="pr-42", run=run, sleep=sleeps.append)
+
+    deleted = [result["resource"] for result in results]
+    assert deleted[0] == STACK_ARN
+    assert deleted[-1] == LOG_GROUP_ARN
+    assert sorted(deleted) == sorted([LOG_GROUP_ARN, TABLE_ARN, FUNCTION_ARN, QUEUE_ARN, STACK_ARN])
+    assert all(result["error"] is None for result in results)
+    assert run.resources == []
+    # Stack and table deletions are polled with an exponential backoff
+    assert sorted(sleeps) == [1, 1, 2, 2]
+
+
+def test_destroy_stage_rediscovers_resources():
+    # The function belongs to the stack, so it is gone once the stack is deleted
+    run = FakeAws(resources=[STACK_ARN, FUNCTION_ARN], stack_resources=[FUNCTION_ARN])
+
+    results = destroy_stage.destroy_stage(service="orders-backend", stage="pr-42", run=run, sleep=lambda delay: None)
+
+    assert [result["resource"] for result in results] == [STACK_ARN]
+    assert not any(call[1] == "delete-function" for call in run.calls)
+
+
+def test_destroy_stage_already_deleted():
+    # Deleted between the discovery and the deletion, for instance by the stack
+    run = FakeAws(resources=list())
+
+    def run_tagged(arguments):
+        if arguments[1] == "get-resources":
+            return {"ResourceTagMappingList": [{"ResourceARN": QUEUE_ARN}]}
+
+        return run(arguments)
+
+    results = destroy_stage.destroy_stage(
+        service="orders-backend", stage="pr-42", run=run_tagged, sleep=lambda delay: None
+    )
+
+    assert [result["error"] for result in results] == [None]
+
+
+def test_destroy_stage_timeout():
+    run = FakeAws(resources=[TABLE_ARN], polls=100)
+
+    results = destroy_stage.destroy_stage(
+        service="orders-backend", stage="pr-42", timeout=10, run=run, sleep=lambda delay: None
+    )
+
+    assert results[0]["error"].startswith("Still not deleted")
+
+
+def test_destroy_stage_ignores_other_services():
+    run = FakeAws(resources=[QUEUE_ARN, "arn:aws:kinesis:eu-west-1:123456789012:stream/orders-backend-pr-42"])
+
+    results = destroy_stage.destroy_stage(service="orders-backend", stage="pr-42", run=run, sleep=lambda delay: None)
+
+    # Resources of services outside the delete levels are left alone
+    assert [result["resource"] for result in results] == [QUEUE_ARN]
+
+
+def test_destroy_stage_keeps_app_stacks():
+    app_stack_arn = "arn:aws:cloudformation:eu-west-1:123456789012:stack/ArtifactsResources/4567"
+    app_table_arn = "arn:aws:dynamodb:eu-west-1:123456789012:table/preview-stages-table"
+    run = FakeAws(
+        resources=[app_stack_arn, app_table_arn, QUEUE_ARN],
+        tags={app_table_arn: [{"Key": "aws:cloudformation:stack-name", "Value": "ArtifactsResources"}]},
+    )
+
+    results = destroy_stage.destroy_stage(
+        service="orders-backend",
+        stage="dev",
+        app_stacks=["ArtifactsResources"],
+        run=run,
+        sleep=lambda delay: None,
+    )
+
+    # The app stacks share the stage tag of the services, they and their resources survive a destroy
+    assert [result["resource"] for result in results] == [QUEUE_ARN]
+    assert run.resources == [app_stack_arn, app_table_arn]
+
+
+def test_stage_resources_tag_filters():
+    run = FakeAws(resources=list())
+
+    destroy_stage.get_stage_resources(run=run, service="orders-backend", stage="pr-42")
+
+    # The project tag is shared with the app stacks, only the services tag their resources with their name
+    assert run.calls[0][-2:] == ["Key=service,Values=orders-backend", "Key=stage,Values=pr-42"]
+
+
+def test_run_aws_region(monkeypatch):
+    commands = list()
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0, "{}", "")
+
+    monkeypatch.setattr(destroy_stage.subprocess, "run", run)
+
+    destroy_stage.run_aws(["sqs", "get-queue-url", "--queue-name", "orders-backend-pr-42-events"], region="us-east-1")
+
+    # The stage region, whatever the region of the destroy build
+    assert commands[0][-4:] == ["--region", "us-east-1", "--output", "json"]
+
+
+@pytest.mark.parametrize(
+    "resource_arn, name",
+    [
+        (STACK_ARN, "orders-backend-pr-42"),
+        (TABLE_ARN, "app-pr-42-orders"),
+        (FUNCTION_ARN, "orders-backend-pr-42-create"),
+        (QUEUE_ARN, "orders-backend-pr-42-events"),
+        (LOG_GROUP_ARN, "/aws/lambda/orders-backend-pr-42-create"),
+    ],
+)
+def test_resource_name(resource_arn, name):
+    assert destroy_stage.get_resource_name(resource_arn=resource_arn) == name
@@ -0,0 +1,72 @@
+import itertools
+
+import pytest
+
+from tests.helpers import synth, get_resources, write_manifest
+
+
+def get_replication_rules(context: dict) -> list:
+    template = synth(context=context)["ArtifactsResources"]
+    replications = get_resources(template=template, resource_type="AWS::ECR::ReplicationConfiguration")
+
+    if len(replications) == 0:
+        return list()
+
+    return replications["EcrReplicationConfiguration"]["Properties"]["ReplicationConfiguration"]["Rules"]
+
+
+def test_no_replication():
+    assert get_replication_rules(context=dict()) == list()
+
+
+def test_replication_from_deploy_regions(tmp_path):
+    manifest = write_manifest(
+        tmp_path,
+        [
+            {"name": "orders", "deploy_regions": ["eu-west-1", "us-east-1"]},
+            {"name": "payments", "deploy_regions": ["us-east-1"]},
+            {"name": "reports", "deploy_regions": ["eu-central-1"]},
+            {"name": "local"},
+        ],
+    )
+
+    rules = get_replication_rules(context={"services_manifest": manifest})
+
+    # The stack region is never a destination
+    assert rules == [
+        {
+            "Destinations": [{"Region": "us-east-1", "RegistryId": "123456789012"}],
+            "RepositoryFilters": [
+                {"Filter": "orders", "FilterType": "PREFIX_MATCH"},
+                {"Filter": "payments", "FilterType": "PREFIX_MATCH"},
+            ],
+        },
+        {
+            "Destinations": [{"Region": "eu-central-1", "RegistryId": "123456789012"}],
+            "RepositoryFilters": [{"Filter": "reports", "FilterType": "PREFIX_MATCH"}],
+        },
+    ]
+
+
+def test_replication_regions_context(tmp_path):
+    manifest = write_manifest(tmp_path, [{"name": "orders", "deploy_regions": ["us-east-1"]}, {"name": "payments"}])
+
+    rules = get_replication_rules(context={"services_manifest": manifest, "replication_regions": ["eu-central-1"]})
+
+    assert [[destination["Region"] for destination in rule["Destinations"]] for rule in rules] == [
+        ["eu-central-1", "us-east-1"],
+        ["eu-central-1"],
+    ]
+
+
+def test_replication_rules_limit(tmp_path):
+    # Every pair of regions plus a single region, 11 distinct destination sets
+    region_sets = [*itertools.combinations(["us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-central-1"], 2)]
+    region_sets.append(("ap-south-1",))
+    services = [
+        {"name": f"service-{chr(ord('a') + number)}", "deploy_regions": list(regions)}
+        for number, regions in enumerate(region_sets)
+    ]
+
+    with pytest.raises(ValueError, match="needs 11 rules for the services regions, over the limit of 10"):
+        synth(context={"services_manifest": write_manifest(tmp_path, services)})
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from src.scripts import image_index
+
+PATH = "/images"
+INDEX_PATH = "/images/index"
+REGISTRY = "123456789012.dkr.ecr.eu-west-1.amazonaws.com"
+
+
+class FakeSsm:
+    def __init__(self, parameters: dict) -> None:
+        self.parameters = dict(parameters)
+        self.calls = list()
+        # Called before each put, to play the writes of a concurrent build
+        self.before_put = None
+
+    def __call__(self, arguments: list) -> dict:
+        self.calls.append(arguments)
+        command = arguments[1]
+
+        if command == "get-parameters-by-path":
+            prefix = arguments[arguments.index("--path") + 1] + "/"
+
+            return {
+                "Parameters": [
+                    {"Name": name, "Value": value} for name, value in self.parameters.items() if name.startswith(prefix)
+                ]
+            }
+
+        if command == "put-parameter":
+            if self.before_put is not None:
+                self.before_put(self)
+
+            self.parameters[arguments[arguments.index("--name") + 1]] = arguments[arguments.index("--value") + 1]
+            return dict()
+
+        names_start = arguments.index("--names") + 1
+
+        for name in arguments[names_start:]:
+            self.parameters.pop(name, None)
+
+        return dict()
+
+
+def get_digests(services: dict) -> dict:
+    return {f"{PATH}/{service}/image-digest": digest for service, digest in services.items()}
+
+
+def get_stored_index(run: FakeSsm) -> dict:
+    index = dict()
+
+    for name, value in run.parameters.items():
+        if name.startswith(f"{INDEX_PATH}/"):
+            index.update(json.loads(value))
+
+    return index
+
+
+def update_index(run: FakeSsm) -> dict:
+    return image_index.update_index(run=run, path=PATH, index_path=INDEX_PATH, registry=REGISTRY, sleep=lambda _: None)
+
+
+def test_update_index():
+    run = FakeSsm(parameters=get_digests({"orders-backend": "sha256:aaa", "payments": "sha256:bbb"}))
+
+    result = update_index(run=run)
+
+    assert result == {"shards": 1, "updated": [f"{INDEX_PATH}/0"], "deleted": [], "attempts": 1}
+    assert get_stored_index(run=run) == {
+        "orders-backend": {"image": f"{REGISTRY}/orders-backend", "digest": "sha256:aaa"},
+        "payments": {"image": f"{REGISTRY}/payments", "digest": "sha256:bbb"},
+    }
+
+
+def test_update_index_unchanged():
+    run = FakeSsm(parameters=get_digests({"orders-backend": "sha256:aaa"}))
+    update_index(run=run)
+    run.calls.clear()
+
+    result = update_index(run=run)
+
+    assert result["updated"] == []
+    assert not any(call[1] == "put-parameter" for call in run.calls)
+
+
+def test_update_index_shards():
+    # Every entry takes about 120 characters, so 4 KB shards hold a few dozen services
+    services = {f"service-{index:03}": f"sha256:{index:064}" for index in range(100)}
+    run = FakeSsm(parameters={**get_digests(services), f"{INDEX_PATH}/9": "{}"})
+
+    result = update_index(run=run)
+
+    assert result["shards"] > 1
+    assert result["deleted"] == [f"{INDEX_PATH}/9"]
+    assert all(len(value) <= image_index.MAX_SHARD_SIZE for value in run.parameters.values())
+    assert len(get_stored_index(run=run)) == 100
+
+
+def test_update_index_concurrent_build():
+    run = FakeSsm(parameters=get_digests({"orders-backend": "sha256:aaa"}))
+
+    def concurrent_build(fake):
+        # Another build publishes its digest and writes the index it read before this one
+        fake.before_put = None
+        fake.parameters[f"{PATH}/payments/image-digest"] = "sha256:bbb"
+        fake.parameters[f"{INDEX_PATH}/0"] = json.dumps({"payments": {"image": "stale", "digest": "sha256:000"}})
+
+    run.before_put = concurrent_build
+
+    result = update_index(run=run)
+
+    assert result["attempts"] == 2
+    assert get_stored_index(run=run) == {
+        "orders-backend": {"image": f"{REGISTRY}/orders-backend", "digest": "sha256:aaa"},
+        "payments": {"image": f"{REGISTRY}/payments", "digest": "sha256:bbb"},
+    }
+
+
+def test_update_index_conflict():
+    run = FakeSsm(parameters=get_digests({"orders-backend": "sha256:aaa"}))
+
+    def concurrent_builds(fake):
+        # A new digest is published by another build before every write
+        fake.parameters[f"{PATH}/orders-backend/image-digest"] = f"sha256:{len(fake.calls)}"
+
+    run.before_put = concurrent_builds
+
+    with pytest.raises(image_index.IndexConflictError):
+        update_index(run=run)
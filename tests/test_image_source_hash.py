@@ -0,0 +1,157 @@
+import json
+import subprocess
+
+import pytest
+import yaml
+
+from src.scripts import image_source_hash
+from tests.helpers import synth, get_resources
+
+REGISTRY = "123456789012.dkr.ecr.eu-west-1.amazonaws.com"
+
+
+class FakeEcr:
+    def __init__(self, digests: dict) -> None:
+        # Image digests by repository and tag
+        self.digests = digests
+        self.calls = list()
+
+    def __call__(self, arguments: list) -> subprocess.CompletedProcess:
+        self.calls.append(arguments)
+        repository = arguments[arguments.index("--repository-name") + 1]
+        tag = arguments[arguments.index("--image-ids") + 1].split("=", 1)[1]
+
+        if (repository, tag) not in self.digests:
+            return subprocess.CompletedProcess(arguments, 254, "", "An error occurred (ImageNotFoundException)")
+
+        stdout = json.dumps({"imageDetails": [{"imageDigest": self.digests[(repository, tag)]}]})
+
+        return subprocess.CompletedProcess(arguments, 0, stdout, "")
+
+
+@pytest.mark.parametrize(
+    "image_tags, image_tag, reused",
+    [
+        (["src-abc"], "v1.0", "true"),
+        (["src-abc", "v1.0"], "v1.1", "true"),
+        (["src-abc", "ci_41"], "ci_42", "true"),
+        # A CI tag on a release image would expire the release with the CI lifecycle rule
+        (["v1.0", "src-abc"], "ci_42", "false"),
+        (["ci_41", "src-abc"], "v1.0", "false"),
+        (["ci_41", "v1.0", "src-abc"], "ci_42", "false"),
+    ],
+)
+def test_build_plan_reuse(image_tags, image_tag, reused):
+    build_plan = image_source_hash.get_build_plan(image_tags=image_tags, image_tag=image_tag, source_tag="src-abc")
+
+    assert build_plan == {"IMAGE_REUSED": reused, "SOURCE_TAG": ""}
+
+
+def test_build_plan_new_source():
+    build_plan = image_source_hash.get_build_plan(image_tags=None, image_tag="ci_42", source_tag="src-abc")
+
+    assert build_plan == {"IMAGE_REUSED": "false", "SOURCE_TAG": "src-abc"}
+
+
+def test_source_hash(tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM node:14\n")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+
+    source_hash = image_source_hash.get_source_hash(directory=str(tmp_path))
+
+    # Git metadata is not part of the build context
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/feature\n")
+    assert image_source_hash.get_source_hash(directory=str(tmp_path)) == source_hash
+
+    (tmp_path / "app.js").write_text("console.log('hello')\n")
+    assert image_source_hash.get_source_hash(directory=str(tmp_path)) != source_hash
+
+
+def test_source_hash_base_images_and_build_args(tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM base\n")
+
+    def get_hash(base_images: list, build_args: list) -> str:
+        return image_source_hash.get_source_hash(
+            directory=str(tmp_path), base_images=base_images, build_args=build_args
+        )
+
+    source_hash = get_hash(base_images=["base@sha256:1"], build_args=list())
+
+    assert get_hash(base_images=["base@sha256:2"], build_args=list()) != source_hash
+    assert get_hash(base_images=["base@sha256:1"], build_args=["A=1"]) != source_hash
+    # Build arguments are hashed in a stable order
+    assert get_hash(base_images=list(), build_args=["A=1", "B=2"]) == get_hash(
+        base_images=list(), build_args=["B=2", "A=1"]
+    )
+
+
+def test_base_images():
+    dockerfile = "\n".join(
+        [
+            "ARG REGISTRY",
+            "ARG NODE_VERSION=14",
+            "FROM --platform=linux/amd64 node:${NODE_VERSION} AS builder",
+            "RUN npm ci",
+            "FROM $REGISTRY/base:latest",
+            "COPY --from=builder /opt/api /opt/api",
+            "FROM builder",
+        ]
+    )
+
+    base_images = image_source_hash.get_base_images(dockerfile=dockerfile, build_args=[f"REGISTRY={REGISTRY}"])
+
+    assert base_images == ["node:14", f"{REGISTRY}/base:latest"]
+
+
+def test_resolve_base_image():
+    fake_ecr = FakeEcr(digests={("base", "latest"): "sha256:1", ("base", "v2"): "sha256:2"})
+    images = [
+        f"{REGISTRY}/base",
+        f"{REGISTRY}/base:v2",
+        # Images outside ECR, pinned images and images not pushed yet are hashed by reference
+        "node:14",
+        f"{REGISTRY}/base@sha256:0",
+        f"{REGISTRY}/other",
+    ]
+
+    assert [image_source_hash.resolve_base_image(image=image, run=fake_ecr) for image in images] == [
+        f"{REGISTRY}/base@sha256:1",
+        f"{REGISTRY}/base:v2@sha256:2",
+        "node:14",
+        f"{REGISTRY}/base@sha256:0",
+        f"{REGISTRY}/other",
+    ]
+    assert len(fake_ecr.calls) == 3
+    assert fake_ecr.calls[1][2:6] == ["--registry-id", "123456789012", "--region", "eu-west-1"]
+
+
+def test_rebuilt_parent_changes_child_hash(tmp_path):
+    (tmp_path / "Dockerfile").write_text("ARG REGISTRY\nFROM ${REGISTRY}/base\n")
+    build_args = [f"REGISTRY={REGISTRY}"]
+    base_images = image_source_hash.get_base_images(
+        dockerfile=(tmp_path / "Dockerfile").read_text(), build_args=build_args
+    )
+
+    def get_child_hash(parent_digest: str) -> str:
+        fake_ecr = FakeEcr(digests={("base", "latest"): parent_digest})
+
+        return image_source_hash.get_source_hash(
+            directory=str(tmp_path),
+            base_images=[image_source_hash.resolve_base_image(image=image, run=fake_ecr) for image in base_images],
+            build_args=build_args,
+        )
+
+    assert get_child_hash(parent_digest="sha256:1") == get_child_hash(parent_digest="sha256:1")
+    assert get_child_hash(parent_digest="sha256:1") != get_child_hash(parent_digest="sha256:2")
+
+
+def test_incremental_buildspec():
+    template = synth(context={"build_images_incremental": "true"})["ArtifactsResources"]
+    project = get_resources(template=template, resource_type="AWS::CodeBuild::Project")["BuildImagesProject"]
+    build_spec = yaml.safe_load(project["Properties"]["Source"]["BuildSpec"])
+
+    with open("src/scripts/image_source_hash.py", "r") as script_file:
+        assert script_file.read().strip() in build_spec["phases"]["install"]["commands"]
+
+    assert "$IMAGE_BUILD_ARGS) || exit 1" in build_spec["phases"]["build"]["commands"]
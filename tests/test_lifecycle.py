@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from src.helpers.lifecycle import LifecyclePolicyHelper
+from src.scripts.image_source_hash import CI_TAG_PREFIX
+from tests.helpers import synth, get_resources, write_manifest
+
+
+def render(*policies: dict, protect_image_digest: bool = False) -> dict:
+    rules = LifecyclePolicyHelper.get_rules(
+        policy=LifecyclePolicyHelper.get_policy(*policies),
+        protect_image_digest=protect_image_digest,
+    )
+
+    return json.loads(LifecyclePolicyHelper.render(rules=rules))
+
+
+def test_default_policy():
+    assert render() == {
+        "rules": [
+            {
+                "rulePriority": 1,
+                "description": "CI lifecycle rule",
+                "selection": {
+                    "tagStatus": "tagged",
+                    "tagPrefixList": ["ci_"],
+                    "countType": "sinceImagePushed",
+                    "countNumber": 1,
+                    "countUnit": "days",
+                },
+                "action": {"type": "expire"},
+            }
+        ]
+    }
+
+
+def test_complex_policy():
+    context_policy = {
+        "ci_images_days": 3,
+        "untagged_images_days": 7,
+        "release_tag_prefixes": ["v", "rc-"],
+        "release_images": 10,
+    }
+    service_policy = {
+        "release_images": 20,
+        "rules": [
+            {"priority": 120, "tag_status": "any", "max_images": 500},
+            {"priority": 100, "tag_prefixes": ["feature-"], "max_age_days": 14, "description": "Feature images"},
+        ],
+    }
+
+    rules = render(context_policy, service_policy)["rules"]
+
+    # Service keys override the context ones, and the rules are ordered by priority
+    assert [(rule["rulePriority"], rule["description"]) for rule in rules] == [
+        (1, "CI lifecycle rule"),
+        (2, "Untagged images lifecycle rule"),
+        (10, "Release v lifecycle rule"),
+        (11, "Release rc- lifecycle rule"),
+        (100, "Feature images"),
+        (120, "Custom lifecycle rule 120"),
+    ]
+    assert [rule["selection"] for rule in rules] == [
+        {
+            "tagStatus": "tagged",
+            "tagPrefixList": ["ci_"],
+            "countType": "sinceImagePushed",
+            "countNumber": 3,
+            "countUnit": "days",
+        },
+        {"tagStatus": "untagged", "countType": "sinceImagePushed", "countNumber": 7, "countUnit": "days"},
+        {"tagStatus": "tagged", "tagPrefixList": ["v"], "countType": "imageCountMoreThan", "countNumber": 20},
+        {"tagStatus": "tagged", "tagPrefixList": ["rc-"], "countType": "imageCountMoreThan", "countNumber": 20},
+        {
+            "tagStatus": "tagged",
+            "tagPrefixList": ["feature-"],
+            "countType": "sinceImagePushed",
+            "countNumber": 14,
+            "countUnit": "days",
+        },
+        {"tagStatus": "any", "countType": "imageCountMoreThan", "countNumber": 500},
+    ]
+
+
+def test_protected_image_digest():
+    # Count rules and the CI rule keep the published release image digest
+    policy = {"untagged_images_days": 1, "release_tag_prefixes": ["v"], "release_images": 5}
+
+    assert len(render(policy, protect_image_digest=True)["rules"]) == 3
+
+    with pytest.raises(ValueError, match="Lifecycle rule 100 may expire the published image digest"):
+        render({"rules": [{"priority": 100, "tag_prefixes": ["v"], "max_age_days": 30}]}, protect_image_digest=True)
+
+
+@pytest.mark.parametrize(
+    "policy, error",
+    [
+        ({"ci_image_days": 1}, "Unknown lifecycle policy keys: ci_image_days"),
+        ({"release_tag_prefixes": ["v"]}, "release_tag_prefixes requires release_images"),
+        ({"rules": [{"priority": 50, "tag_status": "any", "max_images": 1}]}, "priorities must be 100 or more"),
+        (
+            {"rules": [{"priority": 100, "tag_prefixes": ["ci_build"], "max_images": 1}]},
+            "selects the same images as rule 1",
+        ),
+        (
+            {
+                "rules": [
+                    {"priority": 100, "tag_status": "any", "max_images": 1},
+                    {"priority": 101, "tag_prefixes": ["x"], "max_images": 1},
+                ]
+            },
+            "selects any image, so it must have the highest priority",
+        ),
+        (
+            {"rules": [{"priority": 100, "tag_status": "untagged", "max_images": 1, "max_age_days": 1}]},
+            "either max_images or max_age_days",
+        ),
+        ({"rules": [{"priority": 100, "max_images": 1}]}, "needs tag prefixes if and only if it selects tagged images"),
+    ],
+)
+def test_invalid_policy(policy, error):
+    with pytest.raises(ValueError, match=error):
+        render(policy)
+
+
+def test_repository_lifecycle_policy(tmp_path):
+    manifest = write_manifest(
+        tmp_path, [{"name": "orders", "lifecycle": {"release_tag_prefixes": ["v"], "release_images": 3}}]
+    )
+    template = synth(context={"services_manifest": manifest, "ecr_lifecycle": {"ci_images_days": 2}})[
+        "ArtifactsResources"
+    ]
+
+    repository = get_resources(template=template, resource_type="AWS::ECR::Repository")["OrdersEcrRepo"]
+    policy = json.loads(repository["Properties"]["LifecyclePolicy"]["LifecyclePolicyText"])
+
+    assert [rule["selection"]["countNumber"] for rule in policy["rules"]] == [2, 3]
+
+
+def test_ci_image_digests_not_published():
+    template = synth(context=dict())["ArtifactsResources"]
+    project = get_resources(template=template, resource_type="AWS::CodeBuild::Project")["BuildImagesProject"]
+
+    # The buildspec skips the digests of the images the CI lifecycle rule expires
+    assert f'if [[ "$IMAGE_TAG" == {CI_TAG_PREFIX}* ]]; then' in project["Properties"]["Source"]["BuildSpec"]
@@ -0,0 +1,33 @@
+import pytest
+
+from src.helpers.manifest import ServicesManifestHelper
+from tests.helpers import write_manifest
+
+
+def test_defaults(tmp_path):
+    services = ServicesManifestHelper.get_services(file_location=write_manifest(tmp_path, [{"name": "orders"}]))
+
+    assert services[0]["actions"] == ["deploy", "destroy"]
+    assert services[0]["depends_on"] == list()
+    assert services[0]["compute_profile"] is None
+    assert services[0]["fail_fast"] is True
+
+
+def test_deploy_accounts_are_strings(tmp_path):
+    manifest = write_manifest(tmp_path, [{"name": "orders", "deploy_accounts": [123456789012]}])
+
+    assert ServicesManifestHelper.get_services(file_location=manifest)[0]["deploy_accounts"] == ["123456789012"]
+
+
+@pytest.mark.parametrize(
+    "services, error",
+    [
+        ([{"actions": ["deploy"]}], "Service without name"),
+        ([{"name": "orders"}, {"name": "orders"}], "Duplicated service 'orders'"),
+        ([{"name": "orders-api"}, {"name": "orders_api"}], "clashes with another service"),
+        ([{"name": "orders", "depends_on": ["base"]}], "depends on unknown service 'base'"),
+    ],
+)
+def test_invalid_manifest(tmp_path, services, error):
+    with pytest.raises(ValueError, match=error):
+        ServicesManifestHelper.get_services(file_location=write_manifest(tmp_path, services))
@@ -0,0 +1,105 @@
+import pytest
+
+from tests.helpers import synth, get_resources
+
+IMPORTED_VPC = {
+    "vpc_id": "vpc-1",
+    "availability_zones": ["eu-west-1a", "eu-west-1b"],
+    "private_subnet_ids": ["subnet-1", "subnet-2"],
+    "private_subnet_route_table_ids": ["rtb-1", "rtb-2"],
+}
+
+
+def get_template(codebuild_vpc: dict) -> dict:
+    return synth(context={"codebuild_vpc": codebuild_vpc, "deploy_accounts": ["111111111111"]})["ArtifactsResources"]
+
+
+def test_endpoints():
+    endpoints = get_resources(template=get_template(codebuild_vpc=IMPORTED_VPC), resource_type="AWS::EC2::VPCEndpoint")
+
+    assert {logical_id: endpoint["Properties"]["ServiceName"] for logical_id, endpoint in endpoints.items()} == {
+        "CodebuildBucketsEndpoint": {"Fn::Join": ["", ["com.amazonaws.", {"Ref": "AWS::Region"}, ".s3"]]},
+        "CodebuildEcrApiEndpoint": "com.amazonaws.eu-west-1.ecr.api",
+        "CodebuildEcrDkrEndpoint": "com.amazonaws.eu-west-1.ecr.dkr",
+        "CodebuildStsEndpoint": "com.amazonaws.eu-west-1.sts",
+        "CodebuildSsmEndpoint": "com.amazonaws.eu-west-1.ssm",
+        "CodebuildLogsEndpoint": "com.amazonaws.eu-west-1.logs",
+    }
+    assert endpoints["CodebuildStsEndpoint"]["Properties"]["PrivateDnsEnabled"] is True
+    assert endpoints["CodebuildStsEndpoint"]["Properties"]["SubnetIds"] == ["subnet-1", "subnet-2"]
+
+
+def test_endpoint_policies():
+    endpoints = get_resources(template=get_template(codebuild_vpc=IMPORTED_VPC), resource_type="AWS::EC2::VPCEndpoint")
+    accounts_statement = {
+        "Action": "*",
+        "Condition": {"StringEquals": {"aws:PrincipalAccount": ["123456789012", "111111111111"]}},
+        "Effect": "Allow",
+        "Principal": "*",
+        "Resource": "*",
+    }
+
+    for logical_id, endpoint in endpoints.items():
+        statements = endpoint["Properties"]["PolicyDocument"]["Statement"]
+
+        # Only principals of the stack and deploy accounts, plus the ECR image layers on the S3 endpoint
+        if logical_id == "CodebuildBucketsEndpoint":
+            assert statements == [
+                accounts_statement,
+                {
+                    "Action": "s3:GetObject",
+                    "Effect": "Allow",
+                    "Principal": "*",
+                    "Resource": "arn:aws:s3:::prod-eu-west-1-starport-layer-bucket/*",
+                },
+            ]
+        else:
+            assert statements == [accounts_statement]
+
+
+def test_projects_in_vpc():
+    template = get_template(codebuild_vpc=IMPORTED_VPC)
+    projects = get_resources(template=template, resource_type="AWS::CodeBuild::Project")
+    ingresses = get_resources(template=template, resource_type="AWS::EC2::SecurityGroupIngress")
+
+    for logical_id, project in projects.items():
+        # The deploy roles are assumed through the STS interface endpoint
+        assert {"Name": "AWS_STS_REGIONAL_ENDPOINTS", "Type": "PLAINTEXT", "Value": "regional"} in project[
+            "Properties"
+        ]["Environment"]["EnvironmentVariables"]
+        assert project["Properties"]["VpcConfig"] == {
+            "SecurityGroupIds": [{"Fn::GetAtt": [f"{logical_id}SecurityGroup", "GroupId"]}],
+            "Subnets": ["subnet-1", "subnet-2"],
+            "VpcId": "vpc-1",
+        }
+
+        ingress = ingresses[f"{logical_id}EndpointsIngress"]["Properties"]
+        assert ingress["FromPort"] == ingress["ToPort"] == 443
+        assert ingress["GroupId"] == {"Fn::GetAtt": ["CodebuildEndpointsSecurityGroup", "GroupId"]}
+
+
+def test_created_vpc():
+    template = get_template(codebuild_vpc={"max_azs": 2, "nat_gateways": 1})
+
+    assert "CodebuildVpc" in get_resources(template=template, resource_type="AWS::EC2::VPC")
+    assert len(get_resources(template=template, resource_type="AWS::EC2::NatGateway")) == 1
+
+
+def test_projects_without_vpc():
+    projects = get_resources(
+        template=synth(context=dict())["ArtifactsResources"], resource_type="AWS::CodeBuild::Project"
+    )
+
+    for project in projects.values():
+        assert "VpcConfig" not in project["Properties"]
+
+
+def test_vpc_and_fleet():
+    context = {
+        "codebuild_vpc": IMPORTED_VPC,
+        "fleets": {"deploy": {"base_capacity": 1}},
+        "project_fleets": {"deploy": "deploy"},
+    }
+
+    with pytest.raises(ValueError, match="cannot run both on a fleet and in a VPC"):
+        synth(context=context)
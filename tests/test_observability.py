@@ -0,0 +1,62 @@
+from tests.helpers import synth, get_resources
+
+
+def get_alarms(context: dict) -> dict:
+    return get_resources(template=synth(context=context)["ArtifactsResources"], resource_type="AWS::CloudWatch::Alarm")
+
+
+def test_duration_alarms():
+    alarms = get_alarms(context=dict())
+
+    assert sorted(alarms) == [
+        "BuildImagesProjectDurationMedianAlarm",
+        "BuildImagesProjectDurationTailAlarm",
+        "OrdersBackendDeployProjectDurationMedianAlarm",
+        "OrdersBackendDeployProjectDurationTailAlarm",
+        "OrdersBackendDestroyProjectDurationMedianAlarm",
+        "OrdersBackendDestroyProjectDurationTailAlarm",
+    ]
+
+    median = alarms["BuildImagesProjectDurationMedianAlarm"]["Properties"]
+    tail = alarms["BuildImagesProjectDurationTailAlarm"]["Properties"]
+
+    # 50% and 80% of the 90 minutes default timeout, in seconds
+    assert median["Threshold"] == 2700
+    assert tail["Threshold"] == 4320
+    assert tail["TreatMissingData"] == "notBreaching"
+    assert tail["Metrics"][0]["MetricStat"] == {
+        "Metric": {
+            "Dimensions": [{"Name": "ProjectName", "Value": {"Ref": "BuildImagesProject"}}],
+            "MetricName": "Duration",
+            "Namespace": "AWS/CodeBuild",
+        },
+        "Period": 3600,
+        "Stat": "p95",
+    }
+
+
+def test_duration_alarms_follow_timeout():
+    alarms = get_alarms(context={"project_compute_profiles": {"deploy": "large"}})
+
+    assert alarms["OrdersBackendDeployProjectDurationTailAlarm"]["Properties"]["Threshold"] == 60 * 60 * 0.8
+
+
+def test_dashboard_widgets():
+    template = synth(context=dict())["ArtifactsResources"]
+    dashboard = get_resources(template=template, resource_type="AWS::CloudWatch::Dashboard")
+    body = "".join(
+        part
+        for part in dashboard["CodebuildObservabilityDashboard"]["Properties"]["DashboardBody"]["Fn::Join"][1]
+        if isinstance(part, str)
+    )
+
+    # A phases widget and a duration widget per project
+    assert body.count('"type":"metric"') == 6
+    assert body.count('"PostBuildDuration"') == 3
+
+
+def test_observability_disabled():
+    template = synth(context={"build_observability": "false"})["ArtifactsResources"]
+
+    assert get_resources(template=template, resource_type="AWS::CloudWatch::Alarm") == dict()
+    assert get_resources(template=template, resource_type="AWS::CloudWatch::Dashboard") == dict()
@@ -0,0 +1,127 @@
+import pytest
+from aws_cdk import (
+    core as cdk,
+    aws_iam as iam,
+)
+
+from benchmarks.manifest import service_name
+from src.constructs.policy import CompactPolicyConstruct
+from src.helpers.policy import PolicyHelper
+from tests.helpers import ENVIRONMENT
+
+ARN_PREFIX = "arn:aws:{service}:eu-west-1:123456789012:"
+
+SERVICES = [service_name(index=index) for index in range(500)]
+
+
+def get_arns(service: str, resource_format: str, services: list = SERVICES) -> list:
+    return [ARN_PREFIX.format(service=service) + resource_format.format(name=name) for name in services]
+
+
+def get_bot_statements(services: list = SERVICES) -> list:
+    # Statements of the GitHub bot user, which grows with every service project
+    projects = [f"{name}-{action}" for name in services for action in ("deploy", "destroy")]
+
+    return [
+        {
+            "Effect": "Allow",
+            "Action": ["codebuild:StartBuild", "codebuild:BatchGetBuilds"],
+            "Resource": get_arns(service="codebuild", resource_format="project/{name}-project", services=projects),
+        },
+        {
+            "Effect": "Allow",
+            "Action": ["logs:GetLogEvents"],
+            "Resource": get_arns(
+                service="logs", resource_format="log-group:/aws/codebuild/{name}-project:*", services=projects
+            ),
+        },
+        {
+            "Effect": "Allow",
+            "Action": ["ssm:GetParameter", "ssm:GetParameters"],
+            "Resource": get_arns(
+                service="ssm", resource_format="parameter/images/{name}/image-digest", services=services
+            ),
+        },
+    ]
+
+
+def add_bot_policy(statements: list, wildcard_min_prefix: int = None) -> CompactPolicyConstruct:
+    stack = cdk.Stack(cdk.App(), "PolicyStack", env=ENVIRONMENT)
+
+    return CompactPolicyConstruct(
+        stack,
+        construct_id="bot-permissions",
+        policy_name="BotPolicy",
+        logical_id="BotPolicy",
+        statements=statements,
+        users=[iam.User(stack, "bot")],
+        inline_limit=PolicyHelper.USER_INLINE_LIMIT,
+        wildcard_min_prefix=wildcard_min_prefix,
+    )
+
+
+def test_merge():
+    statements = [
+        {"Effect": "Allow", "Action": ["ecr:BatchGetImage"], "Resource": ["repository/a"]},
+        {"Effect": "Allow", "Action": ["ecr:BatchGetImage"], "Resource": ["repository/b", "repository/a"]},
+        {"Effect": "Allow", "Action": ["ecr:PutImage"], "Resource": ["repository/a", "repository/b"]},
+    ]
+
+    assert PolicyHelper.merge(statements=statements) == [
+        {
+            "Effect": "Allow",
+            "Action": ["ecr:BatchGetImage", "ecr:PutImage"],
+            "Resource": ["repository/a", "repository/b"],
+        }
+    ]
+
+
+def test_collapse_resources():
+    resources = [
+        *get_arns(service="codebuild", resource_format="project/{name}-project", services=SERVICES[:3]),
+        "arn:aws:s3:::sources-bucket/service-aaa",
+        "arn:aws:s3:::sources-bucket/service-aab",
+    ]
+
+    assert PolicyHelper.collapse_resources(resources=resources, min_prefix_length=len("service-a")) == [
+        "arn:aws:s3:::sources-bucket/service-aaa",
+        "arn:aws:s3:::sources-bucket/service-aab",
+        ARN_PREFIX.format(service="codebuild") + "project/service-aa*-project",
+    ]
+
+
+def test_collapse_resources_min_prefix():
+    resources = get_arns(service="ecr", resource_format="repository/{name}", services=["orders", "payments"])
+
+    # Names sharing fewer characters than the minimum prefix are kept apart
+    assert PolicyHelper.collapse_resources(resources=resources, min_prefix_length=1) == resources
+
+
+def test_size_tokens():
+    statement = {"Effect": "Allow", "Action": ["ecr:*"], "Resource": ["arn:${Token[AWS.Partition.8]}:ecr:*"]}
+
+    assert PolicyHelper.get_size(statements=[statement]) == PolicyHelper.get_size(
+        statements=[{**statement, "Resource": ["arn:aws-us-gov:ecr:*"]}]
+    )
+
+
+def test_split_limits():
+    documents = PolicyHelper.split(statements=get_bot_statements(services=SERVICES[:50]), first_limit=2048, limit=6144)
+
+    assert PolicyHelper.get_size(statements=documents[0]) <= 2048
+    assert all(PolicyHelper.get_size(statements=document) <= 6144 for document in documents[1:])
+    assert sum(len(statement["Resource"]) for document in documents for statement in document) == 50 * 5
+
+
+@pytest.mark.parametrize("wildcard_min_prefix", [4, 9, 10])
+def test_bot_policy_500_services(wildcard_min_prefix):
+    policy = add_bot_policy(statements=get_bot_statements(), wildcard_min_prefix=wildcard_min_prefix)
+
+    assert len(policy.managed_policies) <= 1
+    assert policy.sizes[0] <= PolicyHelper.USER_INLINE_LIMIT
+    assert all(size <= PolicyHelper.MANAGED_POLICY_LIMIT for size in policy.sizes[1:])
+
+
+def test_bot_policy_500_services_without_wildcards():
+    with pytest.raises(ValueError, match="BotPolicy needs [0-9]+ managed policies, over the quota of 10"):
+        add_bot_policy(statements=get_bot_statements())
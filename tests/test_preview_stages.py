@@ -0,0 +1,170 @@
+import copy
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.functions.preview_stages import handler as preview_stages
+from tests.helpers import load_event
+
+NOW = 1_700_000_000
+TTL = 72 * 3600
+STAGE_ID = "orders-backend-deploy|||pr-42"
+
+
+class InMemoryTable:
+    def __init__(self) -> None:
+        self.items = dict()
+
+    def scan(self, **kwargs) -> dict:
+        return {"Items": [copy.deepcopy(item) for item in self.items.values()]}
+
+    def put_item(self, Item: dict, **condition) -> None:
+        self.__check(item=self.items.get(Item["stage_id"]), **condition)
+        self.items[Item["stage_id"]] = copy.deepcopy(Item)
+
+    def update_item(self, Key: dict, UpdateExpression: str, ExpressionAttributeValues: dict, **condition) -> None:
+        names = condition.get("ExpressionAttributeNames", dict())
+        item = self.items.get(Key["stage_id"])
+        self.__check(item=item, ExpressionAttributeValues=ExpressionAttributeValues, **condition)
+        item = item if item is not None else dict(Key)
+
+        # Only the SET and REMOVE clauses used by the handler
+        set_clause, _, remove_clause = UpdateExpression.partition(" REMOVE ")
+
+        for assignment in set_clause.split("SET ", 1)[1].split(", "):
+            name, value = assignment.split(" = ")
+            item[names.get(name, name)] = ExpressionAttributeValues[value]
+
+        for name in filter(None, remove_clause.split(", ")):
+            item.pop(name, None)
+
+        self.items[Key["stage_id"]] = item
+
+    def delete_item(self, Key: dict, ReturnValues: str = "NONE") -> dict:
+        item = self.items.pop(Key["stage_id"], None)
+
+        return {"Attributes": item} if ReturnValues == "ALL_OLD" and item is not None else dict()
+
+    @staticmethod
+    def __check(item: dict, ConditionExpression: str = None, **expression) -> None:
+        # Conditions are ORs of attribute_not_exists(name), name = :value and name <> :value
+        if ConditionExpression is None:
+            return
+
+        names = expression.get("ExpressionAttributeNames", dict())
+        values = expression.get("ExpressionAttributeValues", dict())
+
+        def matches(clause):
+            if clause.startswith("attribute_not_exists("):
+                return item is None or clause[21:-1] not in item
+
+            name, operator, value = clause.split(" ")
+            actual = (item or dict()).get(names.get(name, name))
+
+            return actual == values[value] if operator == "=" else actual != values[value]
+
+        if not any(matches(clause) for clause in ConditionExpression.split(" OR ")):
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "ConditionalWrite")
+
+
+class FakeCodeBuild:
+    def __init__(self) -> None:
+        self.statuses = dict()
+        self.started = list()
+
+    def start_build(self, projectName: str, environmentVariablesOverride: list) -> dict:
+        build_id = f"{projectName}:{len(self.started) + 1}"
+        self.started.append(build_id)
+        self.statuses[build_id] = "IN_PROGRESS"
+
+        return {"build": {"id": build_id}}
+
+    def batch_get_builds(self, ids: list) -> dict:
+        return {"builds": [{"id": build_id, "buildStatus": self.statuses[build_id]} for build_id in ids]}
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch):
+    monkeypatch.setenv("DESTROY_PROJECTS", json.dumps({"orders-backend-deploy": "orders-backend-destroy"}))
+    monkeypatch.setenv("STAGE_PREFIX", "pr-")
+    monkeypatch.setenv("STAGE_TTL", str(TTL))
+    monkeypatch.setenv("MAX_CONCURRENT_DESTROYS", "2")
+
+
+def run(event: dict, table: InMemoryTable, codebuild: FakeCodeBuild, now: int):
+    return preview_stages.handler(event, None, table=table, codebuild=codebuild, now=now)
+
+
+def get_schedule_event() -> dict:
+    return {"source": "aws.events", "detail-type": "Scheduled Event", "detail": dict()}
+
+
+def test_register_stage():
+    table = InMemoryTable()
+
+    item = run(load_event("build_state_succeeded"), table=table, codebuild=FakeCodeBuild(), now=NOW)
+
+    assert item["stage_id"] == STAGE_ID
+    assert table.items[STAGE_ID]["status"] == "active"
+    assert table.items[STAGE_ID]["expires_at"] == NOW + TTL
+
+
+def test_destroy_expired_stage():
+    table, codebuild = InMemoryTable(), FakeCodeBuild()
+    run(load_event("build_state_succeeded"), table=table, codebuild=codebuild, now=NOW)
+
+    result = run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL)
+    assert result["started"] == [STAGE_ID]
+    assert table.items[STAGE_ID]["status"] == "destroying"
+
+    codebuild.statuses[table.items[STAGE_ID]["build_id"]] = "SUCCEEDED"
+    run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL + 60)
+    assert table.items == dict()
+
+
+def test_deploy_during_destroy():
+    table, codebuild = InMemoryTable(), FakeCodeBuild()
+    run(load_event("build_state_succeeded"), table=table, codebuild=codebuild, now=NOW)
+    run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL)
+    build_id = table.items[STAGE_ID]["build_id"]
+
+    # The deploy does not reset the stage being destroyed, nor drop its destroy build
+    assert run(load_event("build_state_succeeded"), table=table, codebuild=codebuild, now=NOW + TTL + 30) is None
+    assert table.items[STAGE_ID]["status"] == "destroying"
+    assert table.items[STAGE_ID]["build_id"] == build_id
+
+    # The stage deployed again is tracked once its destroy build is done
+    codebuild.statuses[build_id] = "SUCCEEDED"
+    run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL + 60)
+    assert table.items[STAGE_ID]["status"] == "active"
+    assert table.items[STAGE_ID]["expires_at"] == NOW + TTL + 30 + TTL
+    assert "build_id" not in table.items[STAGE_ID]
+
+
+def test_failed_destroy_retries():
+    table, codebuild = InMemoryTable(), FakeCodeBuild()
+    run(load_event("build_state_succeeded"), table=table, codebuild=codebuild, now=NOW)
+
+    for attempt in range(preview_stages.MAX_DESTROY_ATTEMPTS):
+        run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL + attempt)
+        codebuild.statuses[table.items[STAGE_ID]["build_id"]] = "FAILED"
+
+    run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL + 60)
+
+    assert len(codebuild.started) == preview_stages.MAX_DESTROY_ATTEMPTS
+    assert table.items[STAGE_ID]["status"] == "failed"
+
+
+def test_close_stage_during_destroy():
+    table, codebuild = InMemoryTable(), FakeCodeBuild()
+    run(load_event("build_state_succeeded"), table=table, codebuild=codebuild, now=NOW)
+    stale_items = table.scan()
+
+    # The destroy build starts between the scan and the update of the closed stage
+    run(get_schedule_event(), table=table, codebuild=codebuild, now=NOW + TTL)
+    table.scan = lambda **kwargs: stale_items
+
+    assert preview_stages.close_stage(table=table, stage="pr-42", now=NOW + TTL + 60) == []
+    assert table.items[STAGE_ID]["status"] == "destroying"
+    assert table.items[STAGE_ID]["expires_at"] == NOW + TTL
@@ -0,0 +1,47 @@
+import pytest
+
+from tests.helpers import synth
+
+SPLIT_STACKS = ["ArtifactsRegistries", "ArtifactsBuildProjects", "ArtifactsAccess"]
+
+# Every optional construct, so each pinned logical ID is compared
+FEATURES_CONTEXT = {
+    "build_status_stream": "lambda",
+    "preview_stages": {},
+    "codebuild_vpc": {},
+    "dependency_proxy": {},
+    "build_images_incremental": "true",
+    "images_parameters_path": "/images",
+    "image_index": "true",
+    "replication_regions": ["eu-central-1"],
+}
+
+# Fleet projects cannot run in a VPC
+FLEETS_CONTEXT = {"fleets": {"deploy": {"base_capacity": 1}}, "project_fleets": {"deploy": "deploy"}}
+
+
+def get_resource_types(templates: dict) -> dict:
+    return {
+        logical_id: resource["Type"]
+        for template in templates.values()
+        for logical_id, resource in template["Resources"].items()
+    }
+
+
+@pytest.mark.parametrize(
+    "context",
+    [dict(), FEATURES_CONTEXT, {**FEATURES_CONTEXT, "build_status_stream": "topic"}, FLEETS_CONTEXT],
+    ids=["default", "lambda", "topic", "fleets"],
+)
+def test_split_stacks_logical_ids(context):
+    # Resources keep their logical IDs when moved from the single stack to the layered stacks
+    templates = synth(context=context)
+    split_templates = synth(context={**context, "split_stacks": "true"})
+
+    assert list(templates) == ["ArtifactsResources"]
+    assert list(split_templates) == SPLIT_STACKS
+    assert get_resource_types(templates=split_templates) == get_resource_types(templates=templates)
+
+    # No resource is defined by two layered stacks
+    resources_count = sum(len(template["Resources"]) for template in split_templates.values())
+    assert resources_count == len(get_resource_types(templates=split_templates))
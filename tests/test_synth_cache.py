@@ -0,0 +1,98 @@
+import json
+
+from src.scripts import synth_cache
+from tests.helpers import write_manifest
+
+PACKAGE_VERSIONS = {"aws-cdk.core": "1.100.0", "jsii": "1.29.0"}
+
+
+def write_app(root_dir) -> None:
+    (root_dir / "src").mkdir()
+    (root_dir / "src" / "app.py").write_text("print('app')\n")
+    (root_dir / "cdk.json").write_text(json.dumps({"context": {"services_manifest": "services.yml"}}))
+    (root_dir / "image-manifest.json").write_text(json.dumps({"layers": [{"size": 100}]}))
+    write_manifest(root_dir, [{"name": "orders", "image_manifest": "image-manifest.json"}])
+
+
+def get_inputs_hash(root_dir, context: list = ()) -> str:
+    return synth_cache.get_inputs_hash(
+        root_dir=str(root_dir),
+        context=list(context),
+        environment=dict(),
+        package_versions=PACKAGE_VERSIONS,
+        extra_files=synth_cache.get_context_files(root_dir=str(root_dir), context=list(context)),
+    )
+
+
+def test_context_files(tmp_path):
+    write_app(tmp_path)
+
+    assert synth_cache.get_context_files(root_dir=str(tmp_path), context=list()) == [
+        "services.yml",
+        "image-manifest.json",
+    ]
+
+
+def test_context_files_yaml_manifest(tmp_path):
+    (tmp_path / "services.yml").write_text(
+        "# image_manifest: local image manifest JSON\n"
+        "services:\n"
+        "  - name: orders\n"
+        "    image_manifest: manifests/orders.json\n"
+        "  - name: payments\n"
+        "    image_manifest: 'manifests/payments.json'\n"
+    )
+
+    assert synth_cache.get_context_files(root_dir=str(tmp_path), context=["services_manifest=services.yml"]) == [
+        "services.yml",
+        "manifests/orders.json",
+        "manifests/payments.json",
+    ]
+
+
+def test_inputs_hash_invalidation(tmp_path):
+    write_app(tmp_path)
+    inputs_hash = get_inputs_hash(root_dir=tmp_path)
+
+    assert get_inputs_hash(root_dir=tmp_path) == inputs_hash
+
+    # Files outside the inputs do not invalidate the cache
+    (tmp_path / "README.md").write_text("# App\n")
+    assert get_inputs_hash(root_dir=tmp_path) == inputs_hash
+
+    (tmp_path / "image-manifest.json").write_text(json.dumps({"layers": [{"size": 200}]}))
+    image_manifest_hash = get_inputs_hash(root_dir=tmp_path)
+    assert image_manifest_hash != inputs_hash
+
+    (tmp_path / "src" / "app.py").write_text("print('changed app')\n")
+    assert get_inputs_hash(root_dir=tmp_path) != image_manifest_hash
+
+
+def test_inputs_hash_context(tmp_path):
+    write_app(tmp_path)
+
+    assert get_inputs_hash(root_dir=tmp_path, context=["split_stacks=true"]) != get_inputs_hash(root_dir=tmp_path)
+
+
+def test_restore_and_store(tmp_path):
+    output_dir = tmp_path / "cdk.out"
+    cache_dir = tmp_path / "cache"
+    output_dir.mkdir()
+    (output_dir / "manifest.json").write_text("{}")
+
+    assert synth_cache.restore(cache_dir=str(cache_dir), inputs_hash="abc", output_dir=str(output_dir)) is None
+
+    synth_cache.store(
+        cache_dir=str(cache_dir), inputs_hash="abc", output_dir=str(output_dir), synth_seconds=12.5, max_entries=1
+    )
+    (output_dir / "manifest.json").write_text('{"changed": true}')
+    cache_info = synth_cache.restore(cache_dir=str(cache_dir), inputs_hash="abc", output_dir=str(output_dir))
+
+    assert cache_info == {"inputs_hash": "abc", "synth_seconds": 12.5}
+    assert (output_dir / "manifest.json").read_text() == "{}"
+
+    # Older entries are pruned over the limit
+    synth_cache.store(
+        cache_dir=str(cache_dir), inputs_hash="def", output_dir=str(output_dir), synth_seconds=1, max_entries=1
+    )
+    assert [entry.name for entry in cache_dir.iterdir()] == ["def"]